@@ -2,7 +2,8 @@ from django.contrib import admin
 from .models import (
     Usuario, Administrador, Operador, Empleado, InfoContacto, Direccion,
     Terminal, DatosBiometricos, IntentoAcceso, ResultadoReconocimiento,
-    RegistroAsistencia, RegistroNomina, Concepto, ReciboPago,
+    RegistroAsistencia, ResumenAsistenciaDiaria, ResumenDepartamento,
+    RegistroNomina, Concepto, EjecucionNomina, ReciboPago,
     Reporte, ConfigSistema, RegistroAuditoria, TokenAutenticacion
 )
 
@@ -17,8 +18,11 @@ admin.site.register(DatosBiometricos)
 admin.site.register(IntentoAcceso)
 admin.site.register(ResultadoReconocimiento)
 admin.site.register(RegistroAsistencia)
+admin.site.register(ResumenAsistenciaDiaria)
+admin.site.register(ResumenDepartamento)
 admin.site.register(RegistroNomina)
 admin.site.register(Concepto)
+admin.site.register(EjecucionNomina)
 admin.site.register(ReciboPago)
 admin.site.register(Reporte)
 admin.site.register(ConfigSistema)
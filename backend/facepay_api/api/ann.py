@@ -0,0 +1,234 @@
+import os
+
+import numpy as np
+from django.conf import settings
+
+
+class ExactSearch:
+    def __init__(self, view):
+        self.view = view
+
+    def search(self, probe, m):
+        scores = self.view.matrix @ probe
+        n = scores.shape[0]
+        if m >= n:
+            return self.view.row_ids, self.view.employee_ids, scores
+        best = np.argpartition(-scores, m - 1)[:m]
+        return self.view.row_ids[best], self.view.employee_ids[best], scores[best]
+
+    def search_batch(self, probes, m):
+        scores = probes @ self.view.matrix.T
+        n = scores.shape[1]
+        if m >= n:
+            return [(self.view.row_ids, self.view.employee_ids, row) for row in scores]
+        best = np.argpartition(-scores, m - 1, axis=1)[:, :m]
+        return [
+            (self.view.row_ids[positions], self.view.employee_ids[positions], row)
+            for positions, row in zip(best, np.take_along_axis(scores, best, axis=1))
+        ]
+
+
+class ExactIndex:
+    name = 'exact'
+
+    def __init__(self, gallery, **options):
+        self.gallery = gallery
+
+    def build(self):
+        return self
+
+    def snapshot(self, view):
+        return ExactSearch(view)
+
+    def search(self, probe, m):
+        return self.snapshot(self.gallery).search(probe, m)
+
+    def search_batch(self, probes, m):
+        return self.snapshot(self.gallery).search_batch(probes, m)
+
+    def on_add(self, row_id):
+        pass
+
+    def on_update(self, row_id):
+        pass
+
+    def on_remove(self, row_id):
+        pass
+
+    def needs_rebuild(self):
+        return False
+
+    def save(self, path):
+        pass
+
+    def load(self, path):
+        return False
+
+
+class IVFFlatIndex:
+    name = 'ivf'
+
+    def __init__(self, gallery, nlist=None, nprobe=None, niter=10, seed=0, rebuild_ratio=0.1):
+        self.gallery = gallery
+        self.nlist = nlist or settings.FACEPAY_ANN_NLIST
+        self.nprobe = nprobe or settings.FACEPAY_ANN_NPROBE
+        self.niter = niter
+        self.seed = seed
+        self.rebuild_ratio = rebuild_ratio
+        self.centroids = None
+        self.row_ids = None
+        self.employee_ids = None
+        self.offsets = None
+        self.vectors = None
+        self.pending = set()
+        self.stale = set()
+
+    def build(self):
+        matrix = self.gallery.matrix
+        n = matrix.shape[0]
+        nlist = max(1, min(self.nlist, n))
+        rng = np.random.default_rng(self.seed)
+
+        sample_size = min(n, nlist * 256)
+        sample = matrix[rng.choice(n, sample_size, replace=False)] if sample_size < n else matrix
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+        for _ in range(self.niter):
+            assignments = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        self.centroids = np.ascontiguousarray(centroids)
+        self._set_lists(self._assign(matrix, self.centroids))
+        return self
+
+    def _assign(self, matrix, centroids, batch=65536):
+        assignments = np.empty(matrix.shape[0], dtype=np.int64)
+        for start in range(0, matrix.shape[0], batch):
+            block = matrix[start:start + batch]
+            assignments[start:start + batch] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    def _set_lists(self, assignments):
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=self.centroids.shape[0])
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.row_ids = self.gallery.row_ids[order].copy()
+        self.employee_ids = self.gallery.employee_ids[order].copy()
+        self.vectors = np.ascontiguousarray(self.gallery.matrix[order])
+        self.pending = set()
+        self.stale = set()
+
+    def on_add(self, row_id):
+        self.pending.add(row_id)
+
+    def on_update(self, row_id):
+        self.stale.add(row_id)
+        self.pending.add(row_id)
+
+    def on_remove(self, row_id):
+        self.stale.add(row_id)
+        self.pending.discard(row_id)
+
+    def needs_rebuild(self):
+        return len(self.pending) + len(self.stale) > self.rebuild_ratio * max(len(self.row_ids), 1)
+
+    def snapshot(self, view):
+        positions = self.gallery.positions
+        pending = np.fromiter((positions[r] for r in self.pending), dtype=np.int64, count=len(self.pending))
+        stale = np.fromiter(self.stale, dtype=np.int64, count=len(self.stale))
+        return IVFSearch(self, view, pending, stale)
+
+    def search(self, probe, m):
+        return self.snapshot(self.gallery).search(probe, m)
+
+    def search_batch(self, probes, m):
+        return self.snapshot(self.gallery).search_batch(probes, m)
+
+    def save(self, path):
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, centroids=self.centroids, row_ids=self.row_ids, offsets=self.offsets)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        if not path or not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            centroids = data['centroids']
+            if centroids.shape[1] != self.gallery.dimension:
+                return False
+            self.centroids = centroids
+            self.row_ids = data['row_ids']
+            self.offsets = data['offsets']
+
+        positions = self.gallery.positions
+        indexed = set(self.row_ids.tolist())
+        self.stale = indexed - set(positions)
+        self.pending = set(positions) - indexed
+        lookup = np.array([positions.get(r, 0) for r in self.row_ids.tolist()], dtype=np.int64)
+        self.employee_ids = self.gallery.employee_ids[lookup]
+        self.vectors = np.ascontiguousarray(self.gallery.matrix[lookup])
+        return True
+
+
+class IVFSearch:
+    # Frozen view of an IVF index: searches never see the pending/stale sets change under them
+    def __init__(self, index, view, pending, stale):
+        self.view = view
+        self.centroids = index.centroids
+        self.offsets = index.offsets
+        self.row_ids = index.row_ids
+        self.employee_ids = index.employee_ids
+        self.vectors = index.vectors
+        self.nprobe = min(index.nprobe, index.centroids.shape[0])
+        self.pending = pending
+        self.stale = stale
+
+    def search(self, probe, m):
+        lists = np.argpartition(-(self.centroids @ probe), self.nprobe - 1)[:self.nprobe]
+        positions = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+        if self.stale.size:
+            positions = positions[~np.isin(self.row_ids[positions], self.stale)]
+        scores = self.vectors[positions] @ probe
+        if m < scores.shape[0]:
+            best = np.argpartition(-scores, m - 1)[:m]
+            positions, scores = positions[best], scores[best]
+
+        row_ids, employee_ids = self.row_ids[positions], self.employee_ids[positions]
+        if self.pending.size:
+            row_ids = np.concatenate((row_ids, self.view.row_ids[self.pending]))
+            employee_ids = np.concatenate((employee_ids, self.view.employee_ids[self.pending]))
+            scores = np.concatenate((scores, self.view.matrix[self.pending] @ probe))
+        return row_ids, employee_ids, scores
+
+    def search_batch(self, probes, m):
+        return [self.search(probe, m) for probe in probes]
+
+
+INDEX_CLASSES = {
+    ExactIndex.name: ExactIndex,
+    IVFFlatIndex.name: IVFFlatIndex,
+}
+
+
+def build_index(gallery, kind=None, path=None, rebuild=False, **options):
+    kind = kind or settings.FACEPAY_ANN_INDEX
+    if kind not in INDEX_CLASSES:
+        raise ValueError(f"Índice ANN desconocido: {kind}")
+    if not len(gallery):
+        return ExactIndex(gallery)
+    index = INDEX_CLASSES[kind](gallery, **options)
+    if path is None:
+        path = settings.FACEPAY_ANN_INDEX_PATH
+    if rebuild or not index.load(path) or index.needs_rebuild():
+        index.build()
+        index.save(path)
+    return index
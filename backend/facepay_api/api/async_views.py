@@ -0,0 +1,123 @@
+import functools
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import exceptions
+
+from .attendance import check_in_out
+from .authentication import TokenAutenticacionAuthentication
+from .biometrics import get_gallery, matched_employee_ids, record_attempts, serialize_matches
+from .cache import match_threshold
+from .ingest import ingest_events
+from .models import Empleado
+from .parsers import NDJSONParser
+from .serializers import IdentificacionLoteSerializer, MarcacionSerializer
+
+authenticator = TokenAutenticacionAuthentication()
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+async def _authenticate(request):
+    try:
+        await sync_to_async(authenticator.authenticate)(request)
+    except exceptions.AuthenticationFailed as exc:
+        response = JsonResponse({'detail': str(exc.detail)}, status=401)
+        response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+        return response
+    return None
+
+
+def _load(request):
+    if request.content_type == NDJSONParser.media_type:
+        return NDJSONParser().parse(io.BytesIO(request.body))
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError as exc:
+        raise exceptions.ParseError(f'JSON inválido ({exc})')
+
+
+def terminal_view(view):
+    @csrf_exempt
+    @require_POST
+    @functools.wraps(view)
+    async def wrapper(request):
+        denied = await _authenticate(request)
+        if denied:
+            return denied
+        try:
+            payload = _load(request)
+        except exceptions.ParseError as exc:
+            return _error(str(exc.detail), 400)
+        return await view(request, payload)
+    return wrapper
+
+
+@terminal_view
+async def identificar(request, payload):
+    serializer = IdentificacionLoteSerializer(data=payload)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+    data = serializer.validated_data
+
+    gallery = await sync_to_async(get_gallery)()
+    try:
+        matches_per_probe = await sync_to_async(gallery.identify_batch, thread_sensitive=False)(
+            data['vectores'], data['k']
+        )
+    except ValueError as exc:
+        return _error(str(exc), 400)
+
+    terminal = data.get('id_terminal')
+    intentos = await sync_to_async(record_attempts)(matches_per_probe, terminal.id if terminal else None, data['metodo'])
+    empleados = await Empleado.objects.ain_bulk(matched_employee_ids(matches_per_probe))
+    resultados = serialize_matches(matches_per_probe, empleados, await sync_to_async(match_threshold)())
+    return JsonResponse({
+        'resultados': [
+            {'indice': indice, 'id_intento': intento.id, 'resultado': intento.resultado, 'coincidencias': coincidencias}
+            for indice, (intento, coincidencias) in enumerate(zip(intentos, resultados))
+        ],
+        'tamano_galeria': len(gallery),
+        'version_galeria': gallery.version,
+    })
+
+
+@terminal_view
+async def marcar(request, payload):
+    serializer = MarcacionSerializer(data=payload)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    data = serializer.validated_data
+
+    employee_id = data.get('id_empleado')
+    if employee_id is None:
+        employee_id = await Empleado.objects.filter(
+            codigo_empleado=data['codigo_empleado']
+        ).values_list('id', flat=True).afirst()
+        if employee_id is None:
+            return _error('Empleado no encontrado', 404)
+
+    try:
+        marcacion = await sync_to_async(check_in_out)(employee_id, data.get('fecha_hora'), data.get('terminal_origen'))
+    except IntegrityError:
+        return _error('Empleado no encontrado', 404)
+    return JsonResponse(marcacion)
+
+
+@terminal_view
+async def intentos(request, events):
+    if isinstance(events, dict):
+        events = events.get('eventos', [])
+    if not isinstance(events, list):
+        return _error('Se esperaba una lista de eventos', 400)
+    if len(events) > settings.FACEPAY_INGEST_MAX_EVENTS:
+        return _error(f'Máximo {settings.FACEPAY_INGEST_MAX_EVENTS} eventos por lote', 400)
+    return JsonResponse(await sync_to_async(ingest_events)(events))
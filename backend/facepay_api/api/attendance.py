@@ -0,0 +1,82 @@
+from django.db import connection
+from django.utils import timezone
+
+from .models import RegistroAsistencia
+
+ENTRADA = 'entrada'
+SALIDA = 'salida'
+
+TABLE = RegistroAsistencia._meta.db_table
+
+CHECK_SQL = f'''
+INSERT INTO {TABLE} (id_empleado, fecha, hora_entrada, terminal_origen, estado, actualizado_en)
+VALUES (%s, %s, %s, %s, TRUE, %s)
+ON CONFLICT (id_empleado, fecha) DO UPDATE SET
+    hora_entrada = COALESCE({TABLE}.hora_entrada, EXCLUDED.hora_entrada),
+    hora_salida = CASE WHEN {TABLE}.hora_entrada IS NULL THEN {TABLE}.hora_salida ELSE EXCLUDED.hora_entrada END,
+    actualizado_en = EXCLUDED.actualizado_en
+RETURNING id, fecha, hora_entrada, hora_salida
+'''
+
+UPSERT_SQL = f'''
+INSERT INTO {TABLE} (id_empleado, fecha, hora_entrada, hora_salida, terminal_origen, estado, actualizado_en)
+VALUES {{values}}
+ON CONFLICT (id_empleado, fecha) DO UPDATE SET
+    hora_entrada = LEAST(
+        COALESCE({TABLE}.hora_entrada, EXCLUDED.hora_entrada),
+        COALESCE(EXCLUDED.hora_entrada, {TABLE}.hora_entrada)
+    ),
+    hora_salida = GREATEST(
+        COALESCE({TABLE}.hora_salida, EXCLUDED.hora_salida),
+        COALESCE(EXCLUDED.hora_salida, {TABLE}.hora_salida)
+    ),
+    terminal_origen = COALESCE({TABLE}.terminal_origen, EXCLUDED.terminal_origen),
+    actualizado_en = EXCLUDED.actualizado_en
+RETURNING id
+'''
+
+
+def _local(moment):
+    moment = timezone.localtime(moment or timezone.now())
+    return moment.date(), moment.time().replace(microsecond=0)
+
+
+def check_in_out(employee_id, moment=None, origin=None):
+    fecha, hora = _local(moment)
+    with connection.cursor() as cursor:
+        cursor.execute(CHECK_SQL, [employee_id, fecha, hora, origin, timezone.now()])
+        registro_id, fecha, hora_entrada, hora_salida = cursor.fetchone()
+    return {
+        'id': registro_id,
+        'id_empleado': employee_id,
+        'accion': SALIDA if hora_salida == hora else ENTRADA,
+        'fecha': fecha,
+        'hora_entrada': hora_entrada,
+        'hora_salida': hora_salida,
+    }
+
+
+def apply_attendance_marks(marks, batch_size=1000):
+    days = {}
+    for employee_id, moment, kind, origin in marks:
+        fecha, hora = _local(moment)
+        entrada, salida, current_origin = days.get((employee_id, fecha), (None, None, origin))
+        if kind == ENTRADA:
+            entrada = hora if entrada is None else min(entrada, hora)
+        elif kind == SALIDA:
+            salida = hora if salida is None else max(salida, hora)
+        days[(employee_id, fecha)] = (entrada, salida, current_origin or origin)
+
+    now = timezone.now()
+    rows = [
+        (employee_id, fecha, entrada, salida, origin, now)
+        for (employee_id, fecha), (entrada, salida, origin) in days.items()
+    ]
+    ids = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = ', '.join(['(%s, %s, %s, %s, %s, TRUE, %s)'] * len(batch))
+            cursor.execute(UPSERT_SQL.format(values=values), [value for row in batch for value in row])
+            ids.extend(row[0] for row in cursor.fetchall())
+    return ids
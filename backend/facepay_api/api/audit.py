@@ -0,0 +1,304 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import RegistroAuditoria, Usuario
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AuditWriter:
+    def __init__(self, queue_size=None, batch_size=None, flush_seconds=None, overflow=None, spill_path=None):
+        self.queue = queue.Queue(maxsize=queue_size or settings.FACEPAY_AUDIT_QUEUE_SIZE)
+        self.batch_size = batch_size or settings.FACEPAY_AUDIT_BATCH_SIZE
+        self.flush_seconds = flush_seconds or settings.FACEPAY_AUDIT_FLUSH_SECONDS
+        self.overflow = overflow or settings.FACEPAY_AUDIT_OVERFLOW
+        self.spill_path = spill_path or settings.FACEPAY_AUDIT_SPILL_PATH
+        self.spill_lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.counters_lock = threading.Lock()
+        self.thread = None
+        self.atexit_registered = False
+        self.counters = {'encolados': 0, 'escritos': 0, 'derramados': 0, 'recuperados': 0, 'errores': 0}
+
+    def _count(self, name, amount=1):
+        with self.counters_lock:
+            self.counters[name] += amount
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='facepay-audit', daemon=True)
+                self.thread.start()
+                if not self.atexit_registered:
+                    atexit.register(self.shutdown)
+                    self.atexit_registered = True
+
+    def record(self, accion, id_usuario=None, detalles=None):
+        entry = {
+            'accion': accion[:150],
+            'id_usuario': id_usuario,
+            'detalles': detalles,
+            'fecha_hora': timezone.now(),
+        }
+        self.start()
+        try:
+            if self.overflow == 'block':
+                self.queue.put(entry, timeout=settings.FACEPAY_AUDIT_BLOCK_SECONDS)
+            else:
+                self.queue.put_nowait(entry)
+            self._count('encolados')
+        except queue.Full:
+            self._spill([entry])
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        while True:
+            try:
+                entry = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                entry = None
+            if entry is _STOP:
+                self._flush(batch)
+                break
+            if entry is not None:
+                batch.append(entry)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                try:
+                    self._flush(batch)
+                except Exception:
+                    logger.exception('Error inesperado en el escritor de auditoría')
+                    self._count('errores')
+                batch = []
+                deadline = time.monotonic() + self.flush_seconds
+        connection.close()
+
+    def _flush(self, batch):
+        if not batch:
+            self._replay()
+            return
+        try:
+            self._write(batch)
+        except Exception:
+            logger.exception('No se pudo escribir el lote de auditoría, se derrama a disco')
+            self._count('errores')
+            connection.close()
+            self._spill(batch)
+            return
+        self._count('escritos', len(batch))
+        if self.queue.empty():
+            self._replay()
+
+    def _write(self, batch):
+        known = set(Usuario.objects.filter(
+            id__in={entry['id_usuario'] for entry in batch if entry['id_usuario']}
+        ).values_list('id', flat=True))
+        with transaction.atomic():
+            RegistroAuditoria.objects.bulk_create([
+                RegistroAuditoria(
+                    accion=entry['accion'],
+                    id_usuario_id=entry['id_usuario'] if entry['id_usuario'] in known else None,
+                    detalles=entry['detalles'],
+                    fecha_hora=entry['fecha_hora'],
+                )
+                for entry in batch
+            ], batch_size=self.batch_size)
+
+    def _process_path(self):
+        # Every process appends to its own file; FACEPAY_AUDIT_SPILL_PATH is shared by all workers
+        root, ext = os.path.splitext(self.spill_path)
+        return f'{root}.{os.getpid()}{ext}'
+
+    def _spill_paths(self):
+        root, ext = os.path.splitext(self.spill_path)
+        paths = glob.glob(f'{glob.escape(root)}.*{ext}')
+        if os.path.exists(self.spill_path):
+            paths.append(self.spill_path)
+        return paths
+
+    def _pending_paths(self):
+        # Files of other processes that are still running may be mid-append, so they are left to their owner
+        root, ext = os.path.splitext(self.spill_path)
+        paths = []
+        for path in self._spill_paths():
+            pid = path[len(root) + 1:-len(ext) or None]
+            if path == self.spill_path or (pid.isdigit() and not _running(int(pid))):
+                paths.append(path)
+        return paths
+
+    def _claimed_paths(self):
+        root, ext = os.path.splitext(self.spill_path)
+        return glob.glob(f'{glob.escape(root)}*{ext}.replay-*')
+
+    def _claim(self):
+        # os.rename is atomic: when two processes race for the same file only one of them gets it.
+        # Files claimed by a process that is no longer running are claimed again.
+        claimed = []
+        for path in self._claimed_paths():
+            original, _, pid = path.rpartition('.replay-')
+            if not pid.isdigit() or _running(int(pid)):
+                continue
+            target = f'{original}.replay-{os.getpid()}'
+            try:
+                os.rename(path, target)
+            except FileNotFoundError:
+                continue
+            claimed.append(target)
+        for path in self._pending_paths():
+            target = f'{path}.replay-{os.getpid()}'
+            try:
+                with self.spill_lock:
+                    os.rename(path, target)
+            except FileNotFoundError:
+                continue
+            claimed.append(target)
+        return claimed
+
+    def _append(self, entries):
+        path = self._process_path()
+        with self.spill_lock:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as handle:
+                for entry in entries:
+                    handle.write(json.dumps(entry, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+
+    def _spill(self, entries):
+        if entries:
+            self._append(entries)
+            self._count('derramados', len(entries))
+
+    def _replay(self):
+        for path in self._claim():
+            if not self._replay_file(path):
+                break
+
+    def _replay_file(self, path):
+        with open(path, encoding='utf-8') as handle:
+            entries = [json.loads(line) for line in handle if line.strip()]
+        for entry in entries:
+            entry['fecha_hora'] = datetime.fromisoformat(entry['fecha_hora'].replace('Z', '+00:00'))
+
+        written = 0
+        ok = True
+        for start in range(0, len(entries), self.batch_size):
+            chunk = entries[start:start + self.batch_size]
+            try:
+                self._write(chunk)
+            except Exception:
+                logger.exception('No se pudieron recuperar los registros de auditoría derramados')
+                self._count('errores')
+                connection.close()
+                self._append(entries[written:])
+                ok = False
+                break
+            written += len(chunk)
+        os.remove(path)
+        self._count('recuperados', written)
+        return ok
+
+    def flush(self, timeout=None):
+        deadline = time.monotonic() + (timeout if timeout is not None else self.flush_seconds * 2)
+        while not self.queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def shutdown(self, timeout=10):
+        thread = self.thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            remaining = []
+            while True:
+                try:
+                    remaining.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._spill([entry for entry in remaining if entry is not _STOP])
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        with self.counters_lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            'en_cola': self.queue.qsize(),
+            'capacidad': self.queue.maxsize,
+            'activo': bool(self.thread and self.thread.is_alive()),
+            'pendientes_en_disco': bool(self._spill_paths() or self._claimed_paths()),
+        }
+
+
+def _running(pid):
+    if pid == os.getpid():
+        # Only the writer thread replays, so a file still claimed by this process is a leftover
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter()
+    return _writer
+
+
+def audit(accion, id_usuario=None, detalles=None):
+    if not settings.FACEPAY_AUDIT_ENABLED:
+        return
+    writer = get_audit_writer()
+    transaction.on_commit(lambda: writer.record(accion, id_usuario, detalles))
+
+
+class AuditMixin:
+    def _audit(self, accion, instance, campos=None):
+        user = getattr(self.request, 'user', None)
+        detalles = {'modelo': instance._meta.db_table, 'id': instance.pk}
+        if campos:
+            detalles['campos'] = sorted(campos)
+        audit(
+            f'{accion} {instance._meta.db_table} {instance.pk}',
+            user.id if isinstance(user, Usuario) else None,
+            detalles,
+        )
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self._audit('crear', serializer.instance, serializer.validated_data)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self._audit('actualizar', serializer.instance, serializer.validated_data)
+
+    def perform_destroy(self, instance):
+        pk = instance.pk
+        super().perform_destroy(instance)
+        instance.pk = pk
+        self._audit('eliminar', instance)
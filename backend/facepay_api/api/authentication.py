@@ -0,0 +1,98 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .cache import MISSING, TTLCache
+from .models import TokenAutenticacion, Usuario
+
+token_cache = TTLCache(settings.FACEPAY_AUTH_CACHE_MAXSIZE, settings.FACEPAY_AUTH_CACHE_TTL)
+# Unknown keys live in their own smaller cache so that random tokens cannot evict valid ones
+unknown_token_cache = TTLCache(settings.FACEPAY_AUTH_UNKNOWN_CACHE_MAXSIZE, settings.FACEPAY_AUTH_UNKNOWN_CACHE_TTL)
+
+USER_FIELDS = [field.attname for field in Usuario._meta.concrete_fields]
+USER_ID = USER_FIELDS.index(Usuario._meta.pk.attname)
+
+
+def _generation_key(key):
+    return f"facepay:token:{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+
+def _generation(key):
+    return caches[settings.FACEPAY_CACHE_ALIAS].get(_generation_key(key), 0)
+
+
+def _bump_generation(key):
+    # Every process compares its cached entry with this value on each hit, so a revocation reaches
+    # all workers at once. It only has to outlive the entries cached before it.
+    ttl = max(settings.FACEPAY_AUTH_CACHE_TTL, settings.FACEPAY_AUTH_UNKNOWN_CACHE_TTL)
+    caches[settings.FACEPAY_CACHE_ALIAS].set(_generation_key(key), time.time_ns(), ttl)
+
+
+def lookup_token(key):
+    generation = _generation(key)
+    entry = token_cache.get(key)
+    if entry is not MISSING and entry[2] != generation:
+        token_cache.delete(key)
+        entry = MISSING
+    if entry is MISSING:
+        if unknown_token_cache.get(key, MISSING) == generation:
+            return None
+        token = TokenAutenticacion.objects.select_related('id_usuario').filter(token=key).first()
+        if token is None:
+            unknown_token_cache.set(key, generation)
+            return None
+        entry = (tuple(getattr(token.id_usuario, name) for name in USER_FIELDS), token.expira_en, generation)
+        ttl = token_cache.ttl
+        if token.expira_en:
+            ttl = min(ttl, max((token.expira_en - timezone.now()).total_seconds(), 0))
+        token_cache.set(key, entry, ttl)
+    values, expira_en, _ = entry
+    # Each request gets its own Usuario built from the cached column values
+    return Usuario.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, values), expira_en
+
+
+def revoke_token(key):
+    token_cache.delete(key)
+    unknown_token_cache.delete(key)
+    _bump_generation(key)
+
+
+def revoke_user_tokens(user_id):
+    token_cache.discard_if(lambda entry: entry[0][USER_ID] == user_id)
+    for key in TokenAutenticacion.objects.filter(id_usuario=user_id).values_list('token', flat=True):
+        _bump_generation(key)
+
+
+class TokenAutenticacionAuthentication(BaseAuthentication):
+    keywords = (b'bearer', b'token')
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() not in self.keywords:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Encabezado de autorización inválido')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Token inválido')
+
+        entry = lookup_token(key)
+        if entry is None:
+            raise exceptions.AuthenticationFailed('Token inválido')
+        usuario, expira_en = entry
+        if expira_en is not None and expira_en <= timezone.now():
+            revoke_token(key)
+            raise exceptions.AuthenticationFailed('Token expirado')
+        if not usuario.activo:
+            raise exceptions.AuthenticationFailed('Usuario inactivo')
+        return usuario, key
+
+    def authenticate_header(self, request):
+        return 'Bearer'
@@ -0,0 +1,417 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .ann import ExactIndex, build_index
+from .cache import match_threshold
+from .models import DatosBiometricos, IntentoAcceso, ResultadoReconocimiento
+
+
+STORAGE_DTYPE = '<f4'
+
+
+def parse_vector(value):
+    if value is None:
+        return None
+    text = value.strip().strip('[]').replace(',', ' ')
+    if not text:
+        return None
+    return np.array(text.split(), dtype=np.float32)
+
+
+def encode_vector(vector):
+    return np.ascontiguousarray(vector, dtype=STORAGE_DTYPE).tobytes()
+
+
+def decode_vector(buffer, dtype=STORAGE_DTYPE):
+    if buffer is None or not len(buffer):
+        return None
+    return np.frombuffer(buffer, dtype=dtype or STORAGE_DTYPE)
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class GalleryView:
+    # Immutable state searched by identify: writers publish a new view instead of changing this one
+    def __init__(self, matrix, row_ids, employee_ids, version):
+        self.matrix = matrix
+        self.row_ids = row_ids
+        self.employee_ids = employee_ids
+        self.version = version
+        self.searcher = None
+
+    def __len__(self):
+        return self.row_ids.shape[0]
+
+    @property
+    def dimension(self):
+        return self.matrix.shape[1] if len(self) else None
+
+    def prepare_probe(self, probe):
+        probe = np.asarray(probe, dtype=np.float32)
+        if probe.shape[-1] != self.dimension:
+            raise ValueError(
+                f"El vector tiene dimensión {probe.shape[-1]}, se esperaba {self.dimension}"
+            )
+        return normalize_rows(probe)
+
+    def identify(self, probe, k=5):
+        if not len(self):
+            return []
+        probe = self.prepare_probe(probe)
+        m = k * 4
+        while True:
+            row_ids, employee_ids, scores = self.searcher.search(probe, m)
+            matches = top_k(row_ids, employee_ids, scores, k)
+            if len(matches) == k or m >= len(self) or scores.shape[0] < m:
+                return matches
+            m *= 4
+
+    def identify_batch(self, probes, k=5):
+        if not len(self):
+            return [[] for _ in probes]
+        probes = self.prepare_probe(np.atleast_2d(np.asarray(probes, dtype=np.float32)))
+        m = k * 4
+        results = []
+        for probe, (row_ids, employee_ids, scores) in zip(probes, self.searcher.search_batch(probes, m)):
+            matches = top_k(row_ids, employee_ids, scores, k)
+            if len(matches) < k and scores.shape[0] == m and m < len(self):
+                matches = self.identify(probe, k)
+            results.append(matches)
+        return results
+
+
+def top_k(row_ids, employee_ids, scores, k):
+    n = scores.shape[0]
+    m = min(n, k * 4)
+    while True:
+        if m < n:
+            best = np.argpartition(-scores, m - 1)[:m]
+        else:
+            best = np.arange(n)
+        best = best[np.argsort(-scores[best], kind='stable')]
+
+        matches, seen = [], set()
+        for position in best:
+            employee_id = int(employee_ids[position])
+            if employee_id in seen:
+                continue
+            seen.add(employee_id)
+            matches.append((employee_id, float(scores[position]), int(row_ids[position])))
+            if len(matches) == k:
+                return matches
+        if m == n:
+            return matches
+        m = min(n, m * 4)
+
+
+class Gallery:
+    def __init__(self, matrix, row_ids, employee_ids, version=0):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(row_ids), -1)
+        self._data = np.ascontiguousarray(normalize_rows(matrix), dtype=np.float32)
+        self._row_ids = np.array(row_ids, dtype=np.int64)
+        self._employee_ids = np.array(employee_ids, dtype=np.int64)
+        self.size = len(self._row_ids)
+        self.positions = {int(row_id): position for position, row_id in enumerate(self._row_ids)}
+        self.employee_rows = {}
+        for row_id, employee_id in zip(self._row_ids.tolist(), self._employee_ids.tolist()):
+            self.employee_rows.setdefault(employee_id, set()).add(row_id)
+        self.version = version
+        self._index = None
+        self._view = None
+        # Rows below this position are visible to a published view and must be copied before being overwritten
+        self._shared = 0
+        self.lock = threading.RLock()
+        self.reconcile_lock = threading.Lock()
+        self.reconciled_at = time.monotonic()
+        self.synced_until = timezone.now()
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def matrix(self):
+        return self._data[:self.size]
+
+    @property
+    def row_ids(self):
+        return self._row_ids[:self.size]
+
+    @property
+    def employee_ids(self):
+        return self._employee_ids[:self.size]
+
+    @property
+    def dimension(self):
+        return self._data.shape[1] if len(self) else None
+
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, index):
+        with self.lock:
+            self._index = index
+            self._view = None
+
+    @classmethod
+    def empty(cls, dimension=0):
+        return cls(np.zeros((0, dimension), dtype=np.float32), [], [])
+
+    @classmethod
+    def from_queryset(cls, queryset=None, version=0):
+        if queryset is None:
+            queryset = DatosBiometricos.objects.all()
+        synced_until = timezone.now()
+        rows = queryset.values_list('id', 'id_empleado_id', 'vector', 'dtype').iterator(chunk_size=2000)
+
+        vectors, row_ids, employee_ids = [], [], []
+        dimension = None
+        for row_id, employee_id, buffer, dtype in rows:
+            vector = decode_vector(buffer, dtype)
+            if vector is None:
+                continue
+            if dimension is None:
+                dimension = vector.shape[0]
+            if vector.shape[0] != dimension:
+                continue
+            vectors.append(vector)
+            row_ids.append(row_id)
+            employee_ids.append(employee_id)
+
+        if not vectors:
+            gallery = cls.empty(dimension or 0)
+        else:
+            gallery = cls(np.stack(vectors), row_ids, employee_ids, version=version)
+        gallery.version = version
+        gallery.synced_until = synced_until
+        return gallery
+
+    def snapshot(self):
+        view = self._view
+        if view is not None:
+            return view
+        with self.lock:
+            if self._view is None:
+                view = GalleryView(self.matrix, self.row_ids, self.employee_ids, self.version)
+                view.searcher = (self._index or ExactIndex(self)).snapshot(view)
+                self._shared = self.size
+                self._view = view
+            return self._view
+
+    def _writable(self, position):
+        self._view = None
+        if position < self._shared:
+            self._data = self._data.copy()
+            self._row_ids = self._row_ids.copy()
+            self._employee_ids = self._employee_ids.copy()
+            self._shared = 0
+
+    def _grow(self, dimension):
+        if not self.size and self._data.shape[1] != dimension:
+            self._data = np.zeros((0, dimension), dtype=np.float32)
+        capacity = max(16, self._data.shape[0] * 2)
+        data = np.zeros((capacity, dimension), dtype=np.float32)
+        data[:self.size] = self._data[:self.size]
+        self._data = data
+        self._row_ids = np.resize(self._row_ids, capacity)
+        self._employee_ids = np.resize(self._employee_ids, capacity)
+        self._shared = 0
+
+    def add(self, row_id, employee_id, vector):
+        vector = normalize_rows(np.asarray(vector, dtype=np.float32))
+        with self.lock:
+            if self.size and vector.shape[0] != self._data.shape[1]:
+                return False
+            if row_id in self.positions:
+                self.remove(row_id, notify=False)
+                event = 'update'
+            else:
+                event = 'add'
+            if self.size == self._data.shape[0] or self._data.shape[1] != vector.shape[0]:
+                self._grow(vector.shape[0])
+            position = self.size
+            self._writable(position)
+            self._data[position] = vector
+            self._row_ids[position] = row_id
+            self._employee_ids[position] = employee_id
+            self.positions[row_id] = position
+            self.employee_rows.setdefault(employee_id, set()).add(row_id)
+            self.size += 1
+            self.version += 1
+            if self._index is not None:
+                getattr(self._index, f'on_{event}')(row_id)
+            return True
+
+    def remove(self, row_id, notify=True):
+        with self.lock:
+            position = self.positions.pop(row_id, None)
+            if position is None:
+                return False
+            employee_id = int(self._employee_ids[position])
+            rows = self.employee_rows.get(employee_id)
+            if rows is not None:
+                rows.discard(row_id)
+                if not rows:
+                    del self.employee_rows[employee_id]
+
+            last = self.size - 1
+            self._view = None
+            if position != last:
+                self._writable(position)
+                self._data[position] = self._data[last]
+                self._row_ids[position] = self._row_ids[last]
+                self._employee_ids[position] = self._employee_ids[last]
+                self.positions[int(self._row_ids[position])] = position
+            self.size = last
+            if notify:
+                self.version += 1
+                if self._index is not None:
+                    self._index.on_remove(row_id)
+            return True
+
+    def remove_employee(self, employee_id):
+        with self.lock:
+            for row_id in list(self.employee_rows.get(employee_id, ())):
+                self.remove(row_id)
+
+    def _apply(self, rows, seen):
+        for row_id, employee_id, buffer, dtype in rows.iterator(chunk_size=2000):
+            if row_id in seen:
+                continue
+            seen.add(row_id)
+            vector = decode_vector(buffer, dtype)
+            if vector is None:
+                self.remove(row_id)
+            else:
+                self.add(row_id, employee_id, vector)
+
+    def reconcile(self, period=0):
+        # One thread reconciles while the rest keep searching the published view
+        if not self.reconcile_lock.acquire(blocking=False):
+            return False
+        try:
+            if period and time.monotonic() - self.reconciled_at <= period:
+                return False
+            started = timezone.now()
+            stored = set(DatosBiometricos.objects.values_list('id', flat=True).iterator(chunk_size=10000))
+            with self.lock:
+                removed = set(self.positions) - stored
+                missing = sorted(stored - set(self.positions))
+            for row_id in removed:
+                self.remove(row_id)
+
+            fields = ('id', 'id_empleado_id', 'vector', 'dtype')
+            seen = set()
+            self._apply(DatosBiometricos.objects.filter(actualizado_en__gte=self.synced_until).values_list(*fields), seen)
+            chunk = settings.FACEPAY_GALLERY_RECONCILE_CHUNK
+            for start in range(0, len(missing), chunk):
+                self._apply(DatosBiometricos.objects.filter(id__in=missing[start:start + chunk]).values_list(*fields), seen)
+
+            self.synced_until = started
+            self.reconciled_at = time.monotonic()
+            with self.lock:
+                if self._index is not None and (
+                    self._index.needs_rebuild() or self._index.name != settings.FACEPAY_ANN_INDEX
+                ):
+                    self.index = build_index(self, rebuild=True)
+            return True
+        finally:
+            self.reconcile_lock.release()
+
+    def identify(self, probe, k=5):
+        return self.snapshot().identify(probe, k)
+
+    def identify_batch(self, probes, k=5):
+        return self.snapshot().identify_batch(probes, k)
+
+
+def record_attempts(matches_per_probe, terminal_id=None, method='facial', threshold=None):
+    if threshold is None:
+        threshold = match_threshold()
+    best = [matches[0] if matches else None for matches in matches_per_probe]
+    with transaction.atomic():
+        intentos = IntentoAcceso.objects.bulk_create([
+            IntentoAcceso(
+                id_terminal_id=terminal_id,
+                metodo=method,
+                resultado='exitoso' if match and match[1] >= threshold else 'fallido',
+                referencia_empleado_id=match[0] if match and match[1] >= threshold else None,
+            )
+            for match in best
+        ])
+        ResultadoReconocimiento.objects.bulk_create([
+            ResultadoReconocimiento(
+                id_intento=intento,
+                coincidencia=bool(match and match[1] >= threshold),
+                id_empleado_id=match[0] if match else None,
+                confianza=match[1] if match else None,
+            )
+            for intento, match in zip(intentos, best)
+        ])
+    return intentos
+
+
+def matched_employee_ids(matches_per_probe):
+    return {employee_id for matches in matches_per_probe for employee_id, _, _ in matches}
+
+
+def serialize_matches(matches_per_probe, empleados, threshold):
+    serialized = []
+    for matches in matches_per_probe:
+        resultados = []
+        for employee_id, score, row_id in matches:
+            empleado = empleados.get(employee_id)
+            resultados.append({
+                'id_empleado': employee_id,
+                'codigo_empleado': empleado.codigo_empleado if empleado else None,
+                'nombres': empleado.nombres if empleado else None,
+                'apellidos': empleado.apellidos if empleado else None,
+                'id_dato_biometrico': row_id,
+                'confianza': score,
+                'coincidencia': score >= threshold,
+            })
+        serialized.append(resultados)
+    return serialized
+
+
+_gallery = None
+_gallery_lock = threading.Lock()
+
+
+def get_gallery():
+    global _gallery
+    if _gallery is None:
+        with _gallery_lock:
+            if _gallery is None:
+                gallery = Gallery.from_queryset()
+                gallery.index = build_index(gallery)
+                _gallery = gallery
+    period = settings.FACEPAY_GALLERY_RECONCILE_SECONDS
+    if period and time.monotonic() - _gallery.reconciled_at > period:
+        _gallery.reconcile(period)
+    return _gallery
+
+
+def loaded_gallery():
+    return _gallery
+
+
+def reset_gallery():
+    global _gallery
+    with _gallery_lock:
+        version = _gallery.version + 1 if _gallery is not None else 0
+        gallery = Gallery.from_queryset(version=version)
+        gallery.index = build_index(gallery)
+        _gallery = gallery
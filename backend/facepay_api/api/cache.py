@@ -0,0 +1,207 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import ConfigSistema, Terminal
+
+MISSING = object()
+
+
+def shared_cache_is_local():
+    return isinstance(caches[settings.FACEPAY_CACHE_ALIAS], LocMemCache)
+
+
+def shared_ttl():
+    # A LocMem "shared" cache only lives in this process and never sees other processes'
+    # invalidations, so it must not keep an entry longer than the local layer does
+    if shared_cache_is_local():
+        return min(settings.FACEPAY_CACHE_SHARED_TTL, settings.FACEPAY_CACHE_LOCAL_TTL)
+    return settings.FACEPAY_CACHE_SHARED_TTL
+
+
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DEBUG or not shared_cache_is_local():
+        return []
+    return [checks.Warning(
+        f"La caché '{settings.FACEPAY_CACHE_ALIAS}' es LocMemCache: cada proceso tiene la suya, "
+        'así que las invalidaciones de configuración y terminales y las revocaciones de tokens no llegan a los demás procesos.',
+        hint='Defina FACEPAY_CACHE_URL (redis://... o memcached://...).',
+        id='api.W001',
+    )]
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def discard_if(self, predicate):
+        with self.lock:
+            for key in [key for key, (_, value) in self.entries.items() if predicate(value)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entradas': len(self.entries),
+                'max_entradas': self.maxsize,
+                'ttl': self.ttl,
+                'aciertos': self.hits,
+                'fallos': self.misses,
+                'desalojos': self.evictions,
+                'tasa_aciertos': round(self.hits / total, 4) if total else None,
+            }
+
+
+class ReadThroughCache:
+    def __init__(self, name, loader, many_loader=None):
+        self.name = name
+        self.loader = loader
+        self.many_loader = many_loader
+        self.local = TTLCache(settings.FACEPAY_CACHE_MAXSIZE, settings.FACEPAY_CACHE_LOCAL_TTL)
+        self.shared_hits = 0
+        self.loads = 0
+
+    @property
+    def shared(self):
+        return caches[settings.FACEPAY_CACHE_ALIAS]
+
+    def shared_key(self, key):
+        return f'facepay:{self.name}:{key}'
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not MISSING:
+            return value
+        value = self.shared.get(self.shared_key(key), MISSING)
+        if value is MISSING:
+            self.loads += 1
+            value = self.loader(key)
+            self.shared.set(self.shared_key(key), value, shared_ttl())
+        else:
+            self.shared_hits += 1
+        self.local.set(key, value)
+        return value
+
+    def get_many(self, keys):
+        found, pending = {}, []
+        for key in keys:
+            value = self.local.get(key)
+            if value is MISSING:
+                pending.append(key)
+            else:
+                found[key] = value
+
+        if pending:
+            shared = self.shared.get_many([self.shared_key(key) for key in pending])
+            missing = []
+            for key in pending:
+                value = shared.get(self.shared_key(key), MISSING)
+                if value is MISSING:
+                    missing.append(key)
+                else:
+                    self.shared_hits += 1
+                    found[key] = value
+                    self.local.set(key, value)
+            if missing:
+                self.loads += 1
+                loaded = self.many_loader(missing) if self.many_loader else {key: self.loader(key) for key in missing}
+                loaded = {key: loaded.get(key) for key in missing}
+                self.shared.set_many(
+                    {self.shared_key(key): value for key, value in loaded.items()}, shared_ttl()
+                )
+                for key, value in loaded.items():
+                    self.local.set(key, value)
+                found.update(loaded)
+        return found
+
+    def invalidate(self, key):
+        self.local.delete(key)
+        self.shared.delete(self.shared_key(key))
+
+    def stats(self):
+        return {**self.local.stats(), 'aciertos_compartidos': self.shared_hits, 'cargas_bd': self.loads}
+
+
+def _load_config(key):
+    config = ConfigSistema.objects.order_by('id').values_list('configuraciones', flat=True).first()
+    return config or {}
+
+
+def _load_terminal(terminal_id):
+    return Terminal.objects.filter(pk=terminal_id).first()
+
+
+config_cache = ReadThroughCache('config', _load_config)
+terminal_cache = ReadThroughCache('terminal', _load_terminal, Terminal.objects.in_bulk)
+
+
+def get_config():
+    return config_cache.get('actual')
+
+
+def get_config_value(name, default=None):
+    return get_config().get(name, default)
+
+
+def get_terminal(terminal_id):
+    return terminal_cache.get(int(terminal_id))
+
+
+def get_terminals(terminal_ids):
+    return {key: value for key, value in terminal_cache.get_many(terminal_ids).items() if value is not None}
+
+
+def match_threshold():
+    return float(get_config_value('umbral_coincidencia', settings.FACEPAY_MATCH_THRESHOLD))
+
+
+def invalidate_config():
+    config_cache.invalidate('actual')
+
+
+def invalidate_terminal(terminal_id):
+    terminal_cache.invalidate(terminal_id)
+
+
+def cache_stats():
+    return {cache.name: cache.stats() for cache in (config_cache, terminal_cache)}
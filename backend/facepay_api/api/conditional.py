@@ -0,0 +1,73 @@
+import hashlib
+import time
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import ConfigSistema, Direccion, Empleado, InfoContacto, Terminal, Usuario, VersionModelo
+
+VERSIONED_MODELS = (Empleado, InfoContacto, Direccion, Usuario, Terminal, ConfigSistema)
+
+
+def _ensure(tables):
+    # Counters start from the clock so a row that is deleted and created again never repeats an old value
+    VersionModelo.objects.bulk_create(
+        [VersionModelo(tabla=table, version=time.time_ns() // 1000) for table in tables], ignore_conflicts=True
+    )
+
+
+def bump_version(model):
+    # The counter lives in the database and is bumped inside the writing transaction, so every
+    # process sees the new version exactly when the change becomes visible
+    table = model._meta.db_table
+    bumped = VersionModelo.objects.filter(tabla=table).update(version=F('version') + 1, modificado_en=timezone.now())
+    if not bumped:
+        _ensure([table])
+        VersionModelo.objects.filter(tabla=table).update(version=F('version') + 1, modificado_en=timezone.now())
+
+
+def get_versions(models):
+    tables = [model._meta.db_table for model in models]
+    found = {row.tabla: row for row in VersionModelo.objects.filter(tabla__in=tables)}
+    if len(found) < len(tables):
+        _ensure([table for table in tables if table not in found])
+        found = {row.tabla: row for row in VersionModelo.objects.filter(tabla__in=tables)}
+    versions = [found[table].version for table in tables]
+    modified = max(found[table].modificado_en for table in tables).timestamp()
+    return versions, modified
+
+
+class ConditionalGetMixin:
+    etag_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def get_etag(self, request, versions):
+        digest = hashlib.sha256(request.get_full_path().encode('utf-8'))
+        digest.update(request.accepted_renderer.format.encode('utf-8'))
+        digest.update(repr(versions).encode('utf-8'))
+        return f'"{digest.hexdigest()[:32]}"'
+
+    def conditional(self, handler, request, *args, **kwargs):
+        versions, modified = get_versions(self.etag_models or (self.queryset.model,))
+        etag = self.get_etag(request, versions)
+        # HTTP dates have one-second resolution: only advertise a second that has already ended,
+        # so a later change in that same second cannot hide behind If-Modified-Since
+        last_modified = int(modified) if modified and int(modified) < int(time.time()) else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,112 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import TimedSerializerMixin
+
+
+def parse_paths(value):
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def _nested(field):
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.BaseSerializer):
+        return field
+    return None
+
+
+def restrict_fields(serializer, expand=None, fields=None):
+    for name in list(serializer.fields):
+        nested = _nested(serializer.fields[name])
+        if nested is None:
+            if fields and name not in fields:
+                serializer.fields.pop(name)
+            continue
+        wanted = name in fields if fields else expand is None or name in expand
+        if not wanted:
+            serializer.fields.pop(name)
+            continue
+        restrict_fields(
+            nested,
+            expand.get(name, {}) if expand is not None else None,
+            fields.get(name) if fields else None,
+        )
+
+
+class ExpandableSerializerMixin(TimedSerializerMixin):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        expand = parse_paths(request.query_params.get('expand'))
+        fields = parse_paths(request.query_params.get('fields'))
+        if expand is not None or fields:
+            restrict_fields(self, expand, fields)
+
+
+def _plan(model, serializer, prefix, select, prefetch, only, sparse):
+    complete = True
+    only.append(prefix + model._meta.pk.name)
+    for field in serializer.fields.values():
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            complete = False
+            continue
+
+        nested = _nested(field)
+        if nested is None:
+            if model_field.concrete:
+                only.append(prefix + field.source)
+            else:
+                complete = False
+            continue
+
+        if model_field.many_to_one or model_field.one_to_one:
+            path = prefix + field.source
+            if model_field.concrete:
+                only.append(path)
+            select.append(path)
+            complete &= _plan(model_field.related_model, nested, path + '__', select, prefetch, only, sparse)
+        else:
+            queryset = plan_queryset(
+                model_field.related_model._default_manager.all(), nested, sparse,
+                required=[model_field.remote_field.name] if model_field.one_to_many else [],
+            )
+            prefetch.append(Prefetch(prefix + field.source, queryset=queryset))
+    return complete
+
+
+def plan_queryset(queryset, serializer, sparse=False, required=()):
+    select, prefetch, only = [], [], list(required)
+    complete = _plan(queryset.model, serializer, '', select, prefetch, only, sparse)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if sparse and complete:
+        queryset = queryset.only(*only)
+    return queryset
+
+
+class ExpandableViewSetMixin:
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = getattr(self, 'request', None)
+        if request is None or not issubclass(self.get_serializer_class(), ExpandableSerializerMixin):
+            return queryset
+        sparse = bool(request.query_params.get('fields')) and request.method in SAFE_METHODS
+        return plan_queryset(queryset, self.get_serializer(), sparse)
@@ -0,0 +1,112 @@
+from django.db import IntegrityError, transaction
+
+from .attendance import apply_attendance_marks
+from .cache import get_terminals
+from .models import Empleado, EventoProcesado, IntentoAcceso, ResultadoReconocimiento
+from .serializers import EventoTerminalSerializer
+
+
+def ingest_events(events):
+    errores, valid = [], []
+    for indice, raw in enumerate(events):
+        serializer = EventoTerminalSerializer(data=raw)
+        if serializer.is_valid():
+            valid.append((indice, serializer.validated_data))
+        else:
+            errores.append({'indice': indice, 'errores': serializer.errors})
+
+    event_ids = [event['id_evento'] for _, event in valid]
+    seen = set(EventoProcesado.objects.filter(id_evento__in=event_ids).values_list('id_evento', flat=True))
+    fresh, duplicados = [], 0
+    for indice, event in valid:
+        if event['id_evento'] in seen:
+            duplicados += 1
+            continue
+        seen.add(event['id_evento'])
+        fresh.append((indice, event))
+
+    codes = {event['codigo_empleado'] for _, event in fresh if event.get('codigo_empleado')}
+    ids_by_code = dict(
+        Empleado.objects.filter(codigo_empleado__in=codes).values_list('codigo_empleado', 'id')
+    ) if codes else {}
+    explicit_ids = {event['id_empleado'] for _, event in fresh if event.get('id_empleado')}
+    known_ids = set(
+        Empleado.objects.filter(id__in=explicit_ids).values_list('id', flat=True)
+    ) if explicit_ids else set()
+    terminal_ids = {event['id_terminal'] for _, event in fresh if event.get('id_terminal')}
+    terminals = get_terminals(terminal_ids) if terminal_ids else {}
+
+    rows = []
+    for indice, event in fresh:
+        terminal_id = event.get('id_terminal')
+        if terminal_id and terminal_id not in terminals:
+            errores.append({'indice': indice, 'errores': {'id_terminal': ['La terminal no existe']}})
+            continue
+        employee_id = event.get('id_empleado')
+        if employee_id not in known_ids:
+            employee_id = ids_by_code.get(event.get('codigo_empleado'))
+        rows.append((event, terminal_id, employee_id))
+
+    # Two retries of the same batch can pass the duplicate check at once; the loser of the
+    # evento_procesado primary key race drops the events the winner already stored and writes the rest
+    while True:
+        try:
+            intentos, resultados, asistencias = _store(rows, terminals)
+            break
+        except IntegrityError:
+            stored = set(EventoProcesado.objects.filter(
+                id_evento__in=[event['id_evento'] for event, _, _ in rows]
+            ).values_list('id_evento', flat=True))
+            if not stored:
+                raise
+            duplicados += len(stored)
+            rows = [row for row in rows if row[0]['id_evento'] not in stored]
+
+    return {
+        'recibidos': len(events),
+        'intentos_creados': len(intentos),
+        'resultados_creados': len(resultados),
+        'asistencias_actualizadas': len(asistencias),
+        'duplicados': duplicados,
+        'errores': sorted(errores, key=lambda error: error['indice']),
+    }
+
+
+def _store(rows, terminals):
+    with transaction.atomic():
+        EventoProcesado.objects.bulk_create([
+            EventoProcesado(id_evento=event['id_evento'], fecha_hora=event['fecha_hora']) for event, _, _ in rows
+        ])
+        intentos = IntentoAcceso.objects.bulk_create([
+            IntentoAcceso(
+                id_evento=event['id_evento'],
+                id_terminal_id=terminal_id,
+                fecha_hora=event['fecha_hora'],
+                metodo=event.get('metodo'),
+                resultado=event.get('resultado'),
+                referencia_empleado_id=employee_id,
+            )
+            for event, terminal_id, employee_id in rows
+        ])
+        resultados = ResultadoReconocimiento.objects.bulk_create([
+            ResultadoReconocimiento(
+                id_intento=intento,
+                coincidencia=event.get('coincidencia'),
+                id_empleado_id=employee_id,
+                confianza=event.get('confianza'),
+                fecha_hora=event['fecha_hora'],
+            )
+            for intento, (event, _, employee_id) in zip(intentos, rows)
+            if event.get('coincidencia') is not None or event.get('confianza') is not None
+        ])
+        asistencias = apply_attendance_marks([
+            (
+                employee_id,
+                event['fecha_hora'],
+                event['asistencia'],
+                terminals[terminal_id].ubicacion if terminal_id else None,
+            )
+            for event, terminal_id, employee_id in rows
+            if event.get('asistencia') and employee_id
+        ])
+    return intentos, resultados, asistencias
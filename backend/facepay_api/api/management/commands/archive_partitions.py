@@ -0,0 +1,183 @@
+import csv
+import gzip
+import io
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from api.models import EventoProcesado, IntentoAcceso
+from api.partitions import PARTITIONED_TABLES, add_months, count_default_rows, ensure_partitions, list_partitions
+
+
+def _arrow_type(field):
+    if isinstance(field, models.ForeignKey):
+        field = field.target_field
+    if isinstance(field, (models.AutoField, models.IntegerField)):
+        return pa.int64()
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    return pa.string()
+
+
+def _model_for(table):
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            return model
+    raise CommandError(f'No hay un modelo para la tabla {table}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea por adelantado las particiones mensuales de intento_acceso y resultado_reconocimiento, y exporta a '
+        'archivos comprimidos (Parquet con zstd, o CSV gzip sin pyarrow) las particiones más antiguas que la '
+        'retención antes de separarlas y eliminarlas. Pensado para ejecutarse una vez al día desde cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retencion', type=int, default=settings.FACEPAY_PARTITION_RETENTION_MONTHS,
+                            help='Meses completos que se conservan en la base de datos además del mes actual')
+        parser.add_argument('--adelantar', type=int, default=settings.FACEPAY_PARTITION_PREMAKE_MONTHS,
+                            help='Meses futuros cuyas particiones se crean por adelantado')
+        parser.add_argument('--formato', choices=['parquet', 'csv'], default='parquet' if pa else 'csv')
+        parser.add_argument('--destino', default=settings.FACEPAY_ARCHIVE_DIR)
+        parser.add_argument('--conservar', action='store_true',
+                            help='Separa las particiones archivadas pero no las elimina')
+        parser.add_argument('--simular', action='store_true', help='Muestra qué se haría sin cambiar nada')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El particionado solo está disponible en PostgreSQL')
+        if options['formato'] == 'parquet' and pa is None:
+            raise CommandError('El formato parquet requiere pyarrow; instálalo o usa --formato csv')
+
+        hoy = timezone.now().date().replace(day=1)
+        limite = add_months(hoy, -options['retencion'])
+        for table in PARTITIONED_TABLES:
+            if not options['simular']:
+                creadas = ensure_partitions(table, hoy, add_months(hoy, options['adelantar']))
+                if creadas:
+                    self.stdout.write(f'{table}: {creadas} particiones nuevas')
+            pendientes = count_default_rows(table)
+            if pendientes:
+                self.stdout.write(self.style.WARNING(
+                    f'{table}: {pendientes} filas en la partición por defecto; se moverán al crear su mes'
+                ))
+
+            for partition, month in list_partitions(table):
+                if month >= limite:
+                    continue
+                if options['simular']:
+                    self.stdout.write(f'{partition}: se archivaría ({month:%Y-%m})')
+                    continue
+                self.archive(table, partition, month, options)
+
+    def archive(self, table, partition, month, options):
+        start = time.perf_counter()
+        directory = os.path.join(options['destino'], table)
+        os.makedirs(directory, exist_ok=True)
+        extension = 'parquet' if options['formato'] == 'parquet' else 'csv.gz'
+        path = os.path.join(directory, f'{partition}.{extension}')
+        temporary = f'{path}.tmp'
+        quoted_table, quoted = connection.ops.quote_name(table), connection.ops.quote_name(partition)
+
+        # Detach first so no row can reach the month between the export and the drop
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {quoted_table} DETACH PARTITION {quoted}')
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {quoted}')
+            esperadas = cursor.fetchone()[0]
+        with transaction.atomic():
+            writer = self.write_parquet if options['formato'] == 'parquet' else self.write_csv
+            exportadas = writer(_model_for(table), partition, temporary)
+        en_archivo = self.count_file(temporary, options['formato'])
+        if not esperadas == exportadas == en_archivo:
+            os.remove(temporary)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'ALTER TABLE {quoted_table} ATTACH PARTITION {quoted} FOR VALUES FROM (%s) TO (%s)',
+                    [month, add_months(month, 1)],
+                )
+            raise CommandError(
+                f'{partition}: la partición tiene {esperadas} filas y el archivo {en_archivo}; se vuelve a adjuntar'
+            )
+        os.replace(temporary, path)
+
+        if not options['conservar']:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {quoted}')
+                if table == IntentoAcceso._meta.db_table:
+                    EventoProcesado.objects.filter(
+                        fecha_hora__gte=month, fecha_hora__lt=add_months(month, 1)
+                    ).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{partition}: {exportadas:,} filas -> {path} ({os.path.getsize(path) / 1e6:.1f} MB, '
+            f'{time.perf_counter() - start:.1f} s){" conservada" if options["conservar"] else ""}'
+        ))
+
+    def count_file(self, path, formato):
+        if formato == 'parquet':
+            return pq.ParquetFile(path).metadata.num_rows
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as handle:
+            return sum(1 for _ in csv.reader(handle)) - 1
+
+    def rows(self, partition):
+        cursor = connection.chunked_cursor()
+        try:
+            cursor.execute(f'SELECT * FROM {connection.ops.quote_name(partition)}')
+            columns = [column[0] for column in cursor.description]
+            yield columns
+            while True:
+                rows = cursor.fetchmany(settings.FACEPAY_ARCHIVE_CHUNK_SIZE)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def write_parquet(self, model, partition, path):
+        chunks = self.rows(partition)
+        columns = next(chunks)
+        fields = {field.column: field for field in model._meta.concrete_fields}
+        schema = pa.schema([
+            (column, _arrow_type(fields[column]) if column in fields else pa.string()) for column in columns
+        ])
+        total = 0
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            for rows in chunks:
+                values = list(zip(*rows))
+                writer.write_table(pa.table(
+                    [pa.array(values[index], type=schema.field(index).type) for index in range(len(columns))],
+                    schema=schema,
+                ))
+                total += len(rows)
+        return total
+
+    def write_csv(self, model, partition, path):
+        chunks = self.rows(partition)
+        total = 0
+        with gzip.open(path, 'wb') as handle, io.TextIOWrapper(handle, encoding='utf-8', newline='') as text:
+            writer = csv.writer(text)
+            writer.writerow(next(chunks))
+            for rows in chunks:
+                writer.writerows(rows)
+                total += len(rows)
+        return total
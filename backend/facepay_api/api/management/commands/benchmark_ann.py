@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.ann import ExactIndex, IVFFlatIndex
+from api.biometrics import Gallery
+
+
+class Command(BaseCommand):
+    help = 'Compara recall y latencia del índice IVF frente al emparejador exacto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sintetico', type=int, default=0,
+                            help='Usa N vectores aleatorios en lugar de la base de datos')
+        parser.add_argument('--dimension', type=int, default=512)
+        parser.add_argument('--consultas', type=int, default=200)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--nlist', type=int, default=1024)
+        parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32, 64])
+        parser.add_argument('--ruido', type=float, default=0.3)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        if options['sintetico']:
+            matrix = rng.standard_normal((options['sintetico'], options['dimension']), dtype=np.float32)
+            gallery = Gallery(matrix, np.arange(len(matrix)), np.arange(len(matrix)))
+        else:
+            gallery = Gallery.from_queryset()
+        if not len(gallery):
+            self.stderr.write('La galería está vacía')
+            return
+
+        k = min(options['k'], len(gallery))
+        picks = rng.choice(len(gallery), options['consultas'])
+        queries = gallery.matrix[picks] + options['ruido'] * rng.standard_normal(
+            (len(picks), gallery.dimension), dtype=np.float32
+        ) / np.sqrt(gallery.dimension)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        exact = ExactIndex(gallery)
+        truth, exact_ms = self._run(exact, queries, k)
+        self.stdout.write(f'Galería: {len(gallery)} x {gallery.dimension}, consultas: {len(queries)}, k={k}')
+        self.stdout.write(f"{'índice':<16}{'recall@1':>10}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        self.stdout.write(self._row('exact', 1.0, 1.0, exact_ms))
+
+        start = time.perf_counter()
+        ivf = IVFFlatIndex(gallery, nlist=options['nlist']).build()
+        self.stdout.write(f'IVF construido en {time.perf_counter() - start:.2f}s (nlist={ivf.centroids.shape[0]})')
+        for nprobe in options['nprobe']:
+            ivf.nprobe = nprobe
+            found, ivf_ms = self._run(ivf, queries, k)
+            recall_1 = np.mean([a[0] == b[0] for a, b in zip(truth, found)])
+            recall_k = np.mean([len(set(a) & set(b)) / k for a, b in zip(truth, found)])
+            self.stdout.write(self._row(f'ivf nprobe={nprobe}', recall_1, recall_k, ivf_ms))
+
+    def _run(self, index, queries, k):
+        results, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            row_ids, _, scores = index.search(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(row_ids[np.argsort(-scores)][:k].tolist())
+        return results, np.array(latencies)
+
+    def _row(self, name, recall_1, recall_k, latencies):
+        return f'{name:<16}{recall_1:>10.3f}{recall_k:>10.3f}{np.percentile(latencies, 50):>10.3f}{np.percentile(latencies, 95):>10.3f}'
@@ -0,0 +1,130 @@
+import json
+import subprocess
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+
+from api.metrics import percentile
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide latencia (p50/p95/p99), peticiones por segundo y consultas SQL de cada endpoint GET registrado en el '
+        'router. Los resultados se pueden guardar en JSON y comparar entre commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=50, help='Peticiones medidas por ruta')
+        parser.add_argument('--calentamiento', type=int, default=3)
+        parser.add_argument('--filtro', help='Solo rutas que contengan este texto')
+        parser.add_argument('--token', help='Token Bearer para autenticar las peticiones')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--salida', help='Guarda los resultados en este archivo JSON')
+        parser.add_argument('--comparar', help='Archivo JSON de una ejecución anterior para mostrar la diferencia')
+
+    def handle(self, *args, **options):
+        headers = {'HTTP_HOST': options['host']}
+        if options['token']:
+            headers['HTTP_AUTHORIZATION'] = f"Bearer {options['token']}"
+        client = Client(**headers)
+
+        paths = [path for path in self.paths() if not options['filtro'] or options['filtro'] in path]
+        results = [self.measure(client, path, options['peticiones'], options['calentamiento']) for path in paths]
+
+        baseline = {}
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as handle:
+                previous = json.load(handle)
+            baseline = {row['ruta']: row for row in previous['resultados']}
+            self.stdout.write(f"Comparando con {previous.get('commit') or options['comparar']}")
+
+        self.stdout.write(
+            f"{'ruta':<58} {'estado':>6} {'consultas':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'pet/s':>8}"
+        )
+        for row in results:
+            line = (
+                f"{row['ruta']:<58} {row['estado']:>6} {row['consultas']:>9} {row['p50_ms']:>8.2f} "
+                f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['peticiones_s']:>8.0f}"
+            )
+            before = baseline.get(row['ruta'])
+            if before:
+                line += (
+                    f"  p99 {(row['p99_ms'] / before['p99_ms'] - 1) * 100 if before['p99_ms'] else 0:+.0f}%"
+                    f"  consultas {row['consultas'] - before['consultas']:+d}"
+                )
+            self.stdout.write(line)
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as handle:
+                json.dump({
+                    'commit': _commit(),
+                    'fecha': timezone.now().isoformat(),
+                    'motor': connection.vendor,
+                    'peticiones': options['peticiones'],
+                    'resultados': results,
+                }, handle, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+    def paths(self):
+        router = import_module(settings.ROOT_URLCONF).router
+        paths = []
+        for prefix, viewset, _ in router.registry:
+            queryset = getattr(viewset, 'queryset', None)
+            pk = queryset.order_by('pk').values_list('pk', flat=True).first() if queryset is not None else None
+            if hasattr(viewset, 'list'):
+                paths.append(f'/api/{prefix}/')
+            if hasattr(viewset, 'retrieve') and pk is not None:
+                paths.append(f'/api/{prefix}/{pk}/')
+            for extra in viewset.get_extra_actions():
+                if 'get' not in extra.mapping:
+                    continue
+                if not extra.detail:
+                    paths.append(f'/api/{prefix}/{extra.url_path}/')
+                elif pk is not None:
+                    paths.append(f'/api/{prefix}/{pk}/{extra.url_path}/')
+        return paths
+
+    def measure(self, client, path, total, warmup):
+        for _ in range(warmup):
+            client.get(path)
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = client.get(path)
+
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(total):
+            started = time.perf_counter()
+            client.get(path)
+            latencies.append(time.perf_counter() - started)
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            'ruta': path,
+            'estado': response.status_code,
+            'consultas': len(queries),
+            'bytes': len(response.content) if not response.streaming else None,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'peticiones_s': total / elapsed,
+        }
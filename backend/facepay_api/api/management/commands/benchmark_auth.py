@@ -0,0 +1,64 @@
+import secrets
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from api.authentication import TokenAutenticacionAuthentication, token_cache
+from api.models import TokenAutenticacion, Usuario
+
+
+class Ping(APIView):
+    authentication_classes = [TokenAutenticacionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({'usuario': request.user.id})
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Mide las peticiones autenticadas por segundo con y sin la caché de tokens'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        total = options['peticiones']
+        factory = APIRequestFactory()
+        view = Ping.as_view()
+        try:
+            with transaction.atomic():
+                usuario = Usuario.objects.create(nombre_usuario='benchmark', correo=f'{secrets.token_hex(8)}@facepay.local')
+                token = TokenAutenticacion.objects.create(
+                    token=secrets.token_hex(32), id_usuario=usuario, expira_en=timezone.now() + timedelta(hours=1)
+                )
+                header = f'Bearer {token.token}'
+                for label, cold in (('sin caché', True), ('con caché', False)):
+                    token_cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        for _ in range(total):
+                            if cold:
+                                token_cache.clear()
+                            response = view(factory.get('/ping/', HTTP_AUTHORIZATION=header))
+                            assert response.status_code == 200, response.status_code
+                        elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f'{label:<10} {total / elapsed:>10.0f} peticiones/s  '
+                        f'{elapsed / total * 1e6:>8.1f} µs/petición  {len(queries) / total:.2f} consultas/petición'
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+        token_cache.clear()
@@ -0,0 +1,53 @@
+import tempfile
+import time
+from itertools import repeat
+
+from django.core.management.base import BaseCommand
+
+from api.payroll import process_pool
+from api.receipts import receipt_reference, store_receipt
+
+
+def synthetic_receipt(number, conceptos):
+    return {
+        'id_empleado': number,
+        'empresa': 'FacePay',
+        'empleado': f'Empleado {number} Benchmark',
+        'codigo': f'BENCH-{number:06d}',
+        'documento': f'CC {10000000 + number}',
+        'cargo': 'Analista',
+        'departamento': 'Operaciones',
+        'inicio': '2026-01-01',
+        'fin': '2026-01-31',
+        'bruto': '3500000.00',
+        'deducciones': '280000.00',
+        'neto': '3220000.00',
+        'conceptos': [[f'C{index:02d}', f'Concepto {index}', f'{1000 * index + number}.00'] for index in range(conceptos)],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mide los recibos de pago en PDF renderizados por segundo con distintos números de procesos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recibos', type=int, default=5000)
+        parser.add_argument('--conceptos', type=int, default=8)
+        parser.add_argument('--trabajadores', type=int, nargs='+', default=[1, 2, 4])
+
+    def handle(self, *args, **options):
+        receipts = [synthetic_receipt(number, options['conceptos']) for number in range(options['recibos'])]
+        references = [receipt_reference(receipt) for receipt in receipts]
+        for workers in options['trabajadores']:
+            with tempfile.TemporaryDirectory() as directory:
+                start = time.perf_counter()
+                if workers > 1:
+                    with process_pool(workers) as executor:
+                        list(executor.map(store_receipt, references, receipts, repeat(directory), chunksize=50))
+                else:
+                    for referencia, receipt in zip(references, receipts):
+                        store_receipt(referencia, receipt, directory)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{workers:>3} procesos {len(receipts) / elapsed:>10.0f} recibos/s  '
+                f'{elapsed / len(receipts) * 1e3:>8.2f} ms/recibo'
+            )
@@ -0,0 +1,57 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.supabase_client import bulk_upsert
+from api.supabase_local import LocalSupabaseClient
+
+
+def threaded(function, rows, workers):
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(function, rows))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara upserts fila a fila frente a upserts por lotes contra el cliente Supabase local en memoria. '
+        'Las cifras son sintéticas: solo miden la latencia simulada por petición, no un servidor real'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=2000)
+        parser.add_argument('--lote', type=int, default=500)
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--latencia', type=float, default=0.002, help='Latencia simulada por petición, en segundos')
+
+    def handle(self, *args, **options):
+        total = options['filas']
+        rows = [
+            {'codigo_empleado': f'EMP{index:06d}', 'nombres': 'Empleado', 'apellidos': str(index), 'departamento': 'General'}
+            for index in range(total)
+        ]
+        client = LocalSupabaseClient(latency=options['latencia'])
+
+        def one(row):
+            client.table('empleado').upsert(row, on_conflict='codigo_empleado', returning='minimal').execute()
+
+        scenarios = [
+            ('fila a fila', lambda: [one(row) for row in rows]),
+            (f"{options['hilos']} hilos", lambda: threaded(one, rows, options['hilos'])),
+            (f"lotes de {options['lote']}", lambda: bulk_upsert(
+                'empleado', rows, on_conflict='codigo_empleado', chunk_size=options['lote'], client=client
+            )),
+        ]
+        self.stdout.write(
+            f"Resultados sintéticos: cliente en memoria con {options['latencia'] * 1000:.1f} ms de latencia simulada por petición"
+        )
+        for label, run in scenarios:
+            client.reset()
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            if len(client.tables['empleado']) != total:
+                raise CommandError(f"{label}: se esperaban {total} filas y hay {len(client.tables['empleado'])}")
+            self.stdout.write(
+                f'{label:<14} {total / elapsed:>10.0f} filas/s  {client.requests:>6} peticiones  {elapsed:.3f} s'
+            )
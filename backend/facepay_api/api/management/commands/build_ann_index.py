@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.ann import INDEX_CLASSES
+from api.biometrics import Gallery
+
+
+class Command(BaseCommand):
+    help = 'Construye el índice ANN de la galería biométrica y lo guarda en disco'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', choices=sorted(INDEX_CLASSES), default=settings.FACEPAY_ANN_INDEX)
+        parser.add_argument('--nlist', type=int, default=settings.FACEPAY_ANN_NLIST)
+        parser.add_argument('--ruta', default=settings.FACEPAY_ANN_INDEX_PATH)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        gallery = Gallery.from_queryset()
+        self.stdout.write(f'Galería cargada: {len(gallery)} vectores en {time.perf_counter() - start:.2f}s')
+
+        start = time.perf_counter()
+        index = INDEX_CLASSES[options['tipo']](gallery, nlist=options['nlist'])
+        index.build()
+        index.save(options['ruta'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice {options['tipo']} construido en {time.perf_counter() - start:.2f}s: {options['ruta']}"
+        ))
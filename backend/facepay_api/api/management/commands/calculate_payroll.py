@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.payroll import calculate_payroll
+
+
+class Command(BaseCommand):
+    help = 'Calcula la nómina de todos los empleados para un período YYYY-MM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('periodo')
+        parser.add_argument('--completo', action='store_true',
+                            help='Recalcula todos los empleados ignorando la marca de agua')
+
+    def handle(self, *args, **options):
+        try:
+            corrida = calculate_payroll(options['periodo'], incremental=not options['completo'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        modo = 'incremental' if corrida['incremental'] else 'completa'
+        self.stdout.write(self.style.SUCCESS(
+            f"Ejecución {modo}: {corrida['nominas']} nóminas y {corrida['conceptos']} conceptos en {corrida['segundos']}s "
+            f"({corrida['filas_por_segundo']} filas/s)"
+        ))
@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from api import views
+from api.models import (
+    Administrador, Concepto, DatosBiometricos, Direccion, Empleado, InfoContacto, IntentoAcceso,
+    ReciboPago, RegistroAsistencia, RegistroAuditoria, RegistroNomina, Reporte,
+    ResultadoReconocimiento, Terminal, Usuario
+)
+
+ENDPOINTS = [
+    ('empleados', views.EmpleadoViewSet, {}, 3),  # includes the version_modelo read behind the ETag
+    ('empleados', views.EmpleadoViewSet, {'expand': ''}, 3),
+    ('empleados', views.EmpleadoViewSet, {'expand': 'contacto'}, 3),
+    ('empleados', views.EmpleadoViewSet, {'fields': 'id,nombres,contacto.correo'}, 3),
+    ('datos-biometricos', views.DatosBiometricosViewSet, {}, 2),
+    ('datos-biometricos', views.DatosBiometricosViewSet, {'expand': 'empleado.contacto'}, 2),
+    ('intentos-acceso', views.IntentoAccesoViewSet, {}, 1),
+    ('intentos-acceso', views.IntentoAccesoViewSet, {'expand': ''}, 1),
+    ('resultados-reconocimiento', views.ResultadoReconocimientoViewSet, {}, 1),
+    ('registros-asistencia', views.RegistroAsistenciaViewSet, {}, 1),
+    ('registros-asistencia', views.RegistroAsistenciaViewSet, {'fields': 'id,fecha,empleado.nombres'}, 1),
+    ('registros-nomina', views.RegistroNominaViewSet, {}, 3),
+    ('registros-nomina', views.RegistroNominaViewSet, {'expand': ''}, 2),
+    ('conceptos', views.ConceptoViewSet, {}, 2),
+    ('recibos-pago', views.ReciboPagoViewSet, {}, 3),
+    ('recibos-pago', views.ReciboPagoViewSet, {'expand': 'empleado'}, 2),
+    ('recibos-pago', views.ReciboPagoViewSet, {'fields': 'id,generado_en,nomina.salario_neto,nomina.conceptos'}, 3),
+    ('reportes', views.ReporteViewSet, {}, 2),
+    ('auditoria', views.RegistroAuditoriaViewSet, {}, 1),
+]
+
+
+def seed(ronda, filas):
+    terminal = Terminal.objects.create(ubicacion=f'Sede {ronda}')
+    for i in range(filas):
+        key = f'{ronda}-{i}'
+        usuario = Usuario.objects.create(nombre_usuario=f'presupuesto{key}', correo=f'presupuesto{key}@facepay.local')
+        empleado = Empleado.objects.create(
+            id_usuario=usuario,
+            codigo_empleado=f'QB{key}',
+            nombres='Empleado',
+            apellidos=key,
+            id_contacto=InfoContacto.objects.create(correo=f'c{key}@facepay.local'),
+            id_direccion=Direccion.objects.create(ciudad='Bogotá'),
+        )
+        DatosBiometricos.objects.create(id_empleado=empleado, id_terminal=terminal, tipo='facial')
+        intento = IntentoAcceso.objects.create(id_terminal=terminal, referencia_empleado=empleado, resultado='exitoso')
+        ResultadoReconocimiento.objects.create(id_intento=intento, id_empleado=empleado, coincidencia=True)
+        RegistroAsistencia.objects.create(id_empleado=empleado, fecha=date(2000, 1, 1) + timedelta(days=ronda))
+        nomina = RegistroNomina.objects.create(id_empleado=empleado)
+        Concepto.objects.bulk_create([
+            Concepto(codigo=f'QB{key}-{codigo}', id_nomina=nomina, monto=1) for codigo in ('A', 'B')
+        ])
+        ReciboPago.objects.create(id_nomina=nomina, id_empleado=empleado)
+        Reporte.objects.create(titulo=key, id_admin=Administrador.objects.create(id_usuario=usuario))
+        RegistroAuditoria.objects.create(accion='presupuesto', id_usuario=usuario)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Verifica que los listados de la API usen un número fijo de consultas sin importar el número de filas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=20, help='Filas por tabla en cada ronda de datos')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        filas = options['filas']
+        rounds = []
+        try:
+            with transaction.atomic():
+                for ronda in range(2):
+                    seed(ronda, filas)
+                    rounds.append([self._count(factory, *endpoint) for endpoint in ENDPOINTS])
+                raise Rollback
+        except Rollback:
+            pass
+
+        failures = []
+        for (name, _, query, budget), first, second in zip(ENDPOINTS, *rounds):
+            label = f"/api/{name}/?{urlencode(query, safe=',')}".rstrip('?')
+            ok = first == second and second <= budget
+            self.stdout.write(f"{label:<90} {first:>3} -> {second:>3} consultas (presupuesto {budget})")
+            if not ok:
+                failures.append(label)
+        if failures:
+            raise CommandError(f"Presupuesto de consultas excedido en: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('Todos los listados respetan su presupuesto de consultas'))
+
+    def _count(self, factory, name, viewset, query, budget):
+        view = viewset.as_view({'get': 'list'})
+        request = factory.get(f'/api/{name}/', query)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+            response.render()
+        if response.status_code != 200:
+            raise CommandError(f'/api/{name}/ respondió {response.status_code}')
+        return len(queries)
@@ -0,0 +1,219 @@
+import csv
+import io
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from api.biometrics import STORAGE_DTYPE, normalize_rows
+from api.conditional import bump_version
+from api.models import DatosBiometricos, Empleado, IntentoAcceso, RegistroAsistencia, Terminal
+from api.partitions import ensure_partitions
+
+NOMBRES = [
+    'Ana', 'Luis', 'María', 'Carlos', 'Sofía', 'Jorge', 'Lucía', 'Andrés', 'Valentina', 'Diego',
+    'Camila', 'Mateo', 'Isabella', 'Santiago', 'Daniela', 'Felipe', 'Paula', 'Julián', 'Laura', 'Sebastián',
+]
+APELLIDOS = [
+    'García', 'Rodríguez', 'Martínez', 'López', 'González', 'Pérez', 'Sánchez', 'Ramírez', 'Torres', 'Flores',
+    'Rivera', 'Gómez', 'Díaz', 'Cruz', 'Morales', 'Ortiz', 'Gutiérrez', 'Castro', 'Vargas', 'Rojas',
+]
+DEPARTAMENTOS = {
+    'Operaciones': ('Operario', 2_400_000),
+    'Producción': ('Técnico de producción', 2_800_000),
+    'Logística': ('Auxiliar de logística', 2_200_000),
+    'Ventas': ('Asesor comercial', 3_000_000),
+    'Atención al Cliente': ('Agente de servicio', 2_100_000),
+    'Finanzas': ('Analista financiero', 4_500_000),
+    'Recursos Humanos': ('Analista de talento', 4_000_000),
+    'Tecnología': ('Desarrollador', 6_000_000),
+}
+
+
+def _time(seconds):
+    seconds = int(min(max(seconds, 0), 86399))
+    return datetime.min.replace(hour=seconds // 3600, minute=seconds % 3600 // 60, second=seconds % 60).time()
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos a escala (empleados, terminales, datos biométricos, asistencia e intentos de acceso). '
+        'Usa COPY en PostgreSQL y bulk_create en otros motores.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empleados', type=int, default=1000)
+        parser.add_argument('--biometricos-por-empleado', type=int, default=4)
+        parser.add_argument('--terminales', type=int, default=20)
+        parser.add_argument('--dias', type=int, default=30, help='Días de asistencia a generar hacia atrás desde hoy')
+        parser.add_argument('--intentos', type=int, default=100_000)
+        parser.add_argument('--dimension', type=int, default=128)
+        parser.add_argument('--lote', type=int, default=10_000)
+        parser.add_argument('--prefijo', default='SYN', help='Prefijo de codigo_empleado y ubicación de terminal')
+        parser.add_argument('--semilla', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.batch = options['lote']
+        self.rng = np.random.default_rng(options['semilla'])
+        self.now = timezone.now()
+        prefijo = options['prefijo']
+        if Empleado.objects.filter(codigo_empleado__startswith=prefijo).exists():
+            raise CommandError(f"Ya existen empleados con el prefijo '{prefijo}'; usa otro --prefijo")
+
+        terminals = self.terminals(prefijo, options['terminales'])
+        employee_ids = self.employees(prefijo, options['empleados'])
+        self.biometrics(employee_ids, terminals, options['biometricos_por_empleado'], options['dimension'])
+
+        hasta = timezone.localdate()
+        desde = hasta - timedelta(days=options['dias'] - 1)
+        self.attendance(employee_ids, terminals, desde, hasta)
+        self.attempts(employee_ids, terminals, desde, options['dias'], options['intentos'])
+        bump_version(Empleado)
+        bump_version(Terminal)
+        self.stdout.write('Recuerda reconstruir los resúmenes (rebuild_attendance_rollups) y el índice ANN (build_ann_index)')
+
+    def write(self, model, columns, rows):
+        start = time.perf_counter()
+        total = 0
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == self.batch:
+                total += self.flush(model, columns, chunk)
+                chunk = []
+        if chunk:
+            total += self.flush(model, columns, chunk)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{model._meta.db_table:<22} {total:>12,} filas  {elapsed:>8.1f} s  {total / max(elapsed, 1e-9):>10,.0f} filas/s'
+        )
+        return total
+
+    def flush(self, model, columns, rows):
+        if connection.vendor != 'postgresql':
+            model.objects.bulk_create([model(**dict(zip(columns, row))) for row in rows], batch_size=self.batch)
+            return len(rows)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\x' + value.hex() if isinstance(value, bytes) else value for value in row])
+        buffer.seek(0)
+        db_columns = {field.attname: field.column for field in model._meta.concrete_fields}
+        names = ', '.join(db_columns[column] for column in columns)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {model._meta.db_table} ({names}) FROM STDIN WITH (FORMAT csv)', buffer)
+        return len(rows)
+
+    def terminals(self, prefijo, total):
+        rows = (
+            (f'{prefijo} Puerta {index + 1}', f'10.0.{index // 250}.{index % 250 + 1}', '2.4.1', 'activo')
+            for index in range(total)
+        )
+        self.write(Terminal, ['ubicacion', 'direccion_ip', 'version_firmware', 'estado'], rows)
+        return list(
+            Terminal.objects.filter(ubicacion__startswith=f'{prefijo} Puerta ').order_by('id').values_list('id', 'ubicacion')
+        )
+
+    def employees(self, prefijo, total):
+        departamentos = list(DEPARTAMENTOS)
+
+        def rows():
+            for start in range(0, total, self.batch):
+                size = min(self.batch, total - start)
+                nombres = self.rng.integers(len(NOMBRES), size=size)
+                apellidos = self.rng.integers(len(APELLIDOS), size=(size, 2))
+                departamento = self.rng.integers(len(departamentos), size=size)
+                factor = self.rng.lognormal(0, 0.2, size=size)
+                for offset in range(size):
+                    index = start + offset
+                    nombre_departamento = departamentos[departamento[offset]]
+                    cargo, base = DEPARTAMENTOS[nombre_departamento]
+                    yield (
+                        NOMBRES[nombres[offset]],
+                        f'{APELLIDOS[apellidos[offset, 0]]} {APELLIDOS[apellidos[offset, 1]]}',
+                        'CC',
+                        10_000_000 + index,
+                        cargo,
+                        nombre_departamento,
+                        f'{prefijo}{index:07d}',
+                        round(base * factor[offset], -3),
+                        self.now,
+                    )
+
+        self.write(Empleado, [
+            'nombres', 'apellidos', 'tipo_documento', 'numero_documento', 'cargo', 'departamento',
+            'codigo_empleado', 'salario', 'actualizado_en',
+        ], rows())
+        return np.array(
+            Empleado.objects.filter(codigo_empleado__startswith=prefijo).order_by('id').values_list('id', flat=True)
+        )
+
+    def biometrics(self, employee_ids, terminals, per_employee, dimension):
+        def rows():
+            step = max(self.batch // max(per_employee, 1), 1)
+            for start in range(0, len(employee_ids), step):
+                ids = employee_ids[start:start + step]
+                base = self.rng.standard_normal((len(ids), dimension))
+                for _ in range(per_employee):
+                    vectors = normalize_rows(base + 0.15 * self.rng.standard_normal(base.shape)).astype(STORAGE_DTYPE)
+                    terminal = self.rng.integers(len(terminals), size=len(ids))
+                    for offset, employee_id in enumerate(ids):
+                        yield (
+                            'facial', vectors[offset].tobytes(), dimension, STORAGE_DTYPE, self.now, self.now,
+                            terminals[terminal[offset]][0], int(employee_id),
+                        )
+
+        self.write(DatosBiometricos, [
+            'tipo', 'vector', 'dimension', 'dtype', 'registrado_en', 'actualizado_en', 'id_terminal_id', 'id_empleado_id',
+        ], rows())
+
+    def attendance(self, employee_ids, terminals, desde, hasta):
+        def rows():
+            fecha = desde
+            while fecha <= hasta:
+                if fecha.weekday() < 5:
+                    present = employee_ids[self.rng.random(len(employee_ids)) < 0.93]
+                    entrada = self.rng.normal(8 * 3600, 900, len(present))
+                    salida = entrada + self.rng.normal(9 * 3600, 1800, len(present))
+                    sin_salida = self.rng.random(len(present)) < (0.5 if fecha == hasta else 0.03)
+                    terminal = self.rng.integers(len(terminals), size=len(present))
+                    for offset, employee_id in enumerate(present):
+                        yield (
+                            int(employee_id), fecha, _time(entrada[offset]),
+                            None if sin_salida[offset] else _time(salida[offset]),
+                            terminals[terminal[offset]][1], True, self.now,
+                        )
+                fecha += timedelta(days=1)
+
+        self.write(RegistroAsistencia, [
+            'id_empleado_id', 'fecha', 'hora_entrada', 'hora_salida', 'terminal_origen', 'estado', 'actualizado_en',
+        ], rows())
+
+    def attempts(self, employee_ids, terminals, desde, dias, total):
+        tz = timezone.get_current_timezone()
+        origin = datetime.combine(desde, datetime.min.time(), tzinfo=tz).timestamp()
+        if connection.vendor == 'postgresql':
+            ensure_partitions(IntentoAcceso._meta.db_table, desde, desde + timedelta(days=dias))
+
+        def rows():
+            for start in range(0, total, self.batch):
+                size = min(self.batch, total - start)
+                moments = origin + self.rng.integers(dias, size=size) * 86400 + self.rng.uniform(6 * 3600, 20 * 3600, size)
+                exitoso = self.rng.random(size) < 0.92
+                facial = self.rng.random(size) < 0.9
+                empleado = employee_ids[self.rng.integers(len(employee_ids), size=size)]
+                terminal = self.rng.integers(len(terminals), size=size)
+                for offset in range(size):
+                    yield (
+                        terminals[terminal[offset]][0],
+                        datetime.fromtimestamp(moments[offset], tz=tz),
+                        'facial' if facial[offset] else 'tarjeta',
+                        'exitoso' if exitoso[offset] else 'fallido',
+                        int(empleado[offset]) if exitoso[offset] else None,
+                    )
+
+        self.write(IntentoAcceso, ['id_terminal_id', 'fecha_hora', 'metodo', 'resultado', 'referencia_empleado_id'], rows())
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.receipts import generate_receipts
+
+
+class Command(BaseCommand):
+    help = 'Genera los recibos de pago en PDF de todas las nóminas de un período YYYY-MM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('periodo')
+        parser.add_argument('--trabajadores', type=int, help='Procesos que renderizan PDFs (por defecto FACEPAY_RECEIPT_WORKERS)')
+        parser.add_argument('--lote', type=int, help='Nóminas leídas por consulta')
+        parser.add_argument('--forzar', action='store_true', help='Vuelve a renderizar aunque el recibo no haya cambiado')
+
+    def handle(self, *args, **options):
+        try:
+            corrida = generate_receipts(
+                options['periodo'], workers=options['trabajadores'], batch_size=options['lote'], force=options['forzar']
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"{corrida['recibos']} recibos: {corrida['renderizados']} renderizados, {corrida['sin_cambios']} sin cambios, "
+            f"con {corrida['trabajadores']} procesos en {corrida['segundos']}s ({corrida['recibos_por_segundo']} recibos/s)"
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Reporte
+from api.reports import FORMATS, report_path, write_report
+
+
+class Command(BaseCommand):
+    help = 'Genera el archivo de un Reporte a partir de sus filtros y lo registra en referencia_archivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('id_reporte', type=int)
+        parser.add_argument('--formato', choices=sorted(FORMATS))
+
+    def handle(self, *args, **options):
+        try:
+            reporte = Reporte.objects.get(pk=options['id_reporte'])
+        except Reporte.DoesNotExist:
+            raise CommandError(f"Reporte {options['id_reporte']} no existe")
+
+        start = time.perf_counter()
+        try:
+            referencia, size = write_report(reporte, options['formato'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f'Reporte generado en {time.perf_counter() - start:.2f}s ({size} bytes): {report_path(referencia)}'
+        ))
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.onboarding import detect_format, import_employees
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa empleados desde un archivo CSV o XLSX, creando en lote su contacto, dirección y usuario. '
+        'Omite los códigos, documentos y correos de usuario que ya existen e informa los errores por fila.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=['csv', 'xlsx'], help='Por defecto según la extensión del archivo')
+        parser.add_argument('--lote', type=int, help='Filas validadas e insertadas por lote')
+        parser.add_argument('--simular', action='store_true', help='Valida y detecta duplicados sin insertar')
+
+    def handle(self, *args, **options):
+        try:
+            formato = detect_format(options['archivo'], options['formato'])
+            with open(options['archivo'], 'rb') as handle:
+                resultado = import_employees(handle, formato, simular=options['simular'], chunk_size=options['lote'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for error in resultado['errores']:
+            self.stderr.write(f"Fila {error['fila']}: {json.dumps(error['errores'], ensure_ascii=False)}")
+        if resultado['errores_omitidos']:
+            self.stderr.write(f"... y {resultado['errores_omitidos']} errores más")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['filas']} filas, {resultado['validas']} válidas, {resultado['creados']} empleados creados, "
+            f"{resultado['duplicados']} duplicados, {len(resultado['errores']) + resultado['errores_omitidos']} con "
+            f"errores en {resultado['segundos']} s ({resultado['filas_por_minuto']} filas/min)"
+        ))
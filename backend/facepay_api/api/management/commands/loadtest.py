@@ -0,0 +1,127 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from api.biometrics import get_gallery
+from api.metrics import percentile
+from api.models import Empleado
+
+PATHS = {
+    'wsgi': {
+        'marcar': '/api/registros-asistencia/marcar/',
+        'identificar': '/api/datos-biometricos/identify-batch/',
+    },
+    'asgi': {
+        'marcar': '/api/terminal/marcar',
+        'identificar': '/api/terminal/identificar',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de los endpoints de terminal. Sin --url compara en el mismo proceso las vistas DRF '
+        '(WSGI, un hilo por petición concurrente) con las vistas async (ASGI). Escribe marcaciones e intentos reales.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=['marcar', 'identificar'], default='marcar')
+        parser.add_argument('--peticiones', type=int, default=2000)
+        parser.add_argument('--concurrencia', type=int, default=50)
+        parser.add_argument('--url', help='URL base de un servidor en ejecución, p. ej. http://localhost:8000')
+        parser.add_argument('--modo', choices=['asgi', 'wsgi'], default='asgi', help='Rutas a usar con --url')
+        parser.add_argument('--token', help='Token Bearer de una terminal')
+
+    def handle(self, *args, **options):
+        payloads = self.payloads(options['endpoint'], options['peticiones'])
+        headers = {'Authorization': f"Bearer {options['token']}"} if options['token'] else {}
+
+        if options['url']:
+            targets = [(f"{options['modo']} {options['url']}", options['modo'], self.remote(options['url']))]
+        else:
+            targets = [('wsgi (DRF)', 'wsgi', self.in_process_wsgi()), ('asgi (async)', 'asgi', self.in_process_asgi())]
+
+        for label, mode, runner in targets:
+            path = PATHS[mode][options['endpoint']]
+            start = time.perf_counter()
+            results = runner(path, payloads, headers, options['concurrencia'])
+            elapsed = time.perf_counter() - start
+            self.report(label, results, elapsed)
+
+    def payloads(self, endpoint, total):
+        if endpoint == 'marcar':
+            codes = list(Empleado.objects.values_list('codigo_empleado', flat=True)[:1000])
+            if not codes:
+                raise CommandError('No hay empleados; ejecuta generate_dataset o crea algunos primero')
+            return [{'codigo_empleado': random.choice(codes), 'terminal_origen': 'loadtest'} for _ in range(total)]
+
+        gallery = get_gallery()
+        if not len(gallery):
+            raise CommandError('La galería biométrica está vacía')
+        vectors = np.random.default_rng().standard_normal((total, gallery.dimension)).astype(np.float32)
+        return [{'vectores': [vector.tolist()], 'k': 1, 'metodo': 'loadtest'} for vector in vectors]
+
+    def in_process_wsgi(self):
+        app = get_wsgi_application()
+
+        def run(path, payloads, headers, concurrency):
+            local = threading.local()
+
+            def send(payload):
+                if not hasattr(local, 'client'):
+                    local.client = httpx.Client(transport=httpx.WSGITransport(app=app), base_url='http://testserver')
+                started = time.perf_counter()
+                response = local.client.post(path, json=payload, headers=headers)
+                return response.status_code, time.perf_counter() - started
+
+            with ThreadPoolExecutor(concurrency) as pool:
+                return list(pool.map(send, payloads))
+        return run
+
+    def in_process_asgi(self):
+        app = get_asgi_application()
+        return lambda *args: asyncio.run(self.drive(httpx.ASGITransport(app=app), 'http://testserver', *args))
+
+    def remote(self, url):
+        return lambda *args: asyncio.run(self.drive(None, url, *args))
+
+    async def drive(self, transport, base_url, path, payloads, headers, concurrency):
+        queue = asyncio.Queue()
+        for payload in payloads:
+            queue.put_nowait(payload)
+        results = []
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=30) as client:
+            async def worker():
+                while not queue.empty():
+                    payload = queue.get_nowait()
+                    started = time.perf_counter()
+                    try:
+                        response = await client.post(path, json=payload, headers=headers)
+                        status = response.status_code
+                    except httpx.HTTPError:
+                        status = None
+                    results.append((status, time.perf_counter() - started))
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results
+
+    def report(self, label, results, elapsed):
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for status, _ in results if status is None or status >= 400)
+        self.stdout.write(
+            f'{label:<28} {len(results) / elapsed:>8.0f} peticiones/s  '
+            f'p50 {percentile(latencies, 0.50) * 1000:>7.1f} ms  '
+            f'p95 {percentile(latencies, 0.95) * 1000:>7.1f} ms  '
+            f'p99 {percentile(latencies, 0.99) * 1000:>7.1f} ms  '
+            f'errores {errors}'
+        )
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.rollups import rebuild_attendance_rollups, rebuild_department_headcount
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los resúmenes de asistencia diaria y de empleados por departamento desde las tablas fuente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial YYYY-MM-DD (por defecto todo el historial)')
+        parser.add_argument('--hasta', help='Fecha final YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else None
+            hasta = date.fromisoformat(options['hasta']) if options['hasta'] else None
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD')
+
+        dias = rebuild_attendance_rollups(desde, hasta)
+        departamentos = rebuild_department_headcount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Resúmenes recalculados: {dias} filas diarias y {departamentos} departamentos'
+        ))
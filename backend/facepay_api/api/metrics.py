@@ -0,0 +1,223 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger('api.metrics.slow')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+METRICS = {
+    'facepay_request_duration_seconds': ('Tiempo total de la petición', DURATION_BUCKETS),
+    'facepay_db_queries': ('Consultas SQL por petición', QUERY_BUCKETS),
+    'facepay_db_duration_seconds': ('Tiempo en la base de datos por petición', DURATION_BUCKETS),
+    'facepay_serializer_duration_seconds': ('Tiempo en serializadores por petición', DURATION_BUCKETS),
+    'facepay_response_size_bytes': ('Tamaño de la respuesta', SIZE_BUCKETS),
+}
+
+_current = contextvars.ContextVar('facepay_request_stats', default=None)
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.requests = {}
+
+    def observe(self, view, method, values, status=None):
+        with self.lock:
+            if status is not None:
+                key = (view, method, str(status))
+                self.requests[key] = self.requests.get(key, 0) + 1
+            for name, value in values.items():
+                histogram = self.histograms.get((name, view, method))
+                if histogram is None:
+                    histogram = self.histograms[(name, view, method)] = Histogram(METRICS[name][1])
+                histogram.observe(value)
+
+    def render(self):
+        lines = [
+            '# HELP facepay_requests_total Peticiones atendidas',
+            '# TYPE facepay_requests_total counter',
+        ]
+        with self.lock:
+            for (view, method, status), total in sorted(self.requests.items()):
+                lines.append(f'facepay_requests_total{{view="{view}",method="{method}",status="{status}"}} {total}')
+            for name, (description, _) in METRICS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view, method), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    labels = f'view="{view}",method="{method}"'
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.requests.clear()
+
+
+registry = Registry()
+
+
+class RequestStats:
+    def __init__(self, capture_sql):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0
+        self.serializer_time = 0
+        self.serializer_depth = 0
+        self.sql = [] if capture_sql else None
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_time += elapsed
+        if stats.sql is not None and len(stats.sql) < settings.FACEPAY_SLOW_REQUEST_MAX_QUERIES:
+            stats.sql.append((elapsed, sql))
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializer_timer():
+    stats = _current.get()
+    if stats is None or stats.serializer_depth:
+        yield
+        return
+    stats.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_time += time.perf_counter() - started
+        stats.serializer_depth -= 1
+
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+    def run_validation(self, data):
+        with serializer_timer():
+            return super().run_validation(data)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'desconocida'
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    def start(self):
+        stats = RequestStats(capture_sql=settings.FACEPAY_SLOW_REQUEST_MS > 0)
+        return stats, _current.set(stats)
+
+    def finish(self, request, response, stats):
+        if not settings.FACEPAY_METRICS_ENABLED or request.path == '/api/metrics':
+            return response
+        view = _view_name(request)
+        elapsed = time.perf_counter() - stats.started
+        values = {
+            'facepay_request_duration_seconds': elapsed,
+            'facepay_db_queries': stats.queries,
+            'facepay_db_duration_seconds': stats.db_time,
+            'facepay_serializer_duration_seconds': stats.serializer_time,
+        }
+
+        if not response.streaming:
+            values['facepay_response_size_bytes'] = len(response.content)
+        elif not response.is_async:
+            response.streaming_content = self.count_stream(response.streaming_content, view, request.method)
+        registry.observe(view, request.method, values, response.status_code)
+
+        if stats.sql is not None and elapsed * 1000 >= settings.FACEPAY_SLOW_REQUEST_MS:
+            logger.warning(
+                'Petición lenta %s %s (%s): %.1f ms, %d consultas, %.1f ms en BD\n%s',
+                request.method, request.get_full_path(), view, elapsed * 1000, stats.queries, stats.db_time * 1000,
+                '\n'.join(f'  [{duration * 1000:.1f} ms] {sql}' for duration, sql in stats.sql),
+            )
+        return response
+
+    def count_stream(self, chunks, view, method):
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            registry.observe(view, method, {'facepay_response_size_bytes': size})
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class InfoContacto(models.Model):
@@ -49,6 +50,14 @@ class Usuario(models.Model):
     def __str__(self):
         return f"{self.nombre_usuario} ({self.rol})"
 
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
 
 class Administrador(models.Model):
     id_usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, primary_key=True, db_column='id_usuario')
@@ -84,6 +93,8 @@ class Empleado(models.Model):
     cargo = models.CharField(max_length=64, null=True, blank=True)
     departamento = models.CharField(max_length=64, null=True, blank=True)
     codigo_empleado = models.CharField(max_length=16, unique=True, null=True, blank=True)
+    salario = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
     id_contacto = models.ForeignKey(InfoContacto, on_delete=models.SET_NULL, null=True, blank=True, db_column='id_contacto')
     id_direccion = models.ForeignKey(Direccion, on_delete=models.SET_NULL, null=True, blank=True, db_column='id_direccion')
 
@@ -115,8 +126,11 @@ class Terminal(models.Model):
 class DatosBiometricos(models.Model):
     id = models.AutoField(primary_key=True)
     tipo = models.CharField(max_length=64, null=True, blank=True)
-    vector = models.TextField(null=True, blank=True)
+    vector = models.BinaryField(null=True, blank=True)
+    dimension = models.IntegerField(null=True, blank=True)
+    dtype = models.CharField(max_length=8, default='<f4')
     registrado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
     id_terminal = models.ForeignKey(Terminal, on_delete=models.SET_NULL, null=True, blank=True, db_column='id_terminal')
     id_empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, db_column='id_empleado')
 
@@ -132,10 +146,11 @@ class DatosBiometricos(models.Model):
 class IntentoAcceso(models.Model):
     id = models.AutoField(primary_key=True)
     id_terminal = models.ForeignKey(Terminal, on_delete=models.SET_NULL, null=True, blank=True, db_column='id_terminal')
-    fecha_hora = models.DateTimeField(auto_now_add=True)
+    fecha_hora = models.DateTimeField(default=timezone.now)
     metodo = models.CharField(max_length=16, null=True, blank=True)
     resultado = models.CharField(max_length=16, null=True, blank=True)
     referencia_empleado = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, blank=True, db_column='referencia_empleado')
+    id_evento = models.CharField(max_length=64, null=True, blank=True, db_index=True)
 
     class Meta:
         db_table = 'intento_acceso'
@@ -146,13 +161,41 @@ class IntentoAcceso(models.Model):
         return f"Acceso {self.resultado} - {self.fecha_hora}"
 
 
+class VersionModelo(models.Model):
+    tabla = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField()
+    modificado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'version_modelo'
+        verbose_name = 'Versión de Modelo'
+        verbose_name_plural = 'Versiones de Modelos'
+
+    def __str__(self):
+        return f"{self.tabla} v{self.version}"
+
+
+class EventoProcesado(models.Model):
+    # intento_acceso is partitioned on fecha_hora, so the uniqueness of id_evento lives here
+    id_evento = models.CharField(max_length=64, primary_key=True)
+    fecha_hora = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'evento_procesado'
+        verbose_name = 'Evento Procesado'
+        verbose_name_plural = 'Eventos Procesados'
+
+    def __str__(self):
+        return self.id_evento
+
+
 class ResultadoReconocimiento(models.Model):
     id = models.AutoField(primary_key=True)
     coincidencia = models.BooleanField(null=True, blank=True)
     id_empleado = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, blank=True, db_column='id_empleado')
     confianza = models.FloatField(null=True, blank=True)
-    fecha_hora = models.DateTimeField(auto_now_add=True)
-    id_intento = models.ForeignKey(IntentoAcceso, on_delete=models.CASCADE, db_column='id_intento')
+    fecha_hora = models.DateTimeField(default=timezone.now)
+    id_intento = models.ForeignKey(IntentoAcceso, on_delete=models.CASCADE, db_column='id_intento', db_constraint=False)
 
     class Meta:
         db_table = 'resultado_reconocimiento'
@@ -166,21 +209,64 @@ class ResultadoReconocimiento(models.Model):
 class RegistroAsistencia(models.Model):
     id = models.AutoField(primary_key=True)
     id_empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, db_column='id_empleado')
-    fecha = models.DateField(auto_now_add=True)
+    fecha = models.DateField(default=timezone.localdate)
     hora_entrada = models.TimeField(null=True, blank=True)
     hora_salida = models.TimeField(null=True, blank=True)
     terminal_origen = models.CharField(max_length=64, null=True, blank=True)
     estado = models.BooleanField(default=True)
+    # Department at the time of the mark, filled by a database trigger and used by the rollups
+    departamento = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    actualizado_en = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'registro_asistencia'
         verbose_name = 'Registro de Asistencia'
         verbose_name_plural = 'Registros de Asistencia'
+        constraints = [
+            models.UniqueConstraint(fields=['id_empleado', 'fecha'], name='uniq_asistencia_empleado_fecha'),
+        ]
 
     def __str__(self):
         return f"{self.id_empleado} - {self.fecha}"
 
 
+class ResumenAsistenciaDiaria(models.Model):
+    id = models.AutoField(primary_key=True)
+    fecha = models.DateField()
+    departamento = models.CharField(max_length=64, default='', blank=True)
+    terminal = models.CharField(max_length=64, default='', blank=True)
+    registros = models.IntegerField(default=0)
+    entradas = models.IntegerField(default=0)
+    salidas = models.IntegerField(default=0)
+    presentes = models.IntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'resumen_asistencia_diaria'
+        verbose_name = 'Resumen de Asistencia Diaria'
+        verbose_name_plural = 'Resúmenes de Asistencia Diaria'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'departamento', 'terminal'], name='uniq_resumen_asistencia_dia'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.departamento or 'Sin departamento'} - {self.terminal or 'Sin terminal'}"
+
+
+class ResumenDepartamento(models.Model):
+    departamento = models.CharField(max_length=64, primary_key=True, blank=True)
+    empleados = models.IntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'resumen_departamento'
+        verbose_name = 'Resumen de Departamento'
+        verbose_name_plural = 'Resúmenes de Departamento'
+
+    def __str__(self):
+        return f"{self.departamento or 'Sin departamento'}: {self.empleados}"
+
+
 class RegistroNomina(models.Model):
     id = models.AutoField(primary_key=True)
     id_empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, db_column='id_empleado')
@@ -194,6 +280,11 @@ class RegistroNomina(models.Model):
         db_table = 'registro_nomina'
         verbose_name = 'Registro de Nómina'
         verbose_name_plural = 'Registros de Nómina'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_empleado', 'inicio_periodo', 'fin_periodo'], name='uniq_nomina_empleado_periodo'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.id_empleado} - {self.inicio_periodo} a {self.fin_periodo}"
@@ -203,7 +294,8 @@ class Concepto(models.Model):
     codigo = models.CharField(max_length=24, primary_key=True)
     descripcion = models.CharField(max_length=120, null=True, blank=True)
     monto = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
-    id_nomina = models.ForeignKey(RegistroNomina, on_delete=models.CASCADE, db_column='id_nomina')
+    id_nomina = models.ForeignKey(RegistroNomina, on_delete=models.CASCADE, db_column='id_nomina', related_name='conceptos')
+    actualizado_en = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'concepto'
@@ -214,6 +306,24 @@ class Concepto(models.Model):
         return f"{self.codigo} - {self.descripcion}"
 
 
+class EjecucionNomina(models.Model):
+    id = models.AutoField(primary_key=True)
+    inicio_periodo = models.DateField()
+    fin_periodo = models.DateField()
+    marca_agua = models.DateTimeField()
+    incremental = models.BooleanField(default=True)
+    empleados_recalculados = models.IntegerField(default=0)
+    finalizada_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ejecucion_nomina'
+        verbose_name = 'Ejecución de Nómina'
+        verbose_name_plural = 'Ejecuciones de Nómina'
+
+    def __str__(self):
+        return f"Nómina {self.inicio_periodo} a {self.fin_periodo} - {self.marca_agua}"
+
+
 class ReciboPago(models.Model):
     id = models.AutoField(primary_key=True)
     id_nomina = models.ForeignKey(RegistroNomina, on_delete=models.CASCADE, db_column='id_nomina')
@@ -264,7 +374,7 @@ class RegistroAuditoria(models.Model):
     id = models.AutoField(primary_key=True)
     accion = models.CharField(max_length=150, null=True, blank=True)
     id_usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, db_column='id_usuario')
-    fecha_hora = models.DateTimeField(auto_now_add=True)
+    fecha_hora = models.DateTimeField(default=timezone.now)
     detalles = models.JSONField(null=True, blank=True)
 
     class Meta:
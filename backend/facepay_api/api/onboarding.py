@@ -0,0 +1,211 @@
+import csv
+import io
+import time
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+from .conditional import bump_version
+from .models import Direccion, Empleado, InfoContacto, Usuario
+from .search import employee_row, loaded_employee_index
+from .serializers import ImportacionEmpleadoSerializer
+
+FORMATS = ('csv', 'xlsx')
+EMPLEADO_FIELDS = (
+    'codigo_empleado', 'nombres', 'apellidos', 'tipo_documento', 'numero_documento', 'cargo', 'departamento', 'salario',
+)
+# Empleado FK -> (model, file column -> model field, columns that make the row create one)
+RELATED = {
+    'id_contacto': (InfoContacto, {'telefono': 'telefono', 'correo': 'correo'}, ('telefono', 'correo')),
+    'id_direccion': (
+        Direccion,
+        {'calle': 'calle', 'ciudad': 'ciudad', 'estado': 'estado', 'codigo_postal': 'codigo_postal'},
+        ('calle', 'ciudad', 'estado', 'codigo_postal'),
+    ),
+    'id_usuario': (
+        Usuario, {'correo_usuario': 'correo', 'nombre_usuario': 'nombre_usuario', 'rol': 'rol'}, ('correo_usuario',)
+    ),
+}
+
+
+def detect_format(name, formato=None):
+    formato = (formato or (name.rsplit('.', 1)[-1] if '.' in name else 'csv')).lower()
+    if formato not in FORMATS:
+        raise ValueError(f"Formato inválido. Use uno de: {', '.join(FORMATS)}")
+    if formato == 'xlsx' and load_workbook is None:
+        raise ValueError('El formato xlsx requiere openpyxl')
+    return formato
+
+
+def _header(values):
+    return [str(value or '').strip().lower().replace(' ', '_') for value in values]
+
+
+def _csv_rows(handle):
+    text = io.TextIOWrapper(handle, encoding='utf-8-sig', newline='')
+    try:
+        first = text.readline()
+        delimiter = ';' if first.count(';') > first.count(',') else ','
+        reader = csv.reader(chain([first], text), delimiter=delimiter)
+        header = _header(next(reader, []))
+        for fila, values in enumerate(reader, start=2):
+            yield fila, dict(zip(header, values))
+    finally:
+        text.detach()
+
+
+def _xlsx_rows(handle):
+    workbook = load_workbook(handle, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _header(next(rows, []))
+        for fila, values in enumerate(rows, start=2):
+            yield fila, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def read_rows(handle, formato):
+    rows = _xlsx_rows(handle) if formato == 'xlsx' else _csv_rows(handle)
+    for fila, raw in rows:
+        cleaned = {}
+        for name, value in raw.items():
+            if isinstance(value, str):
+                value = value.strip()
+            if name and value not in (None, ''):
+                cleaned[name] = value
+        if cleaned:
+            yield fila, cleaned
+
+
+class EmployeeImport:
+    def __init__(self, simular=False):
+        self.simular = simular
+        self.codes = set()
+        self.documents = set()
+        self.emails = set()
+        self.validator = ImportacionEmpleadoSerializer()
+        self.result = {'filas': 0, 'validas': 0, 'creados': 0, 'duplicados': 0, 'errores': [], 'errores_omitidos': 0}
+
+    def error(self, fila, errores):
+        if len(self.result['errores']) < settings.FACEPAY_IMPORT_MAX_ERRORS:
+            self.result['errores'].append({'fila': fila, 'errores': errores})
+        else:
+            self.result['errores_omitidos'] += 1
+
+    def run(self, rows, chunk_size):
+        started = time.perf_counter()
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            self.result['filas'] += len(chunk)
+            self.process(chunk)
+        elapsed = time.perf_counter() - started
+        self.result['segundos'] = round(elapsed, 3)
+        self.result['filas_por_minuto'] = round(self.result['filas'] / elapsed * 60) if elapsed else None
+        self.result['errores'].sort(key=lambda error: error['fila'])
+        return self.result
+
+    def process(self, chunk):
+        valid = []
+        for fila, raw in chunk:
+            try:
+                valid.append((fila, self.validator.run_validation(raw)))
+            except ValidationError as exc:
+                self.error(fila, exc.detail)
+
+        codes = {data['codigo_empleado'] for _, data in valid}
+        documents = {data['numero_documento'] for _, data in valid if 'numero_documento' in data}
+        emails = {data['correo_usuario'] for _, data in valid if 'correo_usuario' in data}
+        for codigo, documento in Empleado.objects.filter(
+            Q(codigo_empleado__in=codes) | Q(numero_documento__in=documents)
+        ).values_list('codigo_empleado', 'numero_documento'):
+            self.codes.add(codigo)
+            self.documents.add(documento)
+        if emails:
+            self.emails.update(Usuario.objects.filter(correo__in=emails).values_list('correo', flat=True))
+
+        # Values of this chunk only count as taken once the chunk is actually inserted
+        fresh, codes, documents, emails = [], set(), set(), set()
+        for fila, data in valid:
+            documento = data.get('numero_documento')
+            correo = data.get('correo_usuario')
+            if data['codigo_empleado'] in self.codes or data['codigo_empleado'] in codes:
+                duplicate = {'codigo_empleado': ['Ya existe un empleado con este código']}
+            elif documento is not None and (documento in self.documents or documento in documents):
+                duplicate = {'numero_documento': ['Ya existe un empleado con este documento']}
+            elif correo is not None and (correo in self.emails or correo in emails):
+                duplicate = {'correo_usuario': ['Ya existe un usuario con este correo']}
+            else:
+                duplicate = None
+            if duplicate:
+                self.result['duplicados'] += 1
+                self.error(fila, duplicate)
+                continue
+            codes.add(data['codigo_empleado'])
+            if documento is not None:
+                documents.add(documento)
+            if correo is not None:
+                emails.add(correo)
+            fresh.append((fila, data))
+
+        self.result['validas'] += len(fresh)
+        if fresh and not self.simular and not self.insert(fresh):
+            return
+        self.codes |= codes
+        self.documents |= documents
+        self.emails |= emails
+
+    def insert(self, fresh):
+        related = {}
+        for name, (model, columns, triggers) in RELATED.items():
+            related[name] = {
+                position: model(**{field: data[column] for column, field in columns.items() if column in data})
+                for position, (_, data) in enumerate(fresh)
+                if any(column in data for column in triggers)
+            }
+
+        try:
+            with transaction.atomic():
+                for name, (model, _, _) in RELATED.items():
+                    if related[name]:
+                        model.objects.bulk_create(list(related[name].values()))
+                        bump_version(model)
+                empleados = Empleado.objects.bulk_create([
+                    Empleado(
+                        **{field: data[field] for field in EMPLEADO_FIELDS if field in data},
+                        **{name: related[name].get(position) for name in RELATED},
+                    )
+                    for position, (_, data) in enumerate(fresh)
+                ])
+                bump_version(Empleado)
+                rows = [employee_row(empleado) for empleado in empleados]
+                transaction.on_commit(lambda: self.index(rows))
+        except IntegrityError:
+            for fila, _ in fresh:
+                self.error(fila, {'non_field_errors': ['Otro proceso creó un registro igual durante la importación']})
+            self.result['validas'] -= len(fresh)
+            return False
+        self.result['creados'] += len(empleados)
+        return True
+
+    def index(self, rows):
+        index = loaded_employee_index()
+        if index is not None:
+            for row in rows:
+                index.add(row)
+
+
+def import_employees(handle, formato, simular=False, chunk_size=None):
+    rows = read_rows(handle, formato)
+    return EmployeeImport(simular).run(rows, chunk_size or settings.FACEPAY_IMPORT_CHUNK_SIZE)
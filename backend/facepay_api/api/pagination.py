@@ -0,0 +1,136 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection
+from django.db.models import F, Field, Func, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def approximate_count(queryset):
+    if connection.vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class RowValue(Func):
+    function = ''
+    template = '(%(expressions)s)'
+    output_field = Field()
+
+
+class KeysetPagination(BasePagination):
+    ordering = 'fecha_hora'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    total_query_param = 'total'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.total = None
+        if request.query_params.get(self.total_query_param) == 'aproximado':
+            self.total = approximate_count(queryset)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+        descending = (request.query_params.get(api_settings.ORDERING_PARAM) != self.ordering) != reverse
+        if cursor is not None:
+            field = queryset.model._meta.get_field(self.ordering)
+            try:
+                value = field.to_python(cursor['v'])
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            # A row-value comparison lets the (key, id) index bound the scan; the equivalent OR does not
+            comparison = LessThan if descending else GreaterThan
+            queryset = queryset.filter(comparison(
+                RowValue(F(self.ordering), F('id')),
+                RowValue(Value(value, output_field=field), Value(cursor['id'])),
+            ))
+        prefix = '-' if descending else ''
+        rows = list(queryset.order_by(f'{prefix}{self.ordering}', f'{prefix}id')[:self.page_size + 1])
+
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, more
+        else:
+            self.has_next, self.has_previous = more, cursor is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return {'v': cursor['v'], 'id': int(cursor['id']), 'r': bool(cursor.get('r'))}
+        except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        cursor = {'v': getattr(instance, self.ordering).isoformat(), 'id': instance.id, 'r': reverse}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        # count keeps the key clients expect; it is only known (approximately) with ?total=aproximado
+        return Response({
+            'count': self.total,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class EventoCursorPagination(KeysetPagination):
+    ordering = 'fecha_hora'
+
+
+class AsistenciaCursorPagination(KeysetPagination):
+    ordering = 'fecha'
@@ -0,0 +1,24 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        events = []
+        for line_number, line in enumerate(stream, start=1):
+            try:
+                line = line.decode(encoding).strip()
+            except UnicodeDecodeError:
+                raise ParseError(f'Línea {line_number}: codificación inválida')
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError as exc:
+                raise ParseError(f'Línea {line_number}: JSON inválido ({exc})')
+        return events
@@ -0,0 +1,87 @@
+import re
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+PARTITIONED_TABLES = ('intento_acceso', 'resultado_reconocimiento')
+MONTH_SUFFIX = re.compile(r'_(\d{4})(\d{2})$')
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def list_partitions(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass ORDER BY c.relname',
+            [table],
+        )
+        names = [name for name, in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = MONTH_SUFFIX.search(name)
+        if match:
+            partitions.append((name, date(int(match[1]), int(match[2]), 1)))
+    return partitions
+
+
+def ensure_partitions(table, desde, hasta):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT crear_particiones_mensuales(%s, %s, %s)', [table, desde, hasta])
+        return cursor.fetchone()[0]
+
+
+def count_default_rows(table):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [f'{table}_default'])
+        if not cursor.fetchone()[0]:
+            return 0
+        cursor.execute(f'SELECT count(*) FROM {connection.ops.quote_name(table + "_default")}')
+        return cursor.fetchone()[0]
+
+
+def _parse_bound(value, name, end):
+    try:
+        moment = parse_datetime(value)
+        day = parse_date(value) if moment is None else None
+    except ValueError:
+        moment = day = None
+    if moment is None and day is None:
+        raise ValidationError({name: ['Use YYYY-MM-DD o una fecha y hora ISO 8601']})
+    if moment is None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def partition_window(params):
+    desde = params.get('desde')
+    hasta = params.get('hasta')
+    desde = _parse_bound(desde, 'desde', end=False) if desde else None
+    hasta = _parse_bound(hasta, 'hasta', end=True) if hasta else None
+    if desde is None and settings.FACEPAY_PARTITION_WINDOW_DAYS > 0:
+        desde = (hasta or timezone.now()) - timedelta(days=settings.FACEPAY_PARTITION_WINDOW_DAYS)
+    return desde, hasta
+
+
+class PartitionWindowMixin:
+    partition_field = 'fecha_hora'
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list':
+            return queryset
+        desde, hasta = partition_window(self.request.query_params)
+        if desde is not None:
+            queryset = queryset.filter(**{f'{self.partition_field}__gte': desde})
+        if hasta is not None:
+            queryset = queryset.filter(**{f'{self.partition_field}__lt': hasta})
+        return queryset
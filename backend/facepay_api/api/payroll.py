@@ -0,0 +1,241 @@
+import calendar
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import reduce
+from operator import or_
+
+import django
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, DurationField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from .models import Concepto, EjecucionNomina, Empleado, RegistroAsistencia, RegistroNomina
+
+CENT = Decimal('0.01')
+DEVENGADO = 'DEVENGADO'
+
+
+def parse_period(period):
+    try:
+        year, month = (int(part) for part in period.split('-'))
+        inicio = date(year, month, 1)
+    except (AttributeError, ValueError):
+        raise ValueError('Formato de período inválido. Use YYYY-MM')
+    return inicio, date(year, month, calendar.monthrange(year, month)[1])
+
+
+def generated_codes():
+    return [DEVENGADO, *settings.FACEPAY_PAYROLL_DEDUCTIONS]
+
+
+def concept_code(nomina_id, code):
+    return f'{nomina_id}-{code}'
+
+
+def is_generated_concept(codigo, nomina_id):
+    return any(codigo == concept_code(nomina_id, code) for code in generated_codes())
+
+
+def generated_concepts_filter():
+    # Only "<id_nomina>-<CODE>" of the concept's own payroll is generated; a manual "X-SALUD" is not
+    nomina = Cast('id_nomina', CharField())
+    return reduce(or_, (Q(codigo=Concat(nomina, Value(f'-{code}'))) for code in generated_codes()))
+
+
+def process_pool(max_workers):
+    # Web workers already run threads (audit writer, caches); forking them can copy a held lock
+    return ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+    )
+
+
+def _money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def compute_department(rows, rates, monthly_hours):
+    results = []
+    for employee_id, salario, seconds, extras, manual_deductions in rows:
+        horas = Decimal(seconds) / 3600
+        devengado = _money(Decimal(salario or 0) / monthly_hours * horas)
+        base = devengado + extras
+        deductions = [(code, f'Deducción {code.lower()}', -_money(base * rate)) for code, rate in rates]
+        deducciones = -sum((amount for _, _, amount in deductions), Decimal('0')) + manual_deductions
+        results.append({
+            'id_empleado': employee_id,
+            'salario_base': _money(salario or 0),
+            'horas_trabajadas': float(round(horas, 2)),
+            'salario_bruto': base,
+            'deducciones': deducciones,
+            'salario_neto': base - deducciones,
+            'conceptos': [(DEVENGADO, 'Salario devengado por horas trabajadas', devengado), *deductions],
+        })
+    return results
+
+
+def changed_employees(inicio, fin, since):
+    changed = set(
+        RegistroAsistencia.objects
+        .filter(fecha__range=(inicio, fin), actualizado_en__gt=since)
+        .values_list('id_empleado', flat=True)
+        .distinct()
+    )
+    changed.update(Empleado.objects.filter(actualizado_en__gt=since).values_list('id', flat=True))
+    changed.update(
+        Concepto.objects
+        .filter(id_nomina__inicio_periodo=inicio, id_nomina__fin_periodo=fin, actualizado_en__gt=since)
+        .exclude(generated_concepts_filter())
+        .values_list('id_nomina__id_empleado', flat=True)
+        .distinct()
+    )
+    return changed
+
+
+def _worked_seconds(inicio, fin, employee_ids=None):
+    duration = ExpressionWrapper(F('hora_salida') - F('hora_entrada'), output_field=DurationField())
+    rows = RegistroAsistencia.objects.filter(
+        fecha__range=(inicio, fin), hora_entrada__isnull=False, hora_salida__isnull=False
+    )
+    if employee_ids is not None:
+        rows = rows.filter(id_empleado__in=employee_ids)
+    rows = rows.values('id_empleado').annotate(trabajado=Sum(duration))
+    return {row['id_empleado']: row['trabajado'].total_seconds() for row in rows if row['trabajado']}
+
+
+def _manual_concepts(inicio, fin, employee_ids=None):
+    rows = Concepto.objects.filter(id_nomina__inicio_periodo=inicio, id_nomina__fin_periodo=fin)
+    if employee_ids is not None:
+        rows = rows.filter(id_nomina__id_empleado__in=employee_ids)
+    rows = (
+        rows
+        .exclude(generated_concepts_filter())
+        .values('id_nomina__id_empleado')
+        .annotate(
+            devengos=Sum('monto', filter=Q(monto__gt=0)),
+            descuentos=Sum('monto', filter=Q(monto__lt=0)),
+        )
+    )
+    return {
+        row['id_nomina__id_empleado']: (row['devengos'] or Decimal('0'), -(row['descuentos'] or Decimal('0')))
+        for row in rows
+    }
+
+
+def _compute(rows_by_department, workers):
+    rates = [(code, Decimal(rate)) for code, rate in settings.FACEPAY_PAYROLL_DEDUCTIONS.items()]
+    monthly_hours = Decimal(settings.FACEPAY_PAYROLL_MONTHLY_HOURS)
+    total = sum(len(rows) for rows in rows_by_department.values())
+    if workers <= 1 or total < settings.FACEPAY_PAYROLL_PARALLEL_THRESHOLD or len(rows_by_department) < 2:
+        return [
+            result
+            for rows in rows_by_department.values()
+            for result in compute_department(rows, rates, monthly_hours)
+        ]
+
+    with process_pool(min(workers, len(rows_by_department))) as executor:
+        futures = [
+            executor.submit(compute_department, rows, rates, monthly_hours)
+            for rows in rows_by_department.values()
+        ]
+        return [result for future in futures for result in future.result()]
+
+
+def _save(inicio, fin, results):
+    nominas = [
+        RegistroNomina(
+            id_empleado_id=result['id_empleado'],
+            inicio_periodo=inicio,
+            fin_periodo=fin,
+            salario_bruto=result['salario_bruto'],
+            deducciones=result['deducciones'],
+            salario_neto=result['salario_neto'],
+        )
+        for result in results
+    ]
+    for result, nomina in zip(results, nominas):
+        result['nomina'] = nomina
+
+    with transaction.atomic():
+        # Upsert on the (empleado, período) key so overlapping runs update the same payroll
+        RegistroNomina.objects.bulk_create(
+            nominas, batch_size=1000, update_conflicts=True,
+            unique_fields=['id_empleado', 'inicio_periodo', 'fin_periodo'],
+            update_fields=['salario_bruto', 'deducciones', 'salario_neto'],
+        )
+        conceptos = Concepto.objects.bulk_create([
+            Concepto(
+                codigo=concept_code(result['nomina'].id, code),
+                descripcion=descripcion,
+                monto=monto,
+                id_nomina=result['nomina'],
+            )
+            for result in results
+            for code, descripcion, monto in result['conceptos']
+        ], batch_size=5000, update_conflicts=True, unique_fields=['codigo'],
+            update_fields=['descripcion', 'monto', 'actualizado_en'])
+
+    for result in results:
+        result['id_nomina'] = result.pop('nomina').id
+    return len(nominas), len(conceptos)
+
+
+def calculate_payroll(period, incremental=True, workers=None):
+    started = time.perf_counter()
+    inicio, fin = parse_period(period)
+    watermark = timezone.now()
+
+    employee_ids = None
+    last_run = (
+        EjecucionNomina.objects
+        .filter(inicio_periodo=inicio, fin_periodo=fin)
+        .order_by('-marca_agua')
+        .first()
+    )
+    if incremental and last_run is not None:
+        # A change stamped just before the last watermark may have committed after that run read the data
+        margin = timedelta(seconds=settings.FACEPAY_PAYROLL_WATERMARK_MARGIN_SECONDS)
+        employee_ids = changed_employees(inicio, fin, last_run.marca_agua - margin)
+
+    results, nominas, conceptos = [], 0, 0
+    if employee_ids is None or employee_ids:
+        worked = _worked_seconds(inicio, fin, employee_ids)
+        manual = _manual_concepts(inicio, fin, employee_ids)
+        empleados = Empleado.objects.values_list('id', 'departamento', 'salario')
+        if employee_ids is not None:
+            empleados = empleados.filter(id__in=employee_ids)
+
+        rows_by_department = {}
+        for employee_id, departamento, salario in empleados.iterator(chunk_size=5000):
+            extras, manual_deductions = manual.get(employee_id, (Decimal('0'), Decimal('0')))
+            rows_by_department.setdefault(departamento or '', []).append(
+                (employee_id, salario, worked.get(employee_id, 0), extras, manual_deductions)
+            )
+
+        results = _compute(rows_by_department, workers or settings.FACEPAY_PAYROLL_WORKERS)
+        nominas, conceptos = _save(inicio, fin, results)
+
+    EjecucionNomina.objects.create(
+        inicio_periodo=inicio,
+        fin_periodo=fin,
+        marca_agua=watermark,
+        incremental=employee_ids is not None,
+        empleados_recalculados=len(results),
+    )
+    elapsed = time.perf_counter() - started
+    return {
+        'periodo': period,
+        'inicio_periodo': inicio,
+        'fin_periodo': fin,
+        'incremental': employee_ids is not None,
+        'marca_agua': watermark,
+        'nominas': nominas,
+        'conceptos': conceptos,
+        'segundos': round(elapsed, 3),
+        'filas_por_segundo': round((nominas + conceptos) / elapsed, 1) if elapsed else None,
+        'resultados': results,
+    }
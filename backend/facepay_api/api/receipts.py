@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import get_config_value
+from .models import ReciboPago, RegistroNomina
+from .payroll import is_generated_concept, parse_period, process_pool
+
+# Bump when the layout changes so every receipt gets a new address and is rendered again
+RENDER_VERSION = '1'
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 50
+LEADING = 13
+LINES_PER_PAGE = 54
+WIDTH = 78
+
+NOMINA_FIELDS = (
+    'id', 'id_empleado', 'inicio_periodo', 'fin_periodo', 'salario_bruto', 'deducciones', 'salario_neto',
+    'id_empleado__codigo_empleado', 'id_empleado__nombres', 'id_empleado__apellidos', 'id_empleado__tipo_documento',
+    'id_empleado__numero_documento', 'id_empleado__cargo', 'id_empleado__departamento',
+    'conceptos__codigo', 'conceptos__descripcion', 'conceptos__monto',
+)
+
+
+def receipt_path(referencia, directory=None):
+    return os.path.join(directory or settings.FACEPAY_RECEIPTS_DIR, referencia)
+
+
+def _money(value):
+    text = f'{Decimal(value or 0):,.2f}'
+    return text.replace(',', ' ').replace('.', ',').replace(' ', '.')
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _line(label, value):
+    return f'{label[:WIDTH - 22]:<{WIDTH - 22}}{value:>22}'
+
+
+def receipt_lines(receipt):
+    lines = [
+        f"Empleado:     {receipt['empleado']}",
+        f"Código:       {receipt['codigo'] or ''}",
+        f"Documento:    {receipt['documento']}",
+        f"Cargo:        {receipt['cargo'] or ''}",
+        f"Departamento: {receipt['departamento'] or ''}",
+        f"Período:      {receipt['inicio']} a {receipt['fin']}",
+        '',
+        _line('Concepto', 'Monto'),
+        '-' * WIDTH,
+    ]
+    lines.extend(_line(f'{codigo}  {descripcion}', _money(monto)) for codigo, descripcion, monto in receipt['conceptos'])
+    lines += [
+        '-' * WIDTH,
+        _line('Salario bruto', _money(receipt['bruto'])),
+        _line('Deducciones', _money(receipt['deducciones'])),
+        _line('Neto a pagar', _money(receipt['neto'])),
+    ]
+    return lines
+
+
+def render_receipt(receipt):
+    lines = receipt_lines(receipt)
+    pages = [lines[start:start + LINES_PER_PAGE] for start in range(0, len(lines), LINES_PER_PAGE)]
+    title = _escape(f"{receipt['empresa']} - Recibo de pago")
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    ]
+    kids = []
+    for number, page in enumerate(pages, start=1):
+        y = PAGE_HEIGHT - MARGIN
+        commands = [f'BT /F1 14 Tf {MARGIN} {y} Td ({title}) Tj ET']
+        commands.append(f'BT /F1 9 Tf {PAGE_WIDTH - MARGIN - 60} {MARGIN - 20} Td (Página {number}/{len(pages)}) Tj ET')
+        commands.append(f'BT /F2 10 Tf {LEADING} TL {MARGIN} {y - 30} Td')
+        commands.extend(f'({_escape(line)}) \'' for line in page)
+        commands.append('ET')
+        stream = zlib.compress('\n'.join(commands).encode('cp1252', 'replace'))
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append((
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {len(objects)} 0 R >>'
+        ).encode('ascii'))
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode('ascii')
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+def receipt_reference(receipt):
+    digest = hashlib.sha256(RENDER_VERSION.encode('ascii'))
+    digest.update(json.dumps(receipt, sort_keys=True, default=str).encode('utf-8'))
+    key = digest.hexdigest()
+    return f'{key[:2]}/{key}.pdf'
+
+
+def store_receipt(referencia, receipt, directory):
+    # The directory is passed in because spawned pool workers do not see override_settings
+    path = receipt_path(referencia, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as handle:
+        handle.write(render_receipt(receipt))
+    os.replace(temporary, path)
+    return referencia
+
+
+def _receipts(nomina_ids, empresa):
+    rows = (
+        RegistroNomina.objects
+        .filter(id__in=nomina_ids)
+        .order_by('id', 'conceptos__codigo')
+        .values_list(*NOMINA_FIELDS)
+    )
+    receipts = {}
+    for (
+        nomina_id, employee_id, inicio, fin, bruto, deducciones, neto,
+        codigo, nombres, apellidos, tipo_documento, numero_documento, cargo, departamento,
+        concepto, descripcion, monto,
+    ) in rows:
+        receipt = receipts.get(nomina_id)
+        if receipt is None:
+            receipt = receipts[nomina_id] = {
+                'id_empleado': employee_id,
+                'empresa': empresa,
+                'empleado': f"{nombres or ''} {apellidos or ''}".strip(),
+                'codigo': codigo,
+                'documento': ' '.join(str(part) for part in (tipo_documento, numero_documento) if part is not None),
+                'cargo': cargo,
+                'departamento': departamento,
+                'inicio': str(inicio),
+                'fin': str(fin),
+                'bruto': str(bruto or 0),
+                'deducciones': str(deducciones or 0),
+                'neto': str(neto or 0),
+                'conceptos': [],
+            }
+        if concepto is not None:
+            if is_generated_concept(concepto, nomina_id):
+                concepto = concepto.split('-', 1)[1]
+            receipt['conceptos'].append([concepto, descripcion or '', str(monto or 0)])
+    return receipts
+
+
+def _save(batch, existing):
+    now = timezone.now()
+    nuevos, actualizados = [], []
+    for nomina_id, employee_id, referencia in batch:
+        recibo = existing.get(nomina_id)
+        if recibo is None:
+            nuevos.append(ReciboPago(id_nomina_id=nomina_id, id_empleado_id=employee_id, referencia_pdf=referencia))
+        else:
+            recibo.referencia_pdf = referencia
+            recibo.generado_en = now
+            actualizados.append(recibo)
+    with transaction.atomic():
+        ReciboPago.objects.bulk_create(nuevos, batch_size=1000)
+        ReciboPago.objects.bulk_update(actualizados, ['referencia_pdf', 'generado_en'], batch_size=1000)
+
+
+def generate_receipts(period, workers=None, batch_size=None, force=False, limit=None):
+    started = time.perf_counter()
+    inicio, fin = parse_period(period)
+    workers = settings.FACEPAY_RECEIPT_WORKERS if workers is None else workers
+    batch_size = batch_size or settings.FACEPAY_RECEIPT_BATCH_SIZE
+    directory = settings.FACEPAY_RECEIPTS_DIR
+    empresa = get_config_value('nombre_empresa', 'FacePay')
+
+    nomina_ids = list(
+        RegistroNomina.objects.filter(inicio_periodo=inicio, fin_periodo=fin).order_by('id').values_list('id', flat=True)
+    )
+    if limit is not None and len(nomina_ids) > limit:
+        raise ValueError(
+            f'El período {period} tiene {len(nomina_ids)} recibos y la API genera hasta {limit}. '
+            f'Use python manage.py generate_receipts {period}'
+        )
+    existing = {}
+    for recibo in ReciboPago.objects.filter(id_nomina__inicio_periodo=inicio, id_nomina__fin_periodo=fin).order_by('id'):
+        existing.setdefault(recibo.id_nomina_id, recibo)
+
+    parallel = workers > 1 and len(nomina_ids) >= settings.FACEPAY_RECEIPT_PARALLEL_THRESHOLD
+    executor = process_pool(workers) if parallel else None
+    renderizados = sin_cambios = 0
+    pending = None
+    try:
+        for start in range(0, len(nomina_ids), batch_size):
+            receipts = _receipts(nomina_ids[start:start + batch_size], empresa)
+            batch, jobs = [], []
+            for nomina_id, receipt in receipts.items():
+                referencia = receipt_reference(receipt)
+                recibo = existing.get(nomina_id)
+                exists = os.path.exists(receipt_path(referencia, directory))
+                if not force and exists and recibo is not None and recibo.referencia_pdf == referencia:
+                    sin_cambios += 1
+                    continue
+                if force or not exists:
+                    if executor is None:
+                        store_receipt(referencia, receipt, directory)
+                    else:
+                        jobs.append(executor.submit(store_receipt, referencia, receipt, directory))
+                    renderizados += 1
+                batch.append((nomina_id, receipt['id_empleado'], referencia))
+
+            # The pool renders this batch while the next one is read from the database
+            if pending is not None:
+                _wait_and_save(*pending, existing)
+            pending = (batch, jobs)
+        if pending is not None:
+            _wait_and_save(*pending, existing)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'periodo': period,
+        'recibos': len(nomina_ids),
+        'renderizados': renderizados,
+        'sin_cambios': sin_cambios,
+        'trabajadores': workers if parallel else 1,
+        'segundos': round(elapsed, 3),
+        'recibos_por_segundo': round(len(nomina_ids) / elapsed, 1) if elapsed else None,
+    }
+
+
+def _wait_and_save(batch, jobs, existing):
+    for job in jobs:
+        job.result()
+    if batch:
+        _save(batch, existing)
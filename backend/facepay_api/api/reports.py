@@ -0,0 +1,245 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime
+from itertools import chain, islice
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+from .models import IntentoAcceso, RegistroAsistencia, RegistroAuditoria, RegistroNomina
+from .serializers import FiltrosReporteSerializer
+
+EMPLEADO_COLUMNS = [
+    ('codigo_empleado', 'id_empleado__codigo_empleado'),
+    ('nombres', 'id_empleado__nombres'),
+    ('apellidos', 'id_empleado__apellidos'),
+    ('departamento', 'id_empleado__departamento'),
+]
+
+DATASETS = {
+    'asistencia': {
+        'model': RegistroAsistencia,
+        'date_field': 'fecha',
+        'order_by': ['fecha', 'id'],
+        'columns': [
+            ('id', 'id'), ('fecha', 'fecha'), ('id_empleado', 'id_empleado'), *EMPLEADO_COLUMNS,
+            ('hora_entrada', 'hora_entrada'), ('hora_salida', 'hora_salida'),
+            ('terminal_origen', 'terminal_origen'), ('estado', 'estado'),
+        ],
+        'filters': {
+            'id_empleado': 'id_empleado',
+            'departamento': 'id_empleado__departamento',
+            'estado': 'estado',
+        },
+    },
+    'nomina': {
+        'model': RegistroNomina,
+        'date_field': 'inicio_periodo',
+        'order_by': ['inicio_periodo', 'id_empleado', 'id'],
+        'columns': [
+            ('id', 'id'), ('id_empleado', 'id_empleado'), *EMPLEADO_COLUMNS,
+            ('inicio_periodo', 'inicio_periodo'), ('fin_periodo', 'fin_periodo'),
+            ('salario_bruto', 'salario_bruto'), ('deducciones', 'deducciones'), ('salario_neto', 'salario_neto'),
+        ],
+        'filters': {
+            'id_empleado': 'id_empleado',
+            'departamento': 'id_empleado__departamento',
+        },
+    },
+    'intentos': {
+        'model': IntentoAcceso,
+        'date_field': 'fecha_hora__date',
+        'order_by': ['fecha_hora', 'id'],
+        'columns': [
+            ('id', 'id'), ('fecha_hora', 'fecha_hora'), ('id_terminal', 'id_terminal'),
+            ('metodo', 'metodo'), ('resultado', 'resultado'),
+            ('id_empleado', 'referencia_empleado'), ('id_evento', 'id_evento'),
+        ],
+        'filters': {
+            'id_terminal': 'id_terminal',
+            'id_empleado': 'referencia_empleado',
+            'resultado': 'resultado',
+            'metodo': 'metodo',
+        },
+    },
+    'auditoria': {
+        'model': RegistroAuditoria,
+        'date_field': 'fecha_hora__date',
+        'order_by': ['fecha_hora', 'id'],
+        'columns': [
+            ('id', 'id'), ('fecha_hora', 'fecha_hora'), ('id_usuario', 'id_usuario'),
+            ('accion', 'accion'), ('detalles', 'detalles'),
+        ],
+        'filters': {
+            'id_usuario': 'id_usuario',
+            'accion': 'accion',
+        },
+    },
+}
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def validate_filters(filtros):
+    serializer = FiltrosReporteSerializer(data=filtros or {})
+    if not serializer.is_valid():
+        raise ValueError('; '.join(
+            f"{campo}: {' '.join(str(error) for error in errores)}" for campo, errores in serializer.errors.items()
+        ))
+    return serializer.validated_data
+
+
+def build_queryset(filtros):
+    filtros = validate_filters(filtros)
+    dataset = DATASETS.get(filtros.get('tipo'))
+    if dataset is None:
+        raise ValueError(f"Tipo de reporte inválido. Use uno de: {', '.join(DATASETS)}")
+
+    conditions = {}
+    date_field = dataset['date_field']
+    if filtros.get('periodo'):
+        conditions[f'{date_field}__range'] = filtros['periodo']
+    if filtros.get('desde'):
+        conditions[f'{date_field}__gte'] = filtros['desde']
+    if filtros.get('hasta'):
+        conditions[f'{date_field}__lte'] = filtros['hasta']
+    for name, lookup in dataset['filters'].items():
+        if filtros.get(name) is not None:
+            conditions[lookup] = filtros[name]
+
+    headers = [header for header, _ in dataset['columns']]
+    queryset = (
+        dataset['model'].objects
+        .filter(**conditions)
+        .order_by(*dataset['order_by'])
+        .values_list(*(lookup for _, lookup in dataset['columns']))
+    )
+    return headers, queryset
+
+
+class _Buffer:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, value):
+        self.chunks.append(value)
+
+    def drain(self):
+        data = ''.join(self.chunks)
+        self.chunks = []
+        return data.encode('utf-8')
+
+
+def _csv_chunks(headers, rows, batch):
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % batch == 0:
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def _ndjson_chunks(headers, rows, batch):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder, ensure_ascii=False))
+        if len(lines) == batch:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _excel_value(value):
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return value
+
+
+def _xlsx_chunks(headers, rows, batch):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Reporte')
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([_excel_value(value) for value in row])
+    with tempfile.TemporaryFile() as handle:
+        workbook.save(handle)
+        handle.seek(0)
+        while True:
+            chunk = handle.read(1024 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+
+WRITERS = {
+    'csv': _csv_chunks,
+    'ndjson': _ndjson_chunks,
+    'xlsx': _xlsx_chunks,
+}
+
+
+def report_path(referencia):
+    return os.path.join(settings.FACEPAY_REPORTS_DIR, referencia)
+
+
+def export_report(reporte, formato=None):
+    filtros = reporte.filtros or {}
+    formato = formato or filtros.get('formato') or 'csv'
+    if formato not in FORMATS:
+        raise ValueError(f"Formato inválido. Use uno de: {', '.join(FORMATS)}")
+    if formato == 'xlsx' and Workbook is None:
+        raise ValueError('El formato xlsx requiere openpyxl')
+    headers, queryset = build_queryset(filtros)
+
+    referencia = f'reporte-{reporte.id}-{timezone.now():%Y%m%d%H%M%S}.{formato}'
+    chunk_size = settings.FACEPAY_REPORT_CHUNK_SIZE
+    rows = queryset.iterator(chunk_size=chunk_size)
+    # Run the query before the response starts, so a failing filter is an error and not a truncated 200
+    rows = chain(list(islice(rows, 1)), rows)
+    return referencia, FORMATS[formato], _persist(reporte, referencia, WRITERS[formato](headers, rows, chunk_size))
+
+
+def _persist(reporte, referencia, chunks):
+    path = report_path(referencia)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f'{path}.part'
+    completed = False
+    try:
+        with open(partial, 'wb') as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+                yield chunk
+        os.replace(partial, path)
+        completed = True
+    finally:
+        if not completed and os.path.exists(partial):
+            os.remove(partial)
+
+    previous = reporte.referencia_archivo
+    type(reporte).objects.filter(pk=reporte.pk).update(referencia_archivo=referencia)
+    reporte.referencia_archivo = referencia
+    if previous and previous != referencia and os.path.exists(report_path(previous)):
+        os.remove(report_path(previous))
+
+
+def write_report(reporte, formato=None):
+    referencia, _, chunks = export_report(reporte, formato)
+    size = sum(len(chunk) for chunk in chunks)
+    return referencia, size
@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Empleado, RegistroAsistencia, ResumenAsistenciaDiaria, ResumenDepartamento
+
+COUNTERS = ['registros', 'entradas', 'salidas', 'presentes']
+
+
+def rebuild_attendance_rollups(desde=None, hasta=None):
+    rows = RegistroAsistencia.objects.all()
+    resumen = ResumenAsistenciaDiaria.objects.all()
+    if desde:
+        rows, resumen = rows.filter(fecha__gte=desde), resumen.filter(fecha__gte=desde)
+    if hasta:
+        rows, resumen = rows.filter(fecha__lte=hasta), resumen.filter(fecha__lte=hasta)
+
+    aggregated = (
+        rows
+        .annotate(
+            # The trigger-filled snapshot; databases without the trigger fall back to the current department
+            departamento_resumen=Coalesce('departamento', 'id_empleado__departamento', Value('')),
+            terminal_resumen=Coalesce('terminal_origen', Value('')),
+        )
+        .values('fecha', 'departamento_resumen', 'terminal_resumen')
+        .annotate(
+            total=Count('id'),
+            con_entrada=Count('hora_entrada'),
+            con_salida=Count('hora_salida'),
+            sin_salida=Count('id', filter=Q(hora_entrada__isnull=False, hora_salida__isnull=True)),
+        )
+    )
+    with transaction.atomic():
+        resumen.delete()
+        created = ResumenAsistenciaDiaria.objects.bulk_create([
+            ResumenAsistenciaDiaria(
+                fecha=row['fecha'],
+                departamento=row['departamento_resumen'],
+                terminal=row['terminal_resumen'],
+                registros=row['total'],
+                entradas=row['con_entrada'],
+                salidas=row['con_salida'],
+                presentes=row['sin_salida'],
+            )
+            for row in aggregated.iterator(chunk_size=5000)
+        ], batch_size=5000)
+    return len(created)
+
+
+def rebuild_department_headcount():
+    aggregated = (
+        Empleado.objects
+        .annotate(departamento_resumen=Coalesce('departamento', Value('')))
+        .values('departamento_resumen')
+        .annotate(total=Count('id'))
+    )
+    with transaction.atomic():
+        ResumenDepartamento.objects.all().delete()
+        created = ResumenDepartamento.objects.bulk_create([
+            ResumenDepartamento(departamento=row['departamento_resumen'], empleados=row['total'])
+            for row in aggregated
+        ])
+    return len(created)
+
+
+def dashboard_stats(fecha=None):
+    fecha = fecha or timezone.localdate()
+    empleados = dict(ResumenDepartamento.objects.values_list('departamento', 'empleados'))
+    del_dia = ResumenAsistenciaDiaria.objects.filter(fecha=fecha)
+    sums = {f'total_{counter}': Sum(counter) for counter in COUNTERS}
+    por_departamento = {row['departamento']: row for row in del_dia.values('departamento').annotate(**sums)}
+    por_terminal = del_dia.values('terminal').annotate(**sums).order_by('terminal')
+
+    totales = {
+        counter: sum(row[f'total_{counter}'] for row in por_departamento.values())
+        for counter in COUNTERS
+    }
+    total_employees = sum(empleados.values())
+    return {
+        'fecha': fecha,
+        'total_employees': total_employees,
+        'today_attendance': totales['registros'],
+        'present_now': totales['presentes'],
+        'absent_today': max(total_employees - totales['registros'], 0),
+        'check_outs': totales['salidas'],
+        'por_departamento': [
+            {
+                'departamento': departamento,
+                'empleados': empleados.get(departamento, 0),
+                'asistencias': por_departamento.get(departamento, {}).get('total_registros', 0),
+                'presentes': por_departamento.get(departamento, {}).get('total_presentes', 0),
+            }
+            for departamento in sorted(set(empleados) | set(por_departamento))
+        ],
+        'por_terminal': [
+            {'terminal': row['terminal'], 'asistencias': row['total_registros'], 'presentes': row['total_presentes']}
+            for row in por_terminal
+        ],
+    }
@@ -0,0 +1,172 @@
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Empleado
+
+FIELDS = ('id', 'codigo_empleado', 'nombres', 'apellidos', 'departamento', 'numero_documento')
+
+
+def normalize(value):
+    decomposed = unicodedata.normalize('NFKD', str(value).casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(value):
+    return normalize(value).split() if value else []
+
+
+def employee_row(empleado):
+    return tuple(getattr(empleado, field) for field in FIELDS)
+
+
+def employee_tokens(row):
+    _, codigo, nombres, apellidos, _, documento = row
+    tokens = tokenize(nombres) + tokenize(apellidos)
+    if codigo:
+        tokens.append(normalize(codigo))
+    if documento is not None:
+        tokens.append(str(documento))
+    return sorted(set(tokens))
+
+
+class EmployeeIndex:
+    def __init__(self, rows=()):
+        self.entries = {}
+        self.tokens = {}
+        self.strings = {}
+        pairs = []
+        for row in rows:
+            tokens = self._store(row)
+            pairs.extend((token, row[0]) for token in tokens)
+        pairs.sort()
+        self.keys = [token for token, _ in pairs]
+        self.ids = [employee_id for _, employee_id in pairs]
+        self.version = 0
+        self.lock = threading.RLock()
+        self.reconcile_lock = threading.Lock()
+        self.reconciled_at = time.monotonic()
+        self.synced_until = timezone.now()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def from_queryset(cls, queryset=None):
+        if queryset is None:
+            queryset = Empleado.objects.all()
+        synced_until = timezone.now()
+        index = cls(queryset.values_list(*FIELDS).iterator(chunk_size=5000))
+        index.synced_until = synced_until
+        return index
+
+    def _store(self, row):
+        employee_id, codigo, nombres, apellidos, departamento, _ = row
+        tokens = [self.strings.setdefault(token, token) for token in employee_tokens(row)]
+        self.entries[employee_id] = {
+            'id': employee_id,
+            'codigo_empleado': codigo,
+            'nombres': nombres,
+            'apellidos': apellidos,
+            'departamento': departamento,
+        }
+        self.tokens[employee_id] = tokens
+        return tokens
+
+    def add(self, row):
+        with self.lock:
+            self.remove(row[0], notify=False)
+            for token in self._store(row):
+                position = bisect_right(self.keys, token)
+                self.keys.insert(position, token)
+                self.ids.insert(position, row[0])
+            self.version += 1
+
+    def remove(self, employee_id, notify=True):
+        with self.lock:
+            tokens = self.tokens.pop(employee_id, None)
+            if tokens is None:
+                return False
+            del self.entries[employee_id]
+            for token in tokens:
+                position = bisect_left(self.keys, token)
+                while self.ids[position] != employee_id:
+                    position += 1
+                del self.keys[position]
+                del self.ids[position]
+            if notify:
+                self.version += 1
+            return True
+
+    def search(self, query, limit=10):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self.lock:
+            ranges = [
+                (bisect_left(self.keys, term), bisect_left(self.keys, term + '\U0010ffff'))
+                for term in terms
+            ]
+            start, end = min(ranges, key=lambda bounds: bounds[1] - bounds[0])
+            seen, results = set(), []
+            for position in range(start, end):
+                employee_id = self.ids[position]
+                if employee_id in seen:
+                    continue
+                seen.add(employee_id)
+                tokens = self.tokens[employee_id]
+                if all(any(token.startswith(term) for token in tokens) for term in terms):
+                    results.append(self.entries[employee_id])
+                    if len(results) == limit:
+                        break
+            return results
+
+    def reconcile(self, period=0):
+        # One thread reads the database while the rest keep searching; only the diff takes the lock
+        if not self.reconcile_lock.acquire(blocking=False):
+            return False
+        try:
+            if period and time.monotonic() - self.reconciled_at <= period:
+                return False
+            started = timezone.now()
+            with self.lock:
+                known = set(self.entries)
+            stored = set(Empleado.objects.values_list('id', flat=True).iterator(chunk_size=10000))
+            # Rows added by signals during the scan are not in known, so they are never removed here
+            missing = stored - known
+            changed = Empleado.objects.filter(Q(id__in=missing) | Q(actualizado_en__gte=self.synced_until))
+            rows = list(changed.values_list(*FIELDS).iterator(chunk_size=2000))
+            for employee_id in known - stored:
+                self.remove(employee_id)
+            for row in rows:
+                self.add(row)
+            self.synced_until = started
+            self.reconciled_at = time.monotonic()
+            return True
+        finally:
+            self.reconcile_lock.release()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_employee_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = EmployeeIndex.from_queryset()
+    period = settings.FACEPAY_EMPLOYEE_INDEX_RECONCILE_SECONDS
+    if period and time.monotonic() - _index.reconciled_at > period:
+        _index.reconcile(period)
+    return _index
+
+
+def loaded_employee_index():
+    return _index
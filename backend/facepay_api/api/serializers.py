@@ -1,32 +1,41 @@
+import base64
+import binascii
+
+import numpy as np
+from django.utils import timezone
 from rest_framework import serializers
+from .biometrics import STORAGE_DTYPE, decode_vector, encode_vector, parse_vector
+from .cache import get_terminal
+from .expand import ExpandableSerializerMixin
 from .models import (
     Usuario, Administrador, Operador, Empleado, InfoContacto, Direccion,
     Terminal, DatosBiometricos, IntentoAcceso, ResultadoReconocimiento,
     RegistroAsistencia, RegistroNomina, Concepto, ReciboPago,
     Reporte, ConfigSistema, RegistroAuditoria, TokenAutenticacion
 )
+from .payroll import parse_period
 
 
-class InfoContactoSerializer(serializers.ModelSerializer):
+class InfoContactoSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = InfoContacto
         fields = '__all__'
 
 
-class DireccionSerializer(serializers.ModelSerializer):
+class DireccionSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Direccion
         fields = '__all__'
 
 
-class UsuarioSerializer(serializers.ModelSerializer):
+class UsuarioSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Usuario
         fields = ['id', 'nombre_usuario', 'correo', 'rol', 'creado_en', 'actualizado_en', 'activo']
         read_only_fields = ['id', 'creado_en', 'actualizado_en']
 
 
-class AdministradorSerializer(serializers.ModelSerializer):
+class AdministradorSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     usuario = UsuarioSerializer(source='id_usuario', read_only=True)
 
     class Meta:
@@ -34,7 +43,7 @@ class AdministradorSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class OperadorSerializer(serializers.ModelSerializer):
+class OperadorSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     usuario = UsuarioSerializer(source='id_usuario', read_only=True)
 
     class Meta:
@@ -42,7 +51,7 @@ class OperadorSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class EmpleadoSerializer(serializers.ModelSerializer):
+class EmpleadoSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     contacto = InfoContactoSerializer(source='id_contacto', read_only=True)
     direccion = DireccionSerializer(source='id_direccion', read_only=True)
     usuario = UsuarioSerializer(source='id_usuario', read_only=True)
@@ -52,40 +61,91 @@ class EmpleadoSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class TerminalSerializer(serializers.ModelSerializer):
+class TerminalSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Terminal
         fields = '__all__'
 
 
-class DatosBiometricosSerializer(serializers.ModelSerializer):
+class VectorField(serializers.Field):
+    FORMATS = ('lista', 'base64')
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def get_format(self):
+        request = self.context.get('request')
+        formato = request.query_params.get('formato_vector') if request else None
+        return formato if formato in self.FORMATS else 'lista'
+
+    def to_representation(self, instance):
+        vector = decode_vector(instance.vector, instance.dtype)
+        if vector is None:
+            return None
+        if self.get_format() == 'base64':
+            return base64.b64encode(encode_vector(vector)).decode('ascii')
+        return vector.tolist()
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            try:
+                vector = np.asarray(data, dtype=np.float32)
+            except (TypeError, ValueError):
+                raise serializers.ValidationError('El vector debe ser una lista de números')
+        elif isinstance(data, str) and data.lstrip().startswith('['):
+            try:
+                vector = parse_vector(data)
+            except ValueError:
+                raise serializers.ValidationError('El vector de texto no es válido')
+        elif isinstance(data, str):
+            try:
+                raw = base64.b64decode(data, validate=True)
+            except binascii.Error:
+                raise serializers.ValidationError('El vector base64 no es válido')
+            if len(raw) % np.dtype(STORAGE_DTYPE).itemsize:
+                raise serializers.ValidationError('El vector base64 no contiene float32 completos')
+            vector = decode_vector(raw)
+        else:
+            raise serializers.ValidationError('Formato de vector no soportado')
+
+        if vector is None or vector.ndim != 1 or not vector.size:
+            raise serializers.ValidationError('El vector no puede estar vacío')
+        return {'vector': encode_vector(vector), 'dimension': vector.size, 'dtype': STORAGE_DTYPE}
+
+
+class DatosBiometricosSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     empleado = EmpleadoSerializer(source='id_empleado', read_only=True)
     terminal = TerminalSerializer(source='id_terminal', read_only=True)
+    vector = VectorField(required=False)
 
     class Meta:
         model = DatosBiometricos
         fields = '__all__'
+        read_only_fields = ['dimension', 'dtype']
 
 
-class IntentoAccesoSerializer(serializers.ModelSerializer):
+class IntentoAccesoSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     terminal = TerminalSerializer(source='id_terminal', read_only=True)
     empleado = EmpleadoSerializer(source='referencia_empleado', read_only=True)
 
     class Meta:
         model = IntentoAcceso
         fields = '__all__'
+        read_only_fields = ['fecha_hora']
 
 
-class ResultadoReconocimientoSerializer(serializers.ModelSerializer):
+class ResultadoReconocimientoSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     empleado = EmpleadoSerializer(source='id_empleado', read_only=True)
     intento = IntentoAccesoSerializer(source='id_intento', read_only=True)
 
     class Meta:
         model = ResultadoReconocimiento
         fields = '__all__'
+        read_only_fields = ['fecha_hora']
 
 
-class RegistroAsistenciaSerializer(serializers.ModelSerializer):
+class RegistroAsistenciaSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     empleado = EmpleadoSerializer(source='id_empleado', read_only=True)
 
     class Meta:
@@ -93,13 +153,13 @@ class RegistroAsistenciaSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ConceptoSerializer(serializers.ModelSerializer):
+class ConceptoSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Concepto
         fields = '__all__'
 
 
-class RegistroNominaSerializer(serializers.ModelSerializer):
+class RegistroNominaSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     empleado = EmpleadoSerializer(source='id_empleado', read_only=True)
     conceptos = ConceptoSerializer(many=True, read_only=True)
 
@@ -108,7 +168,7 @@ class RegistroNominaSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ReciboPagoSerializer(serializers.ModelSerializer):
+class ReciboPagoSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     nomina = RegistroNominaSerializer(source='id_nomina', read_only=True)
     empleado = EmpleadoSerializer(source='id_empleado', read_only=True)
 
@@ -117,31 +177,140 @@ class ReciboPagoSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ReporteSerializer(serializers.ModelSerializer):
+class ReporteSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     administrador = AdministradorSerializer(source='id_admin', read_only=True)
 
     class Meta:
         model = Reporte
         fields = '__all__'
 
+    def validate_filtros(self, value):
+        if value is None:
+            return value
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Los filtros deben ser un objeto')
+        filtros = FiltrosReporteSerializer(data=value)
+        if not filtros.is_valid():
+            raise serializers.ValidationError(filtros.errors)
+        return value
+
 
-class ConfigSistemaSerializer(serializers.ModelSerializer):
+class ConfigSistemaSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ConfigSistema
         fields = '__all__'
 
 
-class RegistroAuditoriaSerializer(serializers.ModelSerializer):
+class RegistroAuditoriaSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     usuario = UsuarioSerializer(source='id_usuario', read_only=True)
 
     class Meta:
         model = RegistroAuditoria
         fields = '__all__'
+        read_only_fields = ['fecha_hora']
 
 
-class TokenAutenticacionSerializer(serializers.ModelSerializer):
+class TokenAutenticacionSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     usuario = UsuarioSerializer(source='id_usuario', read_only=True)
 
     class Meta:
         model = TokenAutenticacion
         fields = '__all__'
+
+
+class IdentificacionSerializer(serializers.Serializer):
+    vector = serializers.ListField(child=serializers.FloatField(), min_length=1)
+    k = serializers.IntegerField(default=5, min_value=1, max_value=50)
+
+
+class IdentificacionLoteSerializer(serializers.Serializer):
+    vectores = serializers.ListField(
+        child=serializers.ListField(child=serializers.FloatField(), min_length=1),
+        min_length=1,
+        max_length=256,
+    )
+    k = serializers.IntegerField(default=1, min_value=1, max_value=50)
+    id_terminal = serializers.IntegerField(required=False, allow_null=True)
+    metodo = serializers.CharField(max_length=16, default='facial')
+
+    def validate_id_terminal(self, value):
+        if value is None:
+            return None
+        terminal = get_terminal(value)
+        if terminal is None:
+            raise serializers.ValidationError('La terminal no existe')
+        return terminal
+
+    def validate_vectores(self, value):
+        if len({len(vector) for vector in value}) > 1:
+            raise serializers.ValidationError('Todos los vectores deben tener la misma dimensión')
+        return value
+
+
+class FiltrosReporteSerializer(serializers.Serializer):
+    tipo = serializers.CharField(required=False, allow_null=True)
+    formato = serializers.CharField(required=False, allow_null=True)
+    periodo = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    desde = serializers.DateField(required=False, allow_null=True)
+    hasta = serializers.DateField(required=False, allow_null=True)
+    id_empleado = serializers.IntegerField(required=False, allow_null=True, min_value=1, max_value=2**31 - 1)
+    id_terminal = serializers.IntegerField(required=False, allow_null=True, min_value=1, max_value=2**31 - 1)
+    id_usuario = serializers.IntegerField(required=False, allow_null=True, min_value=1, max_value=2**31 - 1)
+    departamento = serializers.CharField(required=False, allow_null=True)
+    estado = serializers.BooleanField(required=False, allow_null=True, default=None)
+    resultado = serializers.CharField(required=False, allow_null=True)
+    metodo = serializers.CharField(required=False, allow_null=True)
+    accion = serializers.CharField(required=False, allow_null=True)
+
+    def validate_periodo(self, value):
+        if not value:
+            return None
+        try:
+            return parse_period(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+
+class EventoTerminalSerializer(serializers.Serializer):
+    id_evento = serializers.CharField(max_length=64)
+    id_terminal = serializers.IntegerField(required=False, allow_null=True)
+    id_empleado = serializers.IntegerField(required=False, allow_null=True)
+    codigo_empleado = serializers.CharField(max_length=16, required=False, allow_null=True)
+    fecha_hora = serializers.DateTimeField(default=timezone.now)
+    metodo = serializers.CharField(max_length=16, default='facial')
+    resultado = serializers.CharField(max_length=16, required=False, allow_null=True)
+    coincidencia = serializers.BooleanField(required=False, allow_null=True, default=None)
+    confianza = serializers.FloatField(required=False, allow_null=True)
+    asistencia = serializers.ChoiceField(choices=['entrada', 'salida'], required=False, allow_null=True)
+
+
+class MarcacionSerializer(serializers.Serializer):
+    id_empleado = serializers.IntegerField(required=False)
+    codigo_empleado = serializers.CharField(max_length=16, required=False)
+    fecha_hora = serializers.DateTimeField(required=False)
+    terminal_origen = serializers.CharField(max_length=64, required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if not attrs.get('id_empleado') and not attrs.get('codigo_empleado'):
+            raise serializers.ValidationError('Se requiere id_empleado o codigo_empleado')
+        return attrs
+
+
+class ImportacionEmpleadoSerializer(serializers.Serializer):
+    codigo_empleado = serializers.CharField(max_length=16)
+    nombres = serializers.CharField(max_length=40)
+    apellidos = serializers.CharField(max_length=40)
+    tipo_documento = serializers.CharField(max_length=64, required=False)
+    numero_documento = serializers.IntegerField(required=False, min_value=0, max_value=2**31 - 1)
+    cargo = serializers.CharField(max_length=64, required=False)
+    departamento = serializers.CharField(max_length=64, required=False)
+    salario = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, default=0)
+    telefono = serializers.CharField(max_length=16, required=False)
+    correo = serializers.EmailField(max_length=40, required=False)
+    calle = serializers.CharField(max_length=72, required=False)
+    ciudad = serializers.CharField(max_length=32, required=False)
+    estado = serializers.CharField(max_length=32, required=False)
+    codigo_postal = serializers.CharField(max_length=16, required=False)
+    correo_usuario = serializers.EmailField(max_length=72, required=False)
+    nombre_usuario = serializers.CharField(max_length=64, required=False)
+    rol = serializers.CharField(max_length=64, default='empleado')
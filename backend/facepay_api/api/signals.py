@@ -0,0 +1,135 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .authentication import revoke_token, revoke_user_tokens
+from .biometrics import decode_vector, loaded_gallery
+from .cache import invalidate_config, invalidate_terminal
+from .conditional import VERSIONED_MODELS, bump_version
+from .metrics import install_query_recorder
+from .models import (
+    ConfigSistema, Concepto, DatosBiometricos, Empleado, RegistroAsistencia, RegistroNomina, Terminal,
+    TokenAutenticacion, Usuario
+)
+from .payroll import is_generated_concept
+from .search import employee_row, loaded_employee_index
+
+
+def _on_commit_with_gallery(callback):
+    def apply():
+        gallery = loaded_gallery()
+        if gallery is not None:
+            callback(gallery)
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=DatosBiometricos)
+def sync_gallery_on_save(sender, instance, **kwargs):
+    row_id, employee_id = instance.id, instance.id_empleado_id
+    vector = decode_vector(instance.vector, instance.dtype)
+
+    def apply(gallery):
+        if vector is None:
+            gallery.remove(row_id)
+        else:
+            gallery.add(row_id, employee_id, vector.copy())
+    _on_commit_with_gallery(apply)
+
+
+@receiver(post_delete, sender=DatosBiometricos)
+def sync_gallery_on_delete(sender, instance, **kwargs):
+    row_id = instance.id
+    _on_commit_with_gallery(lambda gallery: gallery.remove(row_id))
+
+
+@receiver(post_delete, sender=Empleado)
+def sync_gallery_on_employee_delete(sender, instance, **kwargs):
+    employee_id = instance.id
+    _on_commit_with_gallery(lambda gallery: gallery.remove_employee(employee_id))
+
+
+@receiver(post_save, sender=Empleado)
+def sync_employee_index_on_save(sender, instance, **kwargs):
+    row = employee_row(instance)
+
+    def apply():
+        index = loaded_employee_index()
+        if index is not None:
+            index.add(row)
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Empleado)
+def sync_employee_index_on_delete(sender, instance, **kwargs):
+    employee_id = instance.id
+
+    def apply():
+        index = loaded_employee_index()
+        if index is not None:
+            index.remove(employee_id)
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=RegistroAsistencia)
+def mark_payroll_dirty_on_attendance_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Empleado):
+        return
+    Empleado.objects.filter(id=instance.id_empleado_id).update(actualizado_en=timezone.now())
+    bump_version(Empleado)
+
+
+@receiver(post_delete, sender=Concepto)
+def mark_payroll_dirty_on_concept_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (Empleado, RegistroNomina)) or is_generated_concept(instance.codigo, instance.id_nomina_id):
+        return
+    Empleado.objects.filter(
+        id__in=RegistroNomina.objects.filter(id=instance.id_nomina_id).values('id_empleado')
+    ).update(actualizado_en=timezone.now())
+    bump_version(Empleado)
+
+
+def bump_model_version(sender, instance, **kwargs):
+    bump_version(sender)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model)
+    post_delete.connect(bump_model_version, sender=model)
+
+
+@receiver(post_save, sender=ConfigSistema)
+@receiver(post_delete, sender=ConfigSistema)
+def invalidate_config_cache(sender, instance, **kwargs):
+    invalidate_config()
+    transaction.on_commit(invalidate_config)
+
+
+@receiver(post_save, sender=Terminal)
+@receiver(post_delete, sender=Terminal)
+def invalidate_terminal_cache(sender, instance, **kwargs):
+    terminal_id = instance.id
+    invalidate_terminal(terminal_id)
+    transaction.on_commit(lambda: invalidate_terminal(terminal_id))
+
+
+@receiver(post_save, sender=TokenAutenticacion)
+@receiver(post_delete, sender=TokenAutenticacion)
+def revoke_cached_token(sender, instance, **kwargs):
+    key = instance.token
+    revoke_token(key)
+    transaction.on_commit(lambda: revoke_token(key))
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def revoke_cached_user_tokens(sender, instance, **kwargs):
+    user_id = instance.id
+    revoke_user_tokens(user_id)
+    transaction.on_commit(lambda: revoke_user_tokens(user_id))
+
+
+@receiver(connection_created)
+def record_request_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
@@ -1,16 +1,110 @@
+import atexit
+import threading
+
+import httpx
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
+from postgrest import SyncPostgrestClient
+from postgrest.types import ReturnMethod
 from django.conf import settings
 
+from .supabase_local import LocalSupabaseClient
 
+_client = None
+_client_lock = threading.Lock()
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=settings.FACEPAY_SUPABASE_POOL_SIZE,
+        max_keepalive_connections=settings.FACEPAY_SUPABASE_POOL_SIZE,
+        keepalive_expiry=settings.FACEPAY_SUPABASE_KEEPALIVE,
+    )
+
+
+def _timeout():
+    return httpx.Timeout(settings.FACEPAY_SUPABASE_TIMEOUT, connect=settings.FACEPAY_SUPABASE_CONNECT_TIMEOUT)
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout):
+        return httpx.Client(base_url=base_url, headers=headers, timeout=_timeout(), limits=_limits())
+
+
+class PooledClient(Client):
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=None):
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema)
+
+
+def create_supabase_client():
+    if settings.FACEPAY_SUPABASE_BACKEND == 'local':
+        return LocalSupabaseClient(latency=settings.FACEPAY_SUPABASE_LOCAL_LATENCY)
 
-def get_supabase_client() -> Client:
     supabase_url = settings.SUPABASE_URL
     supabase_key = settings.SUPABASE_KEY
 
     if not supabase_url or not supabase_key:
         raise ValueError("Supabase URL and Key must be configured in settings")
 
-    return create_client(supabase_url, supabase_key)
+    options = ClientOptions(
+        postgrest_client_timeout=_timeout(),
+        storage_client_timeout=settings.FACEPAY_SUPABASE_TIMEOUT,
+    )
+    return PooledClient(supabase_url, supabase_key, options)
+
+
+def get_supabase_client() -> Client:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_supabase_client()
+                atexit.register(close_supabase_client)
+    return _client
+
+
+def close_supabase_client():
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if isinstance(client, Client) and client._postgrest is not None:
+        client._postgrest.aclose()
+
+
+def _chunks(rows, size):
+    rows = list(rows)
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def bulk_insert(table, rows, chunk_size=None, client=None):
+    client = client or get_supabase_client()
+    total = 0
+    for chunk in _chunks(rows, chunk_size or settings.FACEPAY_SUPABASE_BULK_CHUNK):
+        client.table(table).insert(chunk, returning=ReturnMethod.minimal).execute()
+        total += len(chunk)
+    return total
+
 
+def bulk_upsert(table, rows, on_conflict='', ignore_duplicates=False, chunk_size=None, client=None):
+    client = client or get_supabase_client()
+    total = 0
+    for chunk in _chunks(rows, chunk_size or settings.FACEPAY_SUPABASE_BULK_CHUNK):
+        client.table(table).upsert(
+            chunk,
+            on_conflict=on_conflict,
+            ignore_duplicates=ignore_duplicates,
+            returning=ReturnMethod.minimal,
+        ).execute()
+        total += len(chunk)
+    return total
 
 
+def bulk_delete(table, column, values, chunk_size=None, client=None):
+    client = client or get_supabase_client()
+    total = 0
+    for chunk in _chunks(values, chunk_size or settings.FACEPAY_SUPABASE_BULK_CHUNK):
+        client.table(table).delete(returning=ReturnMethod.minimal).in_(column, chunk).execute()
+        total += len(chunk)
+    return total
@@ -0,0 +1,174 @@
+import copy
+import operator
+import threading
+import time
+
+from postgrest import APIResponse
+
+FILTERS = {
+    'eq': operator.eq,
+    'neq': operator.ne,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'in_': lambda value, options: value in options,
+}
+
+
+class LocalQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.method = 'select'
+        self.payload = None
+        self.columns = None
+        self.conflict = ['id']
+        self.ignore_duplicates = False
+        self.returning = True
+        self.conditions = []
+        self.ordering = []
+        self.max_rows = None
+
+    def select(self, *columns, count=None):
+        self.method = 'select'
+        self.columns = [column for value in columns for column in value.split(',') if column.strip() != '*'] or None
+        return self
+
+    def insert(self, json, *, count=None, returning='representation', upsert=False):
+        self.method = 'upsert' if upsert else 'insert'
+        self.payload = json if isinstance(json, list) else [json]
+        self.returning = returning == 'representation'
+        return self
+
+    def upsert(self, json, *, count=None, returning='representation', ignore_duplicates=False, on_conflict=''):
+        self.insert(json, returning=returning, upsert=True)
+        self.conflict = [column.strip() for column in on_conflict.split(',') if column.strip()] or ['id']
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json, *, count=None, returning='representation'):
+        self.method = 'update'
+        self.payload = json
+        self.returning = returning == 'representation'
+        return self
+
+    def delete(self, *, count=None, returning='representation'):
+        self.method = 'delete'
+        self.returning = returning == 'representation'
+        return self
+
+    def _filter(self, name, column, value):
+        self.conditions.append((FILTERS[name], column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._filter('neq', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def in_(self, column, values):
+        return self._filter('in_', column, list(values))
+
+    def order(self, column, *, desc=False, nullsfirst=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        self.max_rows = size
+        return self
+
+    def _matches(self, row):
+        return all(column in row and check(row[column], value) for check, column, value in self.conditions)
+
+    def execute(self):
+        self.client.requests += 1
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        with self.client.lock:
+            rows = self.client.tables.setdefault(self.table, [])
+            data = getattr(self, f'_{self.method}')(rows)
+            data = copy.deepcopy(data)
+        return APIResponse(data=data if self.returning else [], count=len(data))
+
+    def _select(self, rows):
+        data = [row for row in rows if self._matches(row)]
+        for column, desc in reversed(self.ordering):
+            data.sort(key=lambda row: row.get(column), reverse=desc)
+        if self.max_rows is not None:
+            data = data[:self.max_rows]
+        if self.columns:
+            data = [{column: row.get(column) for column in self.columns} for row in data]
+        return data
+
+    def _insert(self, rows):
+        return [self._insert_one(rows, {}, row) for row in self.payload]
+
+    def _upsert(self, rows):
+        index = {tuple(row.get(column) for column in self.conflict): row for row in rows}
+        data = []
+        for row in self.payload:
+            existing = index.get(tuple(row.get(column) for column in self.conflict))
+            if existing is None:
+                data.append(self._insert_one(rows, index, row))
+            elif not self.ignore_duplicates:
+                existing.update(row)
+                data.append(existing)
+        return data
+
+    def _insert_one(self, rows, index, row):
+        row = dict(row)
+        if 'id' not in row:
+            row['id'] = self.client.next_id(self.table)
+        rows.append(row)
+        index[tuple(row.get(column) for column in self.conflict)] = row
+        return row
+
+    def _update(self, rows):
+        data = [row for row in rows if self._matches(row)]
+        for row in data:
+            row.update(self.payload)
+        return data
+
+    def _delete(self, rows):
+        data = [row for row in rows if self._matches(row)]
+        rows[:] = [row for row in rows if not self._matches(row)]
+        return data
+
+
+class LocalSupabaseClient:
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.tables = {}
+        self.sequences = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def next_id(self, table):
+        self.sequences[table] = self.sequences.get(table, 0) + 1
+        return self.sequences[table]
+
+    def table(self, table_name):
+        return LocalQuery(self, table_name)
+
+    def from_(self, table_name):
+        return self.table(table_name)
+
+    def reset(self):
+        with self.lock:
+            self.tables.clear()
+            self.sequences.clear()
+            self.requests = 0
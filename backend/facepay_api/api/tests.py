@@ -0,0 +1,30 @@
+from urllib.parse import urlencode
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from .management.commands.check_query_budget import ENDPOINTS, seed
+
+
+class QueryBudgetTests(TestCase):
+    """Every list endpoint runs a fixed number of queries, however many rows it returns."""
+
+    def assert_budgets(self):
+        factory = APIRequestFactory()
+        for name, viewset, query, budget in ENDPOINTS:
+            label = f"/api/{name}/?{urlencode(query, safe=',')}".rstrip('?')
+            with self.subTest(endpoint=label):
+                view = viewset.as_view({'get': 'list'})
+                with self.assertNumQueries(budget):
+                    response = view(factory.get(f'/api/{name}/', query))
+                    response.render()
+                self.assertEqual(response.status_code, 200)
+
+    def test_budget_with_few_rows(self):
+        seed(0, 2)
+        self.assert_budgets()
+
+    def test_budget_does_not_grow_with_rows(self):
+        seed(0, 2)
+        seed(1, 25)
+        self.assert_budgets()
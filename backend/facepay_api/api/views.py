@@ -1,11 +1,40 @@
-from rest_framework import viewsets, filters
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from rest_framework import viewsets, filters, serializers, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from .attendance import check_in_out
+from .audit import AuditMixin, audit, get_audit_writer
+from .authentication import token_cache, unknown_token_cache
+from .biometrics import (
+    STORAGE_DTYPE, decode_vector, encode_vector, get_gallery, matched_employee_ids, record_attempts,
+    serialize_matches
+)
+from .cache import cache_stats, match_threshold
+from .conditional import ConditionalGetMixin
+from .expand import ExpandableViewSetMixin
+from .ingest import ingest_events
+from .onboarding import detect_format, import_employees
 from .models import (
     Usuario, Administrador, Operador, Empleado, InfoContacto, Direccion,
     Terminal, DatosBiometricos, IntentoAcceso, ResultadoReconocimiento,
     RegistroAsistencia, RegistroNomina, Concepto, ReciboPago,
     Reporte, ConfigSistema, RegistroAuditoria, TokenAutenticacion
 )
+from .pagination import AsistenciaCursorPagination, EventoCursorPagination
+from .parsers import NDJSONParser
+from .partitions import PartitionWindowMixin
+from .payroll import calculate_payroll
+from .receipts import generate_receipts, receipt_path
+from .reports import export_report, report_path
+from .rollups import dashboard_stats
+from .search import get_employee_index
 from .serializers import (
     UsuarioSerializer, AdministradorSerializer, OperadorSerializer,
     EmpleadoSerializer, InfoContactoSerializer, DireccionSerializer,
@@ -13,11 +42,17 @@ from .serializers import (
     ResultadoReconocimientoSerializer, RegistroAsistenciaSerializer,
     RegistroNominaSerializer, ConceptoSerializer, ReciboPagoSerializer,
     ReporteSerializer, ConfigSistemaSerializer, RegistroAuditoriaSerializer,
-    TokenAutenticacionSerializer
+    TokenAutenticacionSerializer, IdentificacionSerializer, IdentificacionLoteSerializer,
+    MarcacionSerializer
 )
 
 
-class UsuarioViewSet(viewsets.ModelViewSet):
+def parse_flag(value):
+    # "false"/"0" from forms and query strings must not count as true
+    return serializers.BooleanField().to_internal_value(value)
+
+
+class UsuarioViewSet(AuditMixin, ConditionalGetMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -26,14 +61,14 @@ class UsuarioViewSet(viewsets.ModelViewSet):
     ordering_fields = ['creado_en', 'nombre_usuario']
 
 
-class InfoContactoViewSet(viewsets.ModelViewSet):
+class InfoContactoViewSet(AuditMixin, ConditionalGetMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = InfoContacto.objects.all()
     serializer_class = InfoContactoSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ['telefono', 'correo']
 
 
-class DireccionViewSet(viewsets.ModelViewSet):
+class DireccionViewSet(AuditMixin, ConditionalGetMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Direccion.objects.all()
     serializer_class = DireccionSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -41,16 +76,49 @@ class DireccionViewSet(viewsets.ModelViewSet):
     search_fields = ['calle', 'ciudad', 'estado']
 
 
-class EmpleadoViewSet(viewsets.ModelViewSet):
-    queryset = Empleado.objects.select_related('id_usuario', 'id_contacto', 'id_direccion').all()
+class EmpleadoViewSet(AuditMixin, ConditionalGetMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
+    queryset = Empleado.objects.all()
+    etag_models = (Empleado, InfoContacto, Direccion, Usuario)
     serializer_class = EmpleadoSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['cargo', 'departamento', 'tipo_documento']
     search_fields = ['nombres', 'apellidos', 'codigo_empleado', 'numero_documento']
     ordering_fields = ['nombres', 'apellidos', 'codigo_empleado']
 
+    @action(detail=False, methods=['get'], url_path='autocompletar')
+    def autocompletar(self, request):
+        try:
+            limite = min(int(request.query_params.get('limite', 10)), settings.FACEPAY_AUTOCOMPLETE_MAX_RESULTS)
+        except ValueError:
+            return Response({'error': "'limite' debe ser un entero"}, status=status.HTTP_400_BAD_REQUEST)
+        index = get_employee_index()
+        return Response({
+            'resultados': index.search(request.query_params.get('q', ''), max(limite, 1)),
+            'tamano_indice': len(index),
+        })
 
-class TerminalViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='importar', parser_classes=[MultiPartParser])
+    def importar(self, request):
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({'error': "Envíe el archivo en el campo 'archivo'"}, status=status.HTTP_400_BAD_REQUEST)
+        simular = str(request.data.get('simular', request.query_params.get('simular', ''))).lower() in ('1', 'true')
+        try:
+            formato = detect_format(archivo.name, request.data.get('formato') or request.query_params.get('formato'))
+            resultado = import_employees(archivo, formato, simular=simular)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if resultado['creados']:
+            user = request.user
+            audit(
+                f"importar empleado {resultado['creados']}",
+                user.id if isinstance(user, Usuario) else None,
+                {'modelo': 'empleado', 'archivo': archivo.name, 'creados': resultado['creados']},
+            )
+        return Response(resultado)
+
+
+class TerminalViewSet(AuditMixin, ConditionalGetMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Terminal.objects.all()
     serializer_class = TerminalSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -58,79 +126,279 @@ class TerminalViewSet(viewsets.ModelViewSet):
     search_fields = ['ubicacion', 'direccion_ip']
 
 
-class DatosBiometricosViewSet(viewsets.ModelViewSet):
-    queryset = DatosBiometricos.objects.select_related('id_empleado', 'id_terminal').all()
+class DatosBiometricosViewSet(AuditMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
+    queryset = DatosBiometricos.objects.all()
     serializer_class = DatosBiometricosSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['tipo', 'id_empleado', 'id_terminal']
     ordering_fields = ['registrado_en']
 
+    @action(detail=True, methods=['get', 'put'], url_path='vector')
+    def vector(self, request, pk=None):
+        dato = self.get_object()
+        if request.method == 'PUT':
+            raw = request.body
+            itemsize = np.dtype(STORAGE_DTYPE).itemsize
+            if not raw or len(raw) % itemsize:
+                return Response(
+                    {'error': 'El cuerpo debe contener float32 little-endian'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            dato.vector = raw
+            dato.dimension = len(raw) // itemsize
+            dato.dtype = STORAGE_DTYPE
+            dato.save(update_fields=['vector', 'dimension', 'dtype', 'actualizado_en'])
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        vector = decode_vector(dato.vector, dato.dtype)
+        if vector is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        response = HttpResponse(encode_vector(vector), content_type='application/octet-stream')
+        response['X-Vector-Dimension'] = str(vector.size)
+        response['X-Vector-Dtype'] = STORAGE_DTYPE
+        return response
+
+    def _serialize_matches(self, matches_per_probe):
+        empleados = Empleado.objects.in_bulk(matched_employee_ids(matches_per_probe))
+        return serialize_matches(matches_per_probe, empleados, match_threshold())
+
+    @action(detail=False, methods=['post'], url_path='identify')
+    def identify(self, request):
+        serializer = IdentificacionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        gallery = get_gallery()
+        try:
+            matches = gallery.identify(serializer.validated_data['vector'], serializer.validated_data['k'])
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultados = self._serialize_matches([matches])[0]
+        return Response({
+            'resultados': resultados,
+            'tamano_galeria': len(gallery),
+            'version_galeria': gallery.version,
+        })
+
+    @action(detail=False, methods=['post'], url_path='identify-batch')
+    def identify_batch(self, request):
+        serializer = IdentificacionLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        gallery = get_gallery()
+        try:
+            matches_per_probe = gallery.identify_batch(data['vectores'], data['k'])
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        terminal = data.get('id_terminal')
+        intentos = record_attempts(matches_per_probe, terminal.id if terminal else None, data['metodo'])
+        resultados = self._serialize_matches(matches_per_probe)
+        return Response({
+            'resultados': [
+                {'indice': indice, 'id_intento': intento.id, 'resultado': intento.resultado, 'coincidencias': coincidencias}
+                for indice, (intento, coincidencias) in enumerate(zip(intentos, resultados))
+            ],
+            'tamano_galeria': len(gallery),
+            'version_galeria': gallery.version,
+        })
+
 
-class IntentoAccesoViewSet(viewsets.ModelViewSet):
-    queryset = IntentoAcceso.objects.select_related('id_terminal', 'referencia_empleado').all()
+class IntentoAccesoViewSet(AuditMixin, PartitionWindowMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
+    queryset = IntentoAcceso.objects.all()
     serializer_class = IntentoAccesoSerializer
+    pagination_class = EventoCursorPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['resultado', 'metodo', 'id_terminal', 'referencia_empleado']
     ordering_fields = ['fecha_hora']
 
+    @action(detail=False, methods=['post'], url_path='ingest', parser_classes=[NDJSONParser, JSONParser])
+    def ingest(self, request):
+        events = request.data
+        if isinstance(events, dict):
+            events = events.get('eventos', [])
+        if not isinstance(events, list):
+            return Response({'error': 'Se esperaba una lista de eventos'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > settings.FACEPAY_INGEST_MAX_EVENTS:
+            return Response(
+                {'error': f'Máximo {settings.FACEPAY_INGEST_MAX_EVENTS} eventos por lote'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(ingest_events(events))
 
-class ResultadoReconocimientoViewSet(viewsets.ModelViewSet):
-    queryset = ResultadoReconocimiento.objects.select_related('id_empleado', 'id_intento').all()
+
+class ResultadoReconocimientoViewSet(AuditMixin, PartitionWindowMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
+    queryset = ResultadoReconocimiento.objects.all()
     serializer_class = ResultadoReconocimientoSerializer
+    pagination_class = EventoCursorPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['coincidencia', 'id_empleado']
-    ordering_fields = ['fecha_hora', 'confianza']
+    ordering_fields = ['fecha_hora']
 
 
-class RegistroAsistenciaViewSet(viewsets.ModelViewSet):
-    queryset = RegistroAsistencia.objects.select_related('id_empleado').all()
+class RegistroAsistenciaViewSet(AuditMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
+    queryset = RegistroAsistencia.objects.all()
     serializer_class = RegistroAsistenciaSerializer
+    pagination_class = AsistenciaCursorPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['id_empleado', 'fecha', 'estado']
-    ordering_fields = ['fecha', 'hora_entrada']
+    ordering_fields = ['fecha']
+
+    @action(detail=False, methods=['post'], url_path='marcar')
+    def marcar(self, request):
+        serializer = MarcacionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        employee_id = data.get('id_empleado')
+        if employee_id is None:
+            employee_id = Empleado.objects.filter(
+                codigo_empleado=data['codigo_empleado']
+            ).values_list('id', flat=True).first()
+            if employee_id is None:
+                return Response({'error': 'Empleado no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
+        try:
+            marcacion = check_in_out(employee_id, data.get('fecha_hora'), data.get('terminal_origen'))
+        except IntegrityError:
+            return Response({'error': 'Empleado no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(marcacion)
 
-class RegistroNominaViewSet(viewsets.ModelViewSet):
-    queryset = RegistroNomina.objects.select_related('id_empleado').all()
+
+class RegistroNominaViewSet(AuditMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
+    queryset = RegistroNomina.objects.all()
     serializer_class = RegistroNominaSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['id_empleado', 'inicio_periodo', 'fin_periodo']
     ordering_fields = ['inicio_periodo', 'fin_periodo']
 
+    @action(detail=False, methods=['post'], url_path='calcular')
+    def calcular(self, request):
+        try:
+            corrida = calculate_payroll(
+                request.data.get('period') or request.data.get('periodo'),
+                incremental=not parse_flag(request.data.get('completo', False)),
+                # A pool of processes does not belong inside a web worker; large runs use the command
+                workers=1,
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        resultados = corrida.pop('resultados')
+        return Response({
+            'data': resultados,
+            'message': f"Nómina calculada: {corrida['nominas']} registros a {corrida['filas_por_segundo']} filas/s",
+            **corrida,
+        })
+
 
-class ConceptoViewSet(viewsets.ModelViewSet):
-    queryset = Concepto.objects.select_related('id_nomina').all()
+class ConceptoViewSet(AuditMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
+    queryset = Concepto.objects.all()
     serializer_class = ConceptoSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['id_nomina']
     search_fields = ['codigo', 'descripcion']
 
 
-class ReciboPagoViewSet(viewsets.ModelViewSet):
-    queryset = ReciboPago.objects.select_related('id_nomina', 'id_empleado').all()
+class ReciboPagoViewSet(AuditMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
+    queryset = ReciboPago.objects.all()
     serializer_class = ReciboPagoSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['id_empleado', 'id_nomina']
     ordering_fields = ['generado_en']
 
+    @action(detail=False, methods=['post'], url_path='generar')
+    def generar(self, request):
+        try:
+            # Whole months belong to the generate_receipts command; a request renders in-process
+            corrida = generate_receipts(
+                request.data.get('period') or request.data.get('periodo'),
+                workers=1,
+                force=parse_flag(request.data.get('forzar', False)),
+                limit=settings.FACEPAY_RECEIPT_API_LIMIT,
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'message': f"{corrida['recibos']} recibos, {corrida['renderizados']} renderizados "
+                       f"a {corrida['recibos_por_segundo']} recibos/s",
+            **corrida,
+        })
+
+    @action(detail=True, methods=['get'], url_path='pdf')
+    def pdf(self, request, pk=None):
+        recibo = self.get_object()
+        if not recibo.referencia_pdf:
+            return Response({'error': 'El recibo no ha sido generado'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            handle = open(receipt_path(recibo.referencia_pdf), 'rb')
+        except FileNotFoundError:
+            return Response({'error': 'Archivo del recibo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(handle, content_type='application/pdf', filename=f'recibo-{recibo.id}.pdf')
 
-class ReporteViewSet(viewsets.ModelViewSet):
-    queryset = Reporte.objects.select_related('id_admin').all()
+
+class ReporteViewSet(AuditMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
+    queryset = Reporte.objects.all()
     serializer_class = ReporteSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['titulo']
     ordering_fields = ['generado_en']
 
+    @action(detail=True, methods=['post'], url_path='generar')
+    def generar(self, request, pk=None):
+        reporte = self.get_object()
+        try:
+            referencia, content_type, chunks = export_report(
+                reporte, request.query_params.get('formato') or request.data.get('formato')
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{referencia}"'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='archivo')
+    def archivo(self, request, pk=None):
+        reporte = self.get_object()
+        if not reporte.referencia_archivo:
+            return Response({'error': 'El reporte no ha sido generado'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            handle = open(report_path(reporte.referencia_archivo), 'rb')
+        except FileNotFoundError:
+            return Response({'error': 'Archivo de reporte no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(handle, as_attachment=True, filename=reporte.referencia_archivo)
 
-class ConfigSistemaViewSet(viewsets.ModelViewSet):
+
+class ConfigSistemaViewSet(AuditMixin, ConditionalGetMixin, ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = ConfigSistema.objects.all()
     serializer_class = ConfigSistemaSerializer
 
+    @action(detail=False, methods=['get'], url_path='cache')
+    def cache(self, request):
+        return Response({**cache_stats(), 'token': token_cache.stats(), 'token_desconocido': unknown_token_cache.stats()})
+
 
-class RegistroAuditoriaViewSet(viewsets.ModelViewSet):
-    queryset = RegistroAuditoria.objects.select_related('id_usuario').all()
+class RegistroAuditoriaViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
+    queryset = RegistroAuditoria.objects.all()
     serializer_class = RegistroAuditoriaSerializer
+    pagination_class = EventoCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['id_usuario']
     search_fields = ['accion']
     ordering_fields = ['fecha_hora']
+
+    @action(detail=False, methods=['get'], url_path='escritor')
+    def escritor(self, request):
+        return Response(get_audit_writer().stats())
+
+
+class DashboardViewSet(viewsets.ViewSet):
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request):
+        fecha = request.query_params.get('fecha')
+        if fecha:
+            try:
+                fecha = date.fromisoformat(fecha)
+            except ValueError:
+                return Response({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'data': dashboard_stats(fecha)})
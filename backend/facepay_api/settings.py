@@ -1,5 +1,7 @@
 import os
 from pathlib import Path
+
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -27,6 +29,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -71,6 +74,88 @@ DATABASES = {
 
 SUPABASE_URL = os.getenv('VITE_SUPABASE_URL','')
 SUPABASE_KEY = os.getenv('VITE_SUPABASE_ANON_KEY', '')
+FACEPAY_SUPABASE_BACKEND = os.getenv('FACEPAY_SUPABASE_BACKEND', 'remote')
+FACEPAY_SUPABASE_POOL_SIZE = int(os.getenv('FACEPAY_SUPABASE_POOL_SIZE', '20'))
+FACEPAY_SUPABASE_KEEPALIVE = float(os.getenv('FACEPAY_SUPABASE_KEEPALIVE', '30'))
+FACEPAY_SUPABASE_TIMEOUT = float(os.getenv('FACEPAY_SUPABASE_TIMEOUT', '10'))
+FACEPAY_SUPABASE_CONNECT_TIMEOUT = float(os.getenv('FACEPAY_SUPABASE_CONNECT_TIMEOUT', '5'))
+FACEPAY_SUPABASE_BULK_CHUNK = int(os.getenv('FACEPAY_SUPABASE_BULK_CHUNK', '500'))
+FACEPAY_SUPABASE_LOCAL_LATENCY = float(os.getenv('FACEPAY_SUPABASE_LOCAL_LATENCY', '0'))
+
+FACEPAY_MATCH_THRESHOLD = float(os.getenv('FACEPAY_MATCH_THRESHOLD', '0.6'))
+FACEPAY_GALLERY_RECONCILE_SECONDS = int(os.getenv('FACEPAY_GALLERY_RECONCILE_SECONDS', '300'))
+FACEPAY_GALLERY_RECONCILE_CHUNK = int(os.getenv('FACEPAY_GALLERY_RECONCILE_CHUNK', '500'))
+
+FACEPAY_EMPLOYEE_INDEX_RECONCILE_SECONDS = int(os.getenv('FACEPAY_EMPLOYEE_INDEX_RECONCILE_SECONDS', '300'))
+FACEPAY_AUTOCOMPLETE_MAX_RESULTS = int(os.getenv('FACEPAY_AUTOCOMPLETE_MAX_RESULTS', '50'))
+
+FACEPAY_INGEST_MAX_EVENTS = int(os.getenv('FACEPAY_INGEST_MAX_EVENTS', '10000'))
+
+FACEPAY_IMPORT_CHUNK_SIZE = int(os.getenv('FACEPAY_IMPORT_CHUNK_SIZE', '1000'))
+FACEPAY_IMPORT_MAX_ERRORS = int(os.getenv('FACEPAY_IMPORT_MAX_ERRORS', '1000'))
+
+FACEPAY_PAYROLL_MONTHLY_HOURS = int(os.getenv('FACEPAY_PAYROLL_MONTHLY_HOURS', '240'))
+FACEPAY_PAYROLL_DEDUCTIONS = dict(
+    item.split(':') for item in os.getenv('FACEPAY_PAYROLL_DEDUCTIONS', 'SALUD:0.04,PENSION:0.04').split(',')
+)
+FACEPAY_PAYROLL_WORKERS = int(os.getenv('FACEPAY_PAYROLL_WORKERS', str(os.cpu_count() or 1)))
+FACEPAY_PAYROLL_PARALLEL_THRESHOLD = int(os.getenv('FACEPAY_PAYROLL_PARALLEL_THRESHOLD', '5000'))
+FACEPAY_PAYROLL_WATERMARK_MARGIN_SECONDS = int(os.getenv('FACEPAY_PAYROLL_WATERMARK_MARGIN_SECONDS', '300'))
+
+FACEPAY_RECEIPTS_DIR = os.getenv('FACEPAY_RECEIPTS_DIR', str(BASE_DIR / 'var' / 'recibos'))
+FACEPAY_RECEIPT_WORKERS = int(os.getenv('FACEPAY_RECEIPT_WORKERS', str(os.cpu_count() or 1)))
+FACEPAY_RECEIPT_BATCH_SIZE = int(os.getenv('FACEPAY_RECEIPT_BATCH_SIZE', '500'))
+FACEPAY_RECEIPT_PARALLEL_THRESHOLD = int(os.getenv('FACEPAY_RECEIPT_PARALLEL_THRESHOLD', '200'))
+FACEPAY_RECEIPT_API_LIMIT = int(os.getenv('FACEPAY_RECEIPT_API_LIMIT', '500'))
+
+FACEPAY_ANN_INDEX = os.getenv('FACEPAY_ANN_INDEX', 'exact')
+FACEPAY_ANN_NLIST = int(os.getenv('FACEPAY_ANN_NLIST', '1024'))
+FACEPAY_ANN_NPROBE = int(os.getenv('FACEPAY_ANN_NPROBE', '16'))
+FACEPAY_ANN_INDEX_PATH = os.getenv('FACEPAY_ANN_INDEX_PATH', str(BASE_DIR / 'var' / 'ann_index.npz'))
+
+# Cache shared by every worker process: redis://host:6379/0 or memcached://host:11211.
+# Without it each process gets its own LocMemCache and nothing is really shared
+FACEPAY_CACHE_URL = os.getenv('FACEPAY_CACHE_URL', '')
+if FACEPAY_CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': FACEPAY_CACHE_URL}}
+elif FACEPAY_CACHE_URL.startswith('memcached://'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': FACEPAY_CACHE_URL[len('memcached://'):],
+    }}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+FACEPAY_CACHE_ALIAS = os.getenv('FACEPAY_CACHE_ALIAS', 'default')
+FACEPAY_CACHE_MAXSIZE = int(os.getenv('FACEPAY_CACHE_MAXSIZE', '1024'))
+FACEPAY_CACHE_LOCAL_TTL = float(os.getenv('FACEPAY_CACHE_LOCAL_TTL', '5'))
+FACEPAY_CACHE_SHARED_TTL = int(os.getenv('FACEPAY_CACHE_SHARED_TTL', '300'))
+
+FACEPAY_AUTH_CACHE_TTL = float(os.getenv('FACEPAY_AUTH_CACHE_TTL', '60'))
+FACEPAY_AUTH_CACHE_MAXSIZE = int(os.getenv('FACEPAY_AUTH_CACHE_MAXSIZE', '10000'))
+FACEPAY_AUTH_UNKNOWN_CACHE_TTL = float(os.getenv('FACEPAY_AUTH_UNKNOWN_CACHE_TTL', '5'))
+FACEPAY_AUTH_UNKNOWN_CACHE_MAXSIZE = int(os.getenv('FACEPAY_AUTH_UNKNOWN_CACHE_MAXSIZE', '1000'))
+
+FACEPAY_REPORTS_DIR = os.getenv('FACEPAY_REPORTS_DIR', str(BASE_DIR / 'var' / 'reportes'))
+FACEPAY_REPORT_CHUNK_SIZE = int(os.getenv('FACEPAY_REPORT_CHUNK_SIZE', '2000'))
+
+FACEPAY_AUDIT_ENABLED = os.getenv('FACEPAY_AUDIT_ENABLED', 'True') == 'True'
+FACEPAY_AUDIT_QUEUE_SIZE = int(os.getenv('FACEPAY_AUDIT_QUEUE_SIZE', '10000'))
+FACEPAY_AUDIT_BATCH_SIZE = int(os.getenv('FACEPAY_AUDIT_BATCH_SIZE', '500'))
+FACEPAY_AUDIT_FLUSH_SECONDS = float(os.getenv('FACEPAY_AUDIT_FLUSH_SECONDS', '1.0'))
+FACEPAY_AUDIT_OVERFLOW = os.getenv('FACEPAY_AUDIT_OVERFLOW', 'spill')
+FACEPAY_AUDIT_BLOCK_SECONDS = float(os.getenv('FACEPAY_AUDIT_BLOCK_SECONDS', '0.5'))
+FACEPAY_AUDIT_SPILL_PATH = os.getenv('FACEPAY_AUDIT_SPILL_PATH', str(BASE_DIR / 'var' / 'auditoria_pendiente.ndjson'))
+
+FACEPAY_PARTITION_WINDOW_DAYS = int(os.getenv('FACEPAY_PARTITION_WINDOW_DAYS', '31'))
+FACEPAY_PARTITION_RETENTION_MONTHS = int(os.getenv('FACEPAY_PARTITION_RETENTION_MONTHS', '12'))
+FACEPAY_PARTITION_PREMAKE_MONTHS = int(os.getenv('FACEPAY_PARTITION_PREMAKE_MONTHS', '3'))
+FACEPAY_ARCHIVE_DIR = os.getenv('FACEPAY_ARCHIVE_DIR', str(BASE_DIR / 'var' / 'archivo'))
+FACEPAY_ARCHIVE_CHUNK_SIZE = int(os.getenv('FACEPAY_ARCHIVE_CHUNK_SIZE', '50000'))
+
+FACEPAY_METRICS_ENABLED = os.getenv('FACEPAY_METRICS_ENABLED', 'True') == 'True'
+FACEPAY_SLOW_REQUEST_MS = float(os.getenv('FACEPAY_SLOW_REQUEST_MS', '0'))
+FACEPAY_SLOW_REQUEST_MAX_QUERIES = int(os.getenv('FACEPAY_SLOW_REQUEST_MAX_QUERIES', '200'))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -103,6 +188,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100,
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.TokenAutenticacionAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -121,3 +207,5 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match', 'if-modified-since')
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified']
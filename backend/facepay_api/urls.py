@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
-from api import views
+from api import async_views, views
+from api.metrics import metrics_view
 
 router = routers.DefaultRouter()
 router.register(r'usuarios', views.UsuarioViewSet)
@@ -19,9 +20,16 @@ router.register(r'recibos-pago', views.ReciboPagoViewSet)
 router.register(r'reportes', views.ReporteViewSet)
 router.register(r'configuracion-sistema', views.ConfigSistemaViewSet)
 router.register(r'auditoria', views.RegistroAuditoriaViewSet)
+router.register(r'dashboard', views.DashboardViewSet, basename='dashboard')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/payroll/calculate', views.RegistroNominaViewSet.as_view({'post': 'calcular'})),
+    path('api/dashboard/stats', views.DashboardViewSet.as_view({'get': 'stats'})),
+    path('api/terminal/identificar', async_views.identificar, name='terminal-identificar'),
+    path('api/terminal/marcar', async_views.marcar, name='terminal-marcar'),
+    path('api/terminal/intentos', async_views.intentos, name='terminal-intentos'),
+    path('api/metrics', metrics_view, name='metrics'),
     path('api/', include(router.urls)),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework'))
 ]
@@ -0,0 +1,25 @@
+-- Store biometric vectors as packed float32 bytes instead of text
+ALTER TABLE datos_biometricos ADD COLUMN IF NOT EXISTS vector_binario BYTEA;
+ALTER TABLE datos_biometricos ADD COLUMN IF NOT EXISTS dimension INT;
+ALTER TABLE datos_biometricos ADD COLUMN IF NOT EXISTS dtype VARCHAR(8) NOT NULL DEFAULT '<f4';
+
+-- Convert existing text vectors ("[0.1, 0.2, ...]" or "0.1,0.2,...").
+-- float4send() emits big-endian bytes, so migrated rows are tagged '>f4';
+-- the API decodes them with np.frombuffer using the stored dtype.
+UPDATE datos_biometricos d
+SET vector_binario = t.bytes,
+    dimension = t.n,
+    dtype = '>f4'
+FROM (
+  SELECT b.id,
+         string_agg(float4send(v.x::float4), ''::bytea ORDER BY v.i) AS bytes,
+         count(*) AS n
+  FROM datos_biometricos b,
+       unnest(regexp_split_to_array(btrim(b.vector, '[] '), '[\s,]+')) WITH ORDINALITY AS v(x, i)
+  WHERE b.vector IS NOT NULL AND btrim(b.vector, '[] ') <> ''
+  GROUP BY b.id
+) t
+WHERE d.id = t.id;
+
+ALTER TABLE datos_biometricos DROP COLUMN vector;
+ALTER TABLE datos_biometricos RENAME COLUMN vector_binario TO vector;
@@ -0,0 +1,17 @@
+-- Track the last change of each biometric row so in-process galleries can reconcile incrementally
+ALTER TABLE datos_biometricos ADD COLUMN IF NOT EXISTS actualizado_en TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE OR REPLACE FUNCTION set_actualizado_en()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.actualizado_en = now();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS datos_biometricos_actualizado_en ON datos_biometricos;
+CREATE TRIGGER datos_biometricos_actualizado_en
+  BEFORE UPDATE ON datos_biometricos
+  FOR EACH ROW EXECUTE FUNCTION set_actualizado_en();
+
+CREATE INDEX IF NOT EXISTS idx_datos_biometricos_actualizado_en ON datos_biometricos(actualizado_en);
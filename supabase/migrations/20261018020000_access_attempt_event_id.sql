@@ -0,0 +1,3 @@
+-- Client-supplied event id so terminal batch retries are idempotent
+ALTER TABLE intento_acceso ADD COLUMN IF NOT EXISTS id_evento VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_intento_acceso_id_evento ON intento_acceso(id_evento);
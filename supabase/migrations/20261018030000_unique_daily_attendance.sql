@@ -0,0 +1,26 @@
+-- One attendance row per employee and day, so check-in/out can be a single upsert
+
+-- Merge existing duplicate days into the oldest row before adding the constraint
+WITH dias AS (
+  SELECT id_empleado, fecha,
+         min(id) AS id_conservado,
+         min(hora_entrada) AS hora_entrada,
+         max(hora_salida) AS hora_salida
+  FROM registro_asistencia
+  GROUP BY id_empleado, fecha
+  HAVING count(*) > 1
+)
+UPDATE registro_asistencia r
+SET hora_entrada = d.hora_entrada,
+    hora_salida = d.hora_salida
+FROM dias d
+WHERE r.id = d.id_conservado;
+
+DELETE FROM registro_asistencia r
+USING registro_asistencia o
+WHERE r.id_empleado = o.id_empleado
+  AND r.fecha = o.fecha
+  AND r.id > o.id;
+
+ALTER TABLE registro_asistencia
+  ADD CONSTRAINT uniq_asistencia_empleado_fecha UNIQUE (id_empleado, fecha);
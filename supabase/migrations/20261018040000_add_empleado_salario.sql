@@ -0,0 +1,5 @@
+-- Add monthly base salary to empleado for server-side payroll runs
+ALTER TABLE empleado ADD COLUMN IF NOT EXISTS salario DECIMAL(12,2) NOT NULL DEFAULT 0.00;
+
+CREATE INDEX IF NOT EXISTS idx_registro_asistencia_fecha_empleado ON registro_asistencia(fecha, id_empleado);
+CREATE INDEX IF NOT EXISTS idx_registro_nomina_periodo ON registro_nomina(inicio_periodo, fin_periodo, id_empleado);
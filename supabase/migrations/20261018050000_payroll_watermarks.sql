@@ -0,0 +1,36 @@
+-- Change timestamps and payroll run watermarks for incremental payroll recomputation
+ALTER TABLE empleado ADD COLUMN IF NOT EXISTS actualizado_en TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE registro_asistencia ADD COLUMN IF NOT EXISTS actualizado_en TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE concepto ADD COLUMN IF NOT EXISTS actualizado_en TIMESTAMPTZ NOT NULL DEFAULT now();
+
+-- set_actualizado_en() is defined in 20261018010000_biometric_updated_at.sql
+DROP TRIGGER IF EXISTS empleado_actualizado_en ON empleado;
+CREATE TRIGGER empleado_actualizado_en
+  BEFORE UPDATE ON empleado
+  FOR EACH ROW EXECUTE FUNCTION set_actualizado_en();
+
+DROP TRIGGER IF EXISTS registro_asistencia_actualizado_en ON registro_asistencia;
+CREATE TRIGGER registro_asistencia_actualizado_en
+  BEFORE UPDATE ON registro_asistencia
+  FOR EACH ROW EXECUTE FUNCTION set_actualizado_en();
+
+DROP TRIGGER IF EXISTS concepto_actualizado_en ON concepto;
+CREATE TRIGGER concepto_actualizado_en
+  BEFORE UPDATE ON concepto
+  FOR EACH ROW EXECUTE FUNCTION set_actualizado_en();
+
+CREATE INDEX IF NOT EXISTS idx_empleado_actualizado_en ON empleado(actualizado_en);
+CREATE INDEX IF NOT EXISTS idx_registro_asistencia_actualizado_en ON registro_asistencia(actualizado_en);
+CREATE INDEX IF NOT EXISTS idx_concepto_actualizado_en ON concepto(actualizado_en);
+
+CREATE TABLE IF NOT EXISTS ejecucion_nomina (
+  id SERIAL PRIMARY KEY,
+  inicio_periodo DATE NOT NULL,
+  fin_periodo DATE NOT NULL,
+  marca_agua TIMESTAMPTZ NOT NULL,
+  incremental BOOLEAN NOT NULL DEFAULT true,
+  empleados_recalculados INT NOT NULL DEFAULT 0,
+  finalizada_en TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ejecucion_nomina_periodo ON ejecucion_nomina(inicio_periodo, fin_periodo, marca_agua DESC);
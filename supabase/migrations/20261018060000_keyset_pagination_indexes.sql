@@ -0,0 +1,11 @@
+-- Composite (key, id) indexes backing keyset pagination on append-only event tables
+CREATE INDEX IF NOT EXISTS idx_intento_acceso_fecha_hora_id ON intento_acceso(fecha_hora DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_resultado_reconocimiento_fecha_hora_id ON resultado_reconocimiento(fecha_hora DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_registro_auditoria_fecha_hora_id ON registro_auditoria(fecha_hora DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_registro_asistencia_fecha_id ON registro_asistencia(fecha DESC, id DESC);
+
+-- Keep planner statistics fresh so ?total=aproximado stays close to the real row count
+ANALYZE intento_acceso;
+ANALYZE resultado_reconocimiento;
+ANALYZE registro_auditoria;
+ANALYZE registro_asistencia;
@@ -0,0 +1,116 @@
+-- Pre-aggregated attendance counters per day/department/terminal and headcount per department,
+-- maintained by triggers so the dashboard never scans registro_asistencia
+CREATE TABLE IF NOT EXISTS resumen_asistencia_diaria (
+  id SERIAL PRIMARY KEY,
+  fecha DATE NOT NULL,
+  departamento VARCHAR(64) NOT NULL DEFAULT '',
+  terminal VARCHAR(64) NOT NULL DEFAULT '',
+  registros INT NOT NULL DEFAULT 0,
+  entradas INT NOT NULL DEFAULT 0,
+  salidas INT NOT NULL DEFAULT 0,
+  presentes INT NOT NULL DEFAULT 0,
+  actualizado_en TIMESTAMPTZ NOT NULL DEFAULT now(),
+  CONSTRAINT uniq_resumen_asistencia_dia UNIQUE (fecha, departamento, terminal)
+);
+
+CREATE TABLE IF NOT EXISTS resumen_departamento (
+  departamento VARCHAR(64) PRIMARY KEY,
+  empleados INT NOT NULL DEFAULT 0,
+  actualizado_en TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Statement-level triggers with transition tables: a bulk upsert of N marks applies one
+-- aggregated delta per (fecha, departamento, terminal) instead of N row updates
+CREATE OR REPLACE FUNCTION actualizar_resumen_asistencia()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO resumen_asistencia_diaria AS r (fecha, departamento, terminal, registros, entradas, salidas, presentes)
+    SELECT n.fecha, COALESCE(e.departamento, ''), COALESCE(n.terminal_origen, ''),
+           COUNT(*), COUNT(n.hora_entrada), COUNT(n.hora_salida),
+           COUNT(*) FILTER (WHERE n.hora_entrada IS NOT NULL AND n.hora_salida IS NULL)
+    FROM nuevas n
+    LEFT JOIN empleado e ON e.id = n.id_empleado
+    GROUP BY 1, 2, 3
+    ON CONFLICT (fecha, departamento, terminal) DO UPDATE SET
+      registros = r.registros + EXCLUDED.registros,
+      entradas = r.entradas + EXCLUDED.entradas,
+      salidas = r.salidas + EXCLUDED.salidas,
+      presentes = r.presentes + EXCLUDED.presentes,
+      actualizado_en = now();
+  END IF;
+
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    INSERT INTO resumen_asistencia_diaria AS r (fecha, departamento, terminal, registros, entradas, salidas, presentes)
+    SELECT a.fecha, COALESCE(e.departamento, ''), COALESCE(a.terminal_origen, ''),
+           -COUNT(*), -COUNT(a.hora_entrada), -COUNT(a.hora_salida),
+           -COUNT(*) FILTER (WHERE a.hora_entrada IS NOT NULL AND a.hora_salida IS NULL)
+    FROM anteriores a
+    LEFT JOIN empleado e ON e.id = a.id_empleado
+    GROUP BY 1, 2, 3
+    ON CONFLICT (fecha, departamento, terminal) DO UPDATE SET
+      registros = r.registros + EXCLUDED.registros,
+      entradas = r.entradas + EXCLUDED.entradas,
+      salidas = r.salidas + EXCLUDED.salidas,
+      presentes = r.presentes + EXCLUDED.presentes,
+      actualizado_en = now();
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS registro_asistencia_resumen_insert ON registro_asistencia;
+CREATE TRIGGER registro_asistencia_resumen_insert
+  AFTER INSERT ON registro_asistencia
+  REFERENCING NEW TABLE AS nuevas
+  FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_asistencia();
+
+DROP TRIGGER IF EXISTS registro_asistencia_resumen_update ON registro_asistencia;
+CREATE TRIGGER registro_asistencia_resumen_update
+  AFTER UPDATE ON registro_asistencia
+  REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+  FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_asistencia();
+
+DROP TRIGGER IF EXISTS registro_asistencia_resumen_delete ON registro_asistencia;
+CREATE TRIGGER registro_asistencia_resumen_delete
+  AFTER DELETE ON registro_asistencia
+  REFERENCING OLD TABLE AS anteriores
+  FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_asistencia();
+
+CREATE OR REPLACE FUNCTION actualizar_resumen_departamento()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE resumen_departamento
+      SET empleados = empleados - 1, actualizado_en = now()
+      WHERE departamento = COALESCE(OLD.departamento, '');
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO resumen_departamento AS r (departamento, empleados)
+    VALUES (COALESCE(NEW.departamento, ''), 1)
+    ON CONFLICT (departamento) DO UPDATE SET empleados = r.empleados + 1, actualizado_en = now();
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS empleado_resumen_departamento ON empleado;
+CREATE TRIGGER empleado_resumen_departamento
+  AFTER INSERT OR DELETE OR UPDATE OF departamento ON empleado
+  FOR EACH ROW
+  EXECUTE FUNCTION actualizar_resumen_departamento();
+
+-- Backfill from the existing history
+TRUNCATE resumen_asistencia_diaria;
+INSERT INTO resumen_asistencia_diaria (fecha, departamento, terminal, registros, entradas, salidas, presentes)
+SELECT ra.fecha, COALESCE(e.departamento, ''), COALESCE(ra.terminal_origen, ''),
+       COUNT(*), COUNT(ra.hora_entrada), COUNT(ra.hora_salida),
+       COUNT(*) FILTER (WHERE ra.hora_entrada IS NOT NULL AND ra.hora_salida IS NULL)
+FROM registro_asistencia ra
+LEFT JOIN empleado e ON e.id = ra.id_empleado
+GROUP BY 1, 2, 3;
+
+TRUNCATE resumen_departamento;
+INSERT INTO resumen_departamento (departamento, empleados)
+SELECT COALESCE(departamento, ''), COUNT(*) FROM empleado GROUP BY 1;
@@ -0,0 +1,131 @@
+-- Monthly range partitions on fecha_hora for the access event tables. Old months are exported
+-- and detached by the archive_partitions command instead of being deleted row by row.
+
+-- Creates the missing monthly partitions between two dates. Rows already sitting in the default
+-- partition for a new month are moved into it before it is attached.
+CREATE OR REPLACE FUNCTION crear_particiones_mensuales(tabla TEXT, desde DATE, hasta DATE)
+RETURNS INT AS $$
+DECLARE
+  mes DATE;
+  fin DATE;
+  nombre TEXT;
+  creadas INT := 0;
+BEGIN
+  FOR mes IN SELECT generate_series(date_trunc('month', desde), date_trunc('month', hasta), INTERVAL '1 month')::date LOOP
+    nombre := tabla || '_' || to_char(mes, 'YYYYMM');
+    fin := (mes + INTERVAL '1 month')::date;
+    CONTINUE WHEN to_regclass(nombre) IS NOT NULL;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', nombre, tabla);
+    IF to_regclass(tabla || '_default') IS NOT NULL THEN
+      EXECUTE format(
+        'WITH movidas AS (DELETE FROM %I WHERE fecha_hora >= %L AND fecha_hora < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM movidas',
+        tabla || '_default', mes, fin, nombre
+      );
+    END IF;
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', tabla, nombre, mes, fin);
+    -- Partitions are reachable through the REST API on their own; without policies RLS denies everything
+    EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', nombre);
+    creadas := creadas + 1;
+  END LOOP;
+  RETURN creadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A partitioned intento_acceso cannot back a foreign key on id alone (its primary key must
+-- include fecha_hora), so the link from resultado_reconocimiento is kept by the application
+DO $$
+DECLARE
+  fk RECORD;
+BEGIN
+  FOR fk IN
+    SELECT conname FROM pg_constraint
+    WHERE conrelid = 'resultado_reconocimiento'::regclass AND confrelid = 'intento_acceso'::regclass
+  LOOP
+    EXECUTE format('ALTER TABLE resultado_reconocimiento DROP CONSTRAINT %I', fk.conname);
+  END LOOP;
+END $$;
+
+-- intento_acceso
+ALTER TABLE intento_acceso RENAME TO intento_acceso_legacy;
+UPDATE intento_acceso_legacy SET fecha_hora = now() WHERE fecha_hora IS NULL;
+
+CREATE TABLE intento_acceso (LIKE intento_acceso_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (fecha_hora);
+CREATE TABLE intento_acceso_default PARTITION OF intento_acceso DEFAULT;
+ALTER TABLE intento_acceso_default ENABLE ROW LEVEL SECURITY;
+SELECT crear_particiones_mensuales(
+  'intento_acceso',
+  COALESCE((SELECT min(fecha_hora) FROM intento_acceso_legacy)::date, CURRENT_DATE),
+  (CURRENT_DATE + INTERVAL '3 months')::date
+);
+
+INSERT INTO intento_acceso SELECT * FROM intento_acceso_legacy;
+DO $$
+BEGIN
+  EXECUTE format('ALTER SEQUENCE %s OWNED BY intento_acceso.id', pg_get_serial_sequence('intento_acceso_legacy', 'id'));
+END $$;
+DROP TABLE intento_acceso_legacy;
+
+ALTER TABLE intento_acceso ADD PRIMARY KEY (id, fecha_hora);
+ALTER TABLE intento_acceso ADD FOREIGN KEY (id_terminal) REFERENCES terminal(id) ON DELETE SET NULL;
+ALTER TABLE intento_acceso ADD FOREIGN KEY (referencia_empleado) REFERENCES empleado(id) ON DELETE SET NULL;
+-- Unique indexes on a partitioned table must contain the partition key; retries of the same
+-- terminal event carry the same fecha_hora, so they are still rejected
+CREATE UNIQUE INDEX idx_intento_acceso_id_evento ON intento_acceso(id_evento, fecha_hora);
+CREATE INDEX idx_intento_acceso_fecha_hora_id ON intento_acceso(fecha_hora DESC, id DESC);
+
+ALTER TABLE intento_acceso ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Authenticated users can read access attempts"
+  ON intento_acceso FOR SELECT
+  TO authenticated
+  USING (true);
+
+CREATE POLICY "System can insert access attempts"
+  ON intento_acceso FOR INSERT
+  TO authenticated
+  WITH CHECK (true);
+
+-- resultado_reconocimiento
+ALTER TABLE resultado_reconocimiento RENAME TO resultado_reconocimiento_legacy;
+UPDATE resultado_reconocimiento_legacy SET fecha_hora = now() WHERE fecha_hora IS NULL;
+
+CREATE TABLE resultado_reconocimiento (LIKE resultado_reconocimiento_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (fecha_hora);
+CREATE TABLE resultado_reconocimiento_default PARTITION OF resultado_reconocimiento DEFAULT;
+ALTER TABLE resultado_reconocimiento_default ENABLE ROW LEVEL SECURITY;
+SELECT crear_particiones_mensuales(
+  'resultado_reconocimiento',
+  COALESCE((SELECT min(fecha_hora) FROM resultado_reconocimiento_legacy)::date, CURRENT_DATE),
+  (CURRENT_DATE + INTERVAL '3 months')::date
+);
+
+INSERT INTO resultado_reconocimiento SELECT * FROM resultado_reconocimiento_legacy;
+DO $$
+BEGIN
+  EXECUTE format(
+    'ALTER SEQUENCE %s OWNED BY resultado_reconocimiento.id',
+    pg_get_serial_sequence('resultado_reconocimiento_legacy', 'id')
+  );
+END $$;
+DROP TABLE resultado_reconocimiento_legacy;
+
+ALTER TABLE resultado_reconocimiento ADD PRIMARY KEY (id, fecha_hora);
+ALTER TABLE resultado_reconocimiento ADD FOREIGN KEY (id_empleado) REFERENCES empleado(id) ON DELETE SET NULL;
+CREATE INDEX idx_resultado_reconocimiento_id_intento ON resultado_reconocimiento(id_intento);
+CREATE INDEX idx_resultado_reconocimiento_fecha_hora_id ON resultado_reconocimiento(fecha_hora DESC, id DESC);
+
+ALTER TABLE resultado_reconocimiento ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Authenticated users can read recognition results"
+  ON resultado_reconocimiento FOR SELECT
+  TO authenticated
+  USING (true);
+
+CREATE POLICY "System can insert recognition results"
+  ON resultado_reconocimiento FOR INSERT
+  TO authenticated
+  WITH CHECK (true);
+
+ANALYZE intento_acceso;
+ANALYZE resultado_reconocimiento;
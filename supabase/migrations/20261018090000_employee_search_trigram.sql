@@ -0,0 +1,10 @@
+-- Trigram indexes for ?search= on empleado. Django compiles icontains to
+-- UPPER(column::text) LIKE UPPER('%term%'), so the indexes are built on that same expression.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_empleado_nombres_trgm ON empleado USING gin (UPPER(nombres::text) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_empleado_apellidos_trgm ON empleado USING gin (UPPER(apellidos::text) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_empleado_codigo_empleado_trgm ON empleado USING gin (UPPER(codigo_empleado::text) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_empleado_numero_documento_trgm ON empleado USING gin (UPPER(numero_documento::text) gin_trgm_ops);
+
+ANALYZE empleado;
@@ -0,0 +1,36 @@
+-- One payroll per employee and period, so overlapping runs upsert instead of duplicating
+
+-- Keep the oldest payroll of each duplicate group; move manual concepts and receipts to it
+-- and drop the generated concepts ("<id_nomina>-<CODE>"), which the next run recreates
+CREATE TEMP TABLE nomina_duplicada ON COMMIT DROP AS
+SELECT n.id, d.id_conservado
+FROM registro_nomina n
+JOIN (
+  SELECT id_empleado, inicio_periodo, fin_periodo, min(id) AS id_conservado
+  FROM registro_nomina
+  GROUP BY id_empleado, inicio_periodo, fin_periodo
+  HAVING count(*) > 1
+) d USING (id_empleado, inicio_periodo, fin_periodo)
+WHERE n.id <> d.id_conservado;
+
+DELETE FROM concepto c
+USING nomina_duplicada d
+WHERE c.id_nomina = d.id
+  AND c.codigo LIKE d.id || '-%';
+
+UPDATE concepto c
+SET id_nomina = d.id_conservado
+FROM nomina_duplicada d
+WHERE c.id_nomina = d.id;
+
+UPDATE recibo_pago r
+SET id_nomina = d.id_conservado
+FROM nomina_duplicada d
+WHERE r.id_nomina = d.id;
+
+DELETE FROM registro_nomina n
+USING nomina_duplicada d
+WHERE n.id = d.id;
+
+ALTER TABLE registro_nomina
+  ADD CONSTRAINT uniq_nomina_empleado_periodo UNIQUE (id_empleado, inicio_periodo, fin_periodo);
@@ -0,0 +1,76 @@
+-- Snapshot the employee's department on each attendance row, so the rollup triggers subtract
+-- updates and deletes from the same bucket the row was added to, even after the employee moves
+ALTER TABLE registro_asistencia ADD COLUMN IF NOT EXISTS departamento VARCHAR(64);
+
+UPDATE registro_asistencia ra
+SET departamento = COALESCE(e.departamento, '')
+FROM empleado e
+WHERE e.id = ra.id_empleado
+  AND ra.departamento IS NULL;
+
+UPDATE registro_asistencia SET departamento = '' WHERE departamento IS NULL;
+
+CREATE OR REPLACE FUNCTION fijar_departamento_asistencia()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'UPDATE' AND NEW.id_empleado IS NOT DISTINCT FROM OLD.id_empleado THEN
+    NEW.departamento := OLD.departamento;
+  ELSIF NEW.departamento IS NULL OR TG_OP = 'UPDATE' THEN
+    SELECT COALESCE(e.departamento, '') INTO NEW.departamento FROM empleado e WHERE e.id = NEW.id_empleado;
+    NEW.departamento := COALESCE(NEW.departamento, '');
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS registro_asistencia_departamento ON registro_asistencia;
+CREATE TRIGGER registro_asistencia_departamento
+  BEFORE INSERT OR UPDATE ON registro_asistencia
+  FOR EACH ROW EXECUTE FUNCTION fijar_departamento_asistencia();
+
+-- Same deltas as 20261018070000_attendance_rollups.sql, keyed by the snapshot instead of a join
+CREATE OR REPLACE FUNCTION actualizar_resumen_asistencia()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO resumen_asistencia_diaria AS r (fecha, departamento, terminal, registros, entradas, salidas, presentes)
+    SELECT n.fecha, COALESCE(n.departamento, ''), COALESCE(n.terminal_origen, ''),
+           COUNT(*), COUNT(n.hora_entrada), COUNT(n.hora_salida),
+           COUNT(*) FILTER (WHERE n.hora_entrada IS NOT NULL AND n.hora_salida IS NULL)
+    FROM nuevas n
+    GROUP BY 1, 2, 3
+    ON CONFLICT (fecha, departamento, terminal) DO UPDATE SET
+      registros = r.registros + EXCLUDED.registros,
+      entradas = r.entradas + EXCLUDED.entradas,
+      salidas = r.salidas + EXCLUDED.salidas,
+      presentes = r.presentes + EXCLUDED.presentes,
+      actualizado_en = now();
+  END IF;
+
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    INSERT INTO resumen_asistencia_diaria AS r (fecha, departamento, terminal, registros, entradas, salidas, presentes)
+    SELECT a.fecha, COALESCE(a.departamento, ''), COALESCE(a.terminal_origen, ''),
+           -COUNT(*), -COUNT(a.hora_entrada), -COUNT(a.hora_salida),
+           -COUNT(*) FILTER (WHERE a.hora_entrada IS NOT NULL AND a.hora_salida IS NULL)
+    FROM anteriores a
+    GROUP BY 1, 2, 3
+    ON CONFLICT (fecha, departamento, terminal) DO UPDATE SET
+      registros = r.registros + EXCLUDED.registros,
+      entradas = r.entradas + EXCLUDED.entradas,
+      salidas = r.salidas + EXCLUDED.salidas,
+      presentes = r.presentes + EXCLUDED.presentes,
+      actualizado_en = now();
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Counters built by the old join may already have drifted: rebuild them from the snapshot
+TRUNCATE resumen_asistencia_diaria;
+INSERT INTO resumen_asistencia_diaria (fecha, departamento, terminal, registros, entradas, salidas, presentes)
+SELECT fecha, departamento, COALESCE(terminal_origen, ''),
+       COUNT(*), COUNT(hora_entrada), COUNT(hora_salida),
+       COUNT(*) FILTER (WHERE hora_entrada IS NOT NULL AND hora_salida IS NULL)
+FROM registro_asistencia
+GROUP BY 1, 2, 3;
@@ -0,0 +1,22 @@
+-- The unique index on a partitioned intento_acceso has to include fecha_hora, so a retry whose
+-- fecha_hora differed (for example one filled in with now() by the API) was stored again. The
+-- event ids now live in a small unpartitioned table whose primary key rejects any repeat.
+CREATE TABLE IF NOT EXISTS evento_procesado (
+  id_evento VARCHAR(64) PRIMARY KEY,
+  fecha_hora TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_evento_procesado_fecha_hora ON evento_procesado(fecha_hora);
+
+INSERT INTO evento_procesado (id_evento, fecha_hora)
+SELECT id_evento, min(fecha_hora) FROM intento_acceso
+WHERE id_evento IS NOT NULL
+GROUP BY id_evento
+ON CONFLICT (id_evento) DO NOTHING;
+
+DROP INDEX IF EXISTS idx_intento_acceso_id_evento;
+CREATE INDEX idx_intento_acceso_id_evento ON intento_acceso(id_evento);
+
+-- Only the backend writes here; without policies RLS keeps it away from the REST API
+ALTER TABLE evento_procesado ENABLE ROW LEVEL SECURITY;
+
+ANALYZE evento_procesado;
@@ -0,0 +1,17 @@
+-- ETag version counters. They used to live in the Django cache, which is per process unless a
+-- shared cache is configured, so another worker could answer 304 with a stale ETag. The backend
+-- bumps the row of a table in the same transaction as the change.
+CREATE TABLE IF NOT EXISTS version_modelo (
+  tabla VARCHAR(64) PRIMARY KEY,
+  version BIGINT NOT NULL,
+  modificado_en TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Start from the clock so the new counters never repeat a value handed out by the old ones
+INSERT INTO version_modelo (tabla, version)
+SELECT tabla, (extract(epoch FROM clock_timestamp()) * 1000000)::bigint
+FROM unnest(ARRAY['empleado', 'info_contacto', 'direccion', 'usuario', 'terminal', 'config_sistema']) AS tabla
+ON CONFLICT (tabla) DO NOTHING;
+
+-- Only the backend writes here; without policies RLS keeps it away from the REST API
+ALTER TABLE version_modelo ENABLE ROW LEVEL SECURITY;